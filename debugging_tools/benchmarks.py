@@ -0,0 +1,156 @@
+"""Benchmarks used to measure the memory and time costs of the knitting pipeline"""
+import gc
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from debugging_tools.simple_knitgraphs import stockinette
+from knit_graphs.Compact_Knit_Graph import Compact_Knit_Graph
+from knit_graphs.Loop import Loop
+from knit_graphs.Yarn import Yarn
+from knit_graphs.knit_graph_io import write_knit_graph, read_knit_graph
+from knitspeak_compiler.knitspeak_compiler import Knitspeak_Compiler
+
+
+def _traced_bytes(build) -> int:
+    """
+    :param build: a function that builds the structure being measured and returns it
+    :return: the number of bytes still allocated by the structure after it is built
+    """
+    gc.collect()
+    tracemalloc.start()
+    start, _ = tracemalloc.get_traced_memory()
+    structure = build()
+    end, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del structure
+    return end - start
+
+
+def loop_memory_benchmark(width: int = 500, height: int = 500):
+    """
+    Prints the bytes used per loop by a stockinette knit graph and by its Loop objects alone
+    :param width: the number of stitches of the swatch
+    :param height: the number of courses of the swatch
+    """
+    loop_count = width * height
+
+    def build_loops():
+        """
+        :return: the loops of a stockinette swatch with each loop pulled through the loop below it
+        """
+        loops = [Loop(loop_id, "yarn") for loop_id in range(0, loop_count)]
+        for loop in loops[width:]:
+            loop.add_parent_loop(loops[loop.loop_id - width])
+        return loops
+
+    loop_bytes = _traced_bytes(build_loops)
+    graph_bytes = _traced_bytes(lambda: stockinette(width, height))
+    print(f"{width}x{height} stockinette ({loop_count} loops)")
+    print(f"\tLoop objects: {loop_bytes / loop_count:.1f} bytes per loop")
+    print(f"\tKnit_Graph: {graph_bytes / loop_count:.1f} bytes per loop")
+
+
+def knit_graph_file_benchmark(width: int = 2000, height: int = 1000):
+    """
+    Prints the time to write a stockinette Compact_Knit_Graph to a file, open it, and read one course from it
+    :param width: the number of stitches of the swatch
+    :param height: the number of courses of the swatch
+    """
+    knit_graph = Compact_Knit_Graph()
+    knit_graph.add_yarn(Yarn("yarn", knit_graph))
+    course = knit_graph.add_course("yarn", [[] for _ in range(0, width)])
+    for _ in range(1, height):
+        course = knit_graph.add_course("yarn", [[parent_id] for parent_id in reversed(course)])
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "stockinette.kg")
+        start = time.perf_counter()
+        write_knit_graph(knit_graph, filename)
+        write_time = time.perf_counter() - start
+        start = time.perf_counter()
+        loaded_graph = read_knit_graph(filename)
+        open_time = time.perf_counter() - start
+        start = time.perf_counter()
+        middle_course = loaded_graph.loops_in_course(height // 2)
+        parents = [loaded_graph.parent_ids(loop_id) for loop_id in middle_course]
+        course_time = time.perf_counter() - start
+        print(f"{width}x{height} stockinette ({len(knit_graph)} loops, {os.path.getsize(filename)} bytes)")
+        print(f"\twrite: {write_time * 1000:.1f}ms, open: {open_time * 1000:.2f}ms, "
+              f"read one course: {course_time * 1000:.2f}ms")
+        del loaded_graph, middle_course, parents
+
+
+def parser_startup_benchmark(interpreters: int = 20):
+    """
+    Prints the time to the first parse in a new process and the time to create each later KnitSpeak_Interpreter
+    :param interpreters: the number of interpreters created after the first parse
+    """
+    first_parse_script = "import time\n" \
+                         "start = time.perf_counter()\n" \
+                         "from knitspeak_compiler.knitspeak_interpreter.knitspeak_interpreter import " \
+                         "KnitSpeak_Interpreter\n" \
+                         "KnitSpeak_Interpreter().interpret('all rs rows k. all ws rows p.')\n" \
+                         "print(time.perf_counter() - start)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    first_parse_time = float(subprocess.run([sys.executable, "-c", first_parse_script], cwd=root, check=True,
+                                            capture_output=True, text=True).stdout)
+    from knitspeak_compiler.knitspeak_interpreter.knitspeak_interpreter import KnitSpeak_Interpreter
+    KnitSpeak_Interpreter()
+    start = time.perf_counter()
+    for _ in range(0, interpreters):
+        KnitSpeak_Interpreter().interpret("all rs rows k. all ws rows p.")
+    later_time = (time.perf_counter() - start) / interpreters
+    print("KnitSpeak_Interpreter startup")
+    print(f"\ttime to first parse (new process, with imports): {first_parse_time * 1000:.1f}ms")
+    print(f"\tlater interpreter and parse: {later_time * 1000:.2f}ms")
+
+
+def knitspeak_compile_benchmark(widths=(40, 30, 20, 10), row_count: int = 100, repetitions: int = 3):
+    """
+    Prints the time to compile each pattern in example_knitspeak by interpreting every course
+    and by running the stitch programs of courses that were already interpreted.
+    Repeats are not tiled so that every row is compiled
+    :param widths: the starting widths tried for each pattern, each pattern is compiled at the first width that works
+    :param row_count: the number of rows compiled
+    :param repetitions: the best time of this many compiles is reported
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    corpus = os.path.join(root, "example_knitspeak")
+    pattern_files = [os.path.join(directory, file_name) for directory in [corpus, os.path.join(corpus, "student_knitout")]
+                     for file_name in sorted(os.listdir(directory)) if file_name.endswith(".ks")]
+    compilers = {"interpreted": Knitspeak_Compiler(Compact_Knit_Graph, precompile_courses=False, tile_repeats=False),
+                 "stitch programs": Knitspeak_Compiler(Compact_Knit_Graph, tile_repeats=False)}
+    totals = {name: 0.0 for name in compilers}
+    print(f"KnitSpeak compile times for {row_count} rows")
+    for pattern_file in pattern_files:
+        times = {}
+        for width in widths:
+            try:
+                for name, compiler in compilers.items():
+                    times[name] = float("inf")
+                    for _ in range(0, repetitions):
+                        start = time.perf_counter()
+                        compiler.compile(width, row_count, pattern_file, patternIsFile=True)
+                        times[name] = min(times[name], time.perf_counter() - start)
+                break
+            except Exception:  # many patterns in the corpus only compile at some widths
+                times = {}
+        name = os.path.relpath(pattern_file, corpus)
+        if len(times) == 0:
+            print(f"\t{name}: does not compile at widths {widths}")
+            continue
+        for compiler_name, compile_time in times.items():
+            totals[compiler_name] += compile_time
+        print(f"\t{name} (width {width}): " + ", ".join(f"{compiler_name} {compile_time * 1000:.1f}ms"
+                                                         for compiler_name, compile_time in times.items()))
+    print("\ttotal: " + ", ".join(f"{name} {total * 1000:.1f}ms" for name, total in totals.items()))
+
+
+if __name__ == "__main__":
+    loop_memory_benchmark()
+    knit_graph_file_benchmark()
+    parser_startup_benchmark()
+    knitspeak_compile_benchmark()
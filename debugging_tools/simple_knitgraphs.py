@@ -1,4 +1,6 @@
 """Simple knitgraph generators used primarily for debugging"""
+from typing import Sequence
+
 from knit_graphs.Knit_Graph import Knit_Graph, Pull_Direction
 from knit_graphs.Yarn import Yarn
 
@@ -13,21 +15,63 @@ def stockinette(width: int = 4, height: int = 4, carrier:int=3) -> Knit_Graph:
     knitGraph = Knit_Graph()
     yarn = Yarn("yarn", knitGraph, carrier_id=carrier)
     knitGraph.add_yarn(yarn)
-    first_row = []
-    for _ in range(0, width):
-        loop_id, loop = yarn.add_loop_to_end()
-        first_row.append(loop_id)
-        knitGraph.add_loop(loop)
+    first_row = knitGraph.add_course(yarn.yarn_id, [[] for _ in range(0, width)])
 
     prior_row = first_row
     for _ in range(1, height):
-        next_row = []
-        for parent_id in reversed(prior_row):
-            child_id, child = yarn.add_loop_to_end()
-            next_row.append(child_id)
-            knitGraph.add_loop(child)
-            knitGraph.connect_loops(parent_id, child_id)
-        prior_row = next_row
+        prior_row = knitGraph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed(prior_row)])
+
+    return knitGraph
+
+
+def stripes(width: int = 4, height: int = 8, stripe_height: int = 2, carriers: Sequence[int] = (3, 4)) -> Knit_Graph:
+    """
+    :param width: the number of stitches of the swatch
+    :param height: the number of courses of the swatch
+    :param stripe_height: the number of courses knit with each yarn before switching to the next yarn
+    :param carriers: the carrier of each yarn, in the order the stripes are knit
+    :return: a knitgraph of stockinette with horizontal stripes, each yarn on its own carrier
+    """
+    knitGraph = Knit_Graph()
+    yarns = [Yarn(f"yarn_{carrier}", knitGraph, carrier_id=carrier) for carrier in carriers]
+    for yarn in yarns:
+        knitGraph.add_yarn(yarn)
+    first_row = knitGraph.add_course(yarns[0].yarn_id, [[] for _ in range(0, width)])
+
+    prior_row = first_row
+    for course in range(1, height):
+        yarn = yarns[(course // stripe_height) % len(yarns)]
+        prior_row = knitGraph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed(prior_row)])
+
+    return knitGraph
+
+
+def vertical_stripes(width: int = 4, height: int = 4, carriers: Sequence[int] = (3, 4)) -> Knit_Graph:
+    """
+    :param width: the number of stitches of the swatch
+    :param height: the number of courses of the swatch
+    :param carriers: the carrier of each yarn, the yarns take turns knitting the columns of the swatch
+    :return: a knitgraph of stockinette with vertical stripes, cast on with the first yarn.
+     Each loop is in the column of its parent, so each yarn always knits the same columns
+    """
+    knitGraph = Knit_Graph()
+    yarns = [Yarn(f"yarn_{carrier}", knitGraph, carrier_id=carrier) for carrier in carriers]
+    for yarn in yarns:
+        knitGraph.add_yarn(yarn)
+    first_row = knitGraph.add_course(yarns[0].yarn_id, [[] for _ in range(0, width)])
+    loop_columns = {loop_id: column for column, loop_id in enumerate(first_row)}  # loop ids to their column
+
+    prior_row = first_row
+    for _ in range(1, height):
+        children = {}  # loop ids in the prior row to their child
+        for stripe, yarn in enumerate(yarns):
+            parent_ids = [parent_id for parent_id in reversed(prior_row)
+                          if loop_columns[parent_id] % len(yarns) == stripe]
+            child_ids = knitGraph.add_course(yarn.yarn_id, [[parent_id] for parent_id in parent_ids])
+            for parent_id, child_id in zip(parent_ids, child_ids):
+                loop_columns[child_id] = loop_columns[parent_id]
+                children[parent_id] = child_id
+        prior_row = [children[parent_id] for parent_id in reversed(prior_row)]
 
     return knitGraph
 
@@ -47,35 +91,23 @@ def rib(width: int = 4, height: int = 4, rib_width: int = 1) -> Knit_Graph:
     knitGraph = Knit_Graph()
     yarn = Yarn("yarn", knitGraph)
     knitGraph.add_yarn(yarn)
-    first_row = []
-    for _ in range(0, width):
-        loop_id, loop = yarn.add_loop_to_end()
-        first_row.append(loop_id)
-        knitGraph.add_loop(loop)
+    first_row = knitGraph.add_course(yarn.yarn_id, [[] for _ in range(0, width)])
 
     prior_row = first_row
-    next_row = []
-    for column, parent_id in reversed([*enumerate(prior_row)]):
-        child_id, child = yarn.add_loop_to_end()
-        next_row.append(child_id)
-        knitGraph.add_loop(child)
+    pull_directions = []
+    for column in reversed(range(0, len(prior_row))):
         rib_id = int(int(column) / int(rib_width))
         if rib_id % 2 == 0:  # even ribs:
-            pull_direction = Pull_Direction.BtF
+            pull_directions.append(Pull_Direction.BtF)
         else:
-            pull_direction = Pull_Direction.FtB
-        knitGraph.connect_loops(parent_id, child_id, pull_direction=pull_direction)
+            pull_directions.append(Pull_Direction.FtB)
+    next_row = knitGraph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed(prior_row)], pull_directions)
 
     for _ in range(2, height):
         prior_row = next_row
-        next_row = []
-        for parent_id in reversed(prior_row):
-            child_id, child = yarn.add_loop_to_end()
-            next_row.append(child_id)
-            knitGraph.add_loop(child)
-            grand_parent = [*knitGraph.graph.predecessors(parent_id)][0]
-            parent_pull_direction = knitGraph.graph[grand_parent][parent_id]["pull_direction"]
-            knitGraph.connect_loops(parent_id, child_id, pull_direction=parent_pull_direction)
+        pull_directions = [*reversed(pull_directions)]  # each loop is pulled in the same direction as its parent
+        next_row = knitGraph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed(prior_row)],
+                                        pull_directions)
 
     return knitGraph
 
@@ -93,34 +125,23 @@ def seed(width: int = 4, height=4) -> Knit_Graph:
     knitGraph = Knit_Graph()
     yarn = Yarn("yarn", knitGraph)
     knitGraph.add_yarn(yarn)
-    first_row = []
-    for _ in range(0, width):
-        loop_id, loop = yarn.add_loop_to_end()
-        first_row.append(loop_id)
-        knitGraph.add_loop(loop)
+    first_row = knitGraph.add_course(yarn.yarn_id, [[] for _ in range(0, width)])
 
     prior_row = first_row
-    next_row = []
-    for column, parent_id in enumerate(reversed(prior_row)):
-        child_id, child = yarn.add_loop_to_end()
-        next_row.append(child_id)
-        knitGraph.add_loop(child)
+    pull_directions = []
+    for column in range(0, len(prior_row)):
         if column % 2 == 0:  # even seed:
-            pull_direction = Pull_Direction.BtF
+            pull_directions.append(Pull_Direction.BtF)
         else:
-            pull_direction = Pull_Direction.FtB
-        knitGraph.connect_loops(parent_id, child_id, pull_direction=pull_direction)
+            pull_directions.append(Pull_Direction.FtB)
+    next_row = knitGraph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed(prior_row)], pull_directions)
 
     for _ in range(2, height):
         prior_row = next_row
-        next_row = []
-        for parent_id in reversed(prior_row):
-            child_id, child = yarn.add_loop_to_end()
-            next_row.append(child_id)
-            knitGraph.add_loop(child)
-            grand_parent = [*knitGraph.graph.predecessors(parent_id)][0]
-            parent_pull_direction = knitGraph.graph[grand_parent][parent_id]["pull_direction"]
-            knitGraph.connect_loops(parent_id, child_id, pull_direction=parent_pull_direction.opposite())
+        # each loop is pulled in the opposite direction of its parent
+        pull_directions = [pull_direction.opposite() for pull_direction in reversed(pull_directions)]
+        next_row = knitGraph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed(prior_row)],
+                                        pull_directions)
 
     return knitGraph
 
@@ -138,23 +159,18 @@ def twisted_stripes(width: int = 4, height=5, left_twists: bool = True) -> Knit_
     knitGraph.add_yarn(yarn)
 
     # Add the first course of loops
-    first_course = []
-    for _ in range(0, width):
-        loop_id, loop = yarn.add_loop_to_end()
-        first_course.append(loop_id)
-        knitGraph.add_loop(loop)
+    first_course = knitGraph.add_course(yarn.yarn_id, [[] for _ in range(0, width)])
 
     def add_loop_and_knit(p_id, depth=0, parent_offset: int = 0):
         """
-        adds a loop by knitting to the knitgraph
+        adds a loop knit through the parent to the next course, which is added to the knitgraph when complete
         :param parent_offset: Set the offset of the parent loop in the cable. offset = parent_index - child_index
         :param p_id: the parent loop's id
         :param depth: the crossing- depth to knit at
         """
-        child_id, child = yarn.add_loop_to_end()
-        next_course.append(child_id)
-        knitGraph.add_loop(child)
-        knitGraph.connect_loops(p_id, child_id, depth=depth, parent_offset=parent_offset)
+        next_parents.append([p_id])
+        next_depths.append(depth)
+        next_offsets.append([parent_offset])
 
     if left_twists:  # set the depth for the first loop in the twist (1 means it will cross in front of other stitches)
         twist_depth = 1
@@ -164,7 +180,7 @@ def twisted_stripes(width: int = 4, height=5, left_twists: bool = True) -> Knit_
     # add new courses
     prior_course = first_course
     for course in range(1, height):
-        next_course = []
+        next_parents, next_depths, next_offsets = [], [], []
         reversed_prior_course = [*reversed(prior_course)]
         for col, parent_id in enumerate(reversed_prior_course):
             if course % 2 == 0 or col % 4 == 0 or col % 4 == 3:  # knit on even rows and before and after twists
@@ -177,7 +193,7 @@ def twisted_stripes(width: int = 4, height=5, left_twists: bool = True) -> Knit_
                 next_parent_id = reversed_prior_course[col - 1]
                 add_loop_and_knit(next_parent_id, depth=twist_depth, parent_offset=-1)
                 twist_depth = -1 * twist_depth  # switch depth for next twist
-        prior_course = next_course
+        prior_course = knitGraph.add_course(yarn.yarn_id, next_parents, depths=next_depths, parent_offsets=next_offsets)
 
     return knitGraph
 
@@ -195,28 +211,23 @@ def both_twists(height=20) -> Knit_Graph:
     knitGraph.add_yarn(yarn)
 
     # Add the first course of loops
-    first_course = []
-    for _ in range(0, width):
-        loop_id, loop = yarn.add_loop_to_end()
-        first_course.append(loop_id)
-        knitGraph.add_loop(loop)
+    first_course = knitGraph.add_course(yarn.yarn_id, [[] for _ in range(0, width)])
 
     def add_loop_and_knit(p_id, depth=0, parent_offset: int = 0):
         """
-        adds a loop by knitting to the knitgraph
+        adds a loop knit through the parent to the next course, which is added to the knitgraph when complete
         :param parent_offset: Set the offset of the parent loop in the cable. offset = parent_index - child_index
         :param p_id: the parent loop's id
         :param depth: the crossing- depth to knit at
         """
-        child_id, child = yarn.add_loop_to_end()
-        next_course.append(child_id)
-        knitGraph.add_loop(child)
-        knitGraph.connect_loops(p_id, child_id, depth=depth, parent_offset=parent_offset)
+        next_parents.append([p_id])
+        next_depths.append(depth)
+        next_offsets.append([parent_offset])
 
     # add new courses
     prior_course = first_course
     for course in range(1, height):
-        next_course = []
+        next_parents, next_depths, next_offsets = [], [], []
         reversed_prior_course = [*reversed(prior_course)]
         for col, parent_id in enumerate(reversed_prior_course):
             if course % 2 == 1 or col in {0, 1, 4, 5,8, 9}:  # knit on odd rows and borders or middle
@@ -233,7 +244,7 @@ def both_twists(height=20) -> Knit_Graph:
             elif col == 7:
                 parent_id = reversed_prior_course[6]
                 add_loop_and_knit(parent_id, depth=-1, parent_offset=1)
-        prior_course = next_course
+        prior_course = knitGraph.add_course(yarn.yarn_id, next_parents, depths=next_depths, parent_offsets=next_offsets)
 
     return knitGraph
 
@@ -294,41 +305,25 @@ def lace(width: int = 4, height: int = 4):
     knitGraph = Knit_Graph()
     yarn = Yarn("yarn", knitGraph)
     knitGraph.add_yarn(yarn)
-    first_row = []
-    for _ in range(0, width):
-        loop_id, loop = yarn.add_loop_to_end()
-        first_row.append(loop_id)
-        knitGraph.add_loop(loop)
-
-    def add_loop_and_knit(p_id, offset: int = 0):
-        """
-        Knits a loop into the graph
-        :param p_id: the id of the parent loop being knit through
-        :return: the id of the child loop created
-        """
-        c_id, c = yarn.add_loop_to_end()
-        next_row.append(c_id)
-        knitGraph.add_loop(c)
-        knitGraph.connect_loops(p_id, c_id, pull_direction=Pull_Direction.BtF, parent_offset=offset)
-        return c_id
+    first_row = knitGraph.add_course(yarn.yarn_id, [[] for _ in range(0, width)])
 
     prior_row = first_row
     for row in range(1, height):
-        next_row = []
+        next_parents, next_offsets = [], []
         prior_parent_id = -1
         reversed_prior_row = [*reversed(prior_row)]
         for col, parent_id in enumerate(reversed_prior_row):
             if row % 2 == 0 or col % 4 == 0 or col % 4 == 3:  # knit on even rows and before and after twists
-                add_loop_and_knit(parent_id)
+                next_parents.append([parent_id])
+                next_offsets.append([0])
             elif col % 4 == 1:
-                child_id, child = yarn.add_loop_to_end()
-                knitGraph.add_loop(child)
-                next_row.append(child_id)  # yarn over
+                next_parents.append([])  # yarn over
+                next_offsets.append([])
                 prior_parent_id = parent_id
-            elif col % 4 == 2:
-                child_id = add_loop_and_knit(parent_id)
-                knitGraph.connect_loops(prior_parent_id, child_id, parent_offset=-1)
-        prior_row = next_row
+            elif col % 4 == 2:  # decrease with the parent skipped by the yarn over on top
+                next_parents.append([parent_id, prior_parent_id])
+                next_offsets.append([0, -1])
+        prior_row = knitGraph.add_course(yarn.yarn_id, next_parents, Pull_Direction.BtF, parent_offsets=next_offsets)
 
     return knitGraph
 
@@ -342,17 +337,9 @@ def lace_and_twist():
     knitGraph = Knit_Graph()
     yarn = Yarn("yarn", knitGraph)
     knitGraph.add_yarn(yarn)
-    first_row = []
-    for _ in range(0, width):
-        loop_id, loop = yarn.add_loop_to_end()
-        first_row.append(loop_id)
-        knitGraph.add_loop(loop)
-
-    next_row = []
-    for _ in range(0, width):
-        child_id, child = yarn.add_loop_to_end()
-        knitGraph.add_loop(child)
-        next_row.append(child_id)
+    knitGraph.add_course(yarn.yarn_id, [[] for _ in range(0, width)])
+
+    next_row = knitGraph.add_course(yarn.yarn_id, [[] for _ in range(0, width)])
     # knit edge
     knitGraph.connect_loops(0, 25)
     knitGraph.connect_loops(12, 13)
@@ -373,10 +360,7 @@ def lace_and_twist():
     knitGraph.connect_loops(8, 16, depth=-1, parent_offset=1)
     knitGraph.connect_loops(9, 17, depth=1, parent_offset=-1)
 
-    for parent_id in reversed(next_row):
-        child_id, child = yarn.add_loop_to_end()
-        knitGraph.add_loop(child)
-        knitGraph.connect_loops(parent_id, child_id)
+    knitGraph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed(next_row)])
 
     return knitGraph
 
@@ -392,65 +376,34 @@ def short_rows(width: int = 10, buffer_height: int = 2) -> Knit_Graph:
     knit_graph = stockinette(width=width, height=buffer_height)
     yarn = [*knit_graph.yarns.values()][0]
 
-    loop_ids_to_course, course_to_loop_ids = knit_graph.get_courses()
-    if len(course_to_loop_ids) == 1:
-        top_course = course_to_loop_ids[0]
-    else:
-        top_course = max(*course_to_loop_ids.keys())
-        top_course = course_to_loop_ids[top_course]
+    top_course = [*knit_graph.loops_in_course(knit_graph.course_count - 1)]
 
     # Knit to last two loops and reserve on left
-    next_row = []
     reversed_top_course = [*reversed(top_course)]
     reserved_top_left = reversed_top_course[-2:]
-    for parent_id in reversed_top_course[:-2]:
-        child_id, child = yarn.add_loop_to_end()
-        next_row.append(child_id)
-        knit_graph.add_loop(child)
-        knit_graph.connect_loops(parent_id, child_id)
+    next_row = knit_graph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed_top_course[:-2]])
 
     # Knit to last two loops and reserve on right
     top_course = next_row
-    next_row = []
     reversed_top_course = [*reversed(top_course)]
     reserved_top_right = reversed_top_course[-2:]
-    for parent_id in reversed_top_course[:-2]:
-        child_id, child = yarn.add_loop_to_end()
-        next_row.append(child_id)
-        knit_graph.add_loop(child)
-        knit_graph.connect_loops(parent_id, child_id)
+    next_row = knit_graph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed_top_course[:-2]])
 
     # Knit over last row and reserved loops on left
     top_course = next_row
-    next_row = []
     reversed_top_course = [*reversed(top_course)]
     reversed_top_course.extend(reserved_top_left)
-    for parent_id in reversed_top_course:
-        child_id, child = yarn.add_loop_to_end()
-        next_row.append(child_id)
-        knit_graph.add_loop(child)
-        knit_graph.connect_loops(parent_id, child_id)
+    next_row = knit_graph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed_top_course])
 
     # knit over last row and reserved loops on right
     top_course = next_row
-    next_row = []
     reversed_top_course = [*reversed(top_course)]
     reversed_top_course.extend(reserved_top_right)
-    for parent_id in reversed_top_course:
-        child_id, child = yarn.add_loop_to_end()
-        next_row.append(child_id)
-        knit_graph.add_loop(child)
-        knit_graph.connect_loops(parent_id, child_id)
+    next_row = knit_graph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed_top_course])
 
     # add 5 stst rows
     prior_row = next_row
     for _ in range(0, buffer_height):
-        next_row = []
-        for parent_id in reversed(prior_row):
-            child_id, child = yarn.add_loop_to_end()
-            next_row.append(child_id)
-            knit_graph.add_loop(child)
-            knit_graph.connect_loops(parent_id, child_id)
-        prior_row = next_row
+        prior_row = knit_graph.add_course(yarn.yarn_id, [[parent_id] for parent_id in reversed(prior_row)])
 
     return knit_graph
@@ -0,0 +1,702 @@
+"""An array-backed knit graph structure used for large knitted objects"""
+from array import array
+from mmap import mmap
+from typing import Dict, Iterator, List, Optional, Tuple, Sequence, Set, Union
+
+from knit_graphs.Knit_Graph import Knit_Graph, Pull_Direction
+from knit_graphs.Loop import Loop
+from knit_graphs.Yarn import Yarn
+
+_PULL_DIRECTIONS: List[Pull_Direction] = [Pull_Direction.BtF, Pull_Direction.FtB]
+_PULL_DIRECTION_CODES: Dict[Pull_Direction, int] = {Pull_Direction.BtF: 0, Pull_Direction.FtB: 1}
+_NO_LOOP = -1  # yarn index used to mark loop ids that are not in the graph
+
+
+class Compact_Knit_Graph(Knit_Graph):
+    """
+    A Knit_Graph that keeps loops and stitch edges in contiguous typed arrays instead of a networkx graph
+    ...
+    Loops are indexed directly by their loop_id, so loops must be added in increasing id order.
+    The parents of each child loop are kept in a contiguous block of the edge arrays (CSR adjacency).
+    Blocks are always at the end of the edge arrays while a child is being connected,
+     a block that is extended after another child was connected is moved to the end of the arrays.
+    The children of each parent are indexed the same way once they are first queried, so removing a loop
+     only visits its own children.
+    Loop objects are not stored, they are created from the arrays when the graph is indexed.
+    Graphs loaded by knit_graph_io.read_knit_graph are read-only and their arrays are memoryviews over the file.
+
+    Attributes
+    ----------
+    graph : _Compact_Graph_View
+        A read-only view supporting the networkx.DiGraph queries used on knit graphs
+    loops: _Compact_Loop_View
+        A map of each unique loop id to its loop
+    yarns: Dict[str, Yarn]
+         A list of Yarns used in the graph
+    """
+
+    def __init__(self):
+        self.last_loop_id: int = -1
+        self.yarns: Dict[str, Yarn] = {}
+        self._yarn_table: List[str] = []  # yarn ids by their index in self._loop_yarns
+        self._yarn_indices: Dict[str, int] = {}
+        self._loop_yarns: array = array("h")  # yarn index of each loop id, _NO_LOOP if the id is not in the graph
+        self._loop_twisted: array = array("b")
+        self._loop_count: int = 0
+        self._edge_starts: array = array("q")  # start of each child's parent block in the edge arrays
+        self._edge_counts: array = array("h")  # the number of parents of each child
+        self._edge_parents: array = array("q")
+        self._edge_pull_directions: array = array("b")
+        self._edge_depths: array = array("b")
+        self._edge_offsets: array = array("i")
+        self._edge_stack_positions: array = array("h")  # position of the parent in the child's parent stack
+        self._dead_edges: int = 0  # edge slots left behind by moved blocks
+        self._child_starts: array = array("q")  # start of each parent's child block in self._child_ids
+        self._child_counts: array = array("i")  # the number of children of each parent
+        self._child_ids: Optional[array] = None  # child ids grouped by parent, None until children are queried
+        self._loop_courses: array = array("i")  # course of each loop id, -1 if the id is not in the graph
+        self._course_starts: array = array("q")  # the first loop id of each course
+        self._course_index_is_valid: bool = True
+        self._course_maps: Optional[Tuple[Dict[int, int], Dict[int, List[int]]]] = None  # cached get_courses result
+        self._buffer: Optional[mmap] = None  # the memory-mapped file the arrays are read from, None if writable
+        self.graph: _Compact_Graph_View = _Compact_Graph_View(self)
+        self.loops: _Compact_Loop_View = _Compact_Loop_View(self)
+
+    def add_loop(self, loop: Loop):
+        """
+        :param loop: the loop to be added in as a node in the graph
+        """
+        assert self._buffer is None, "Cannot add loops to a read-only knit graph"
+        assert loop.yarn_id in self.yarns, f"No yarn {loop.yarn_id} in this graph"
+        assert loop.loop_id >= len(self._loop_yarns), \
+            f"Loop {loop.loop_id} must be added after loop {len(self._loop_yarns) - 1}"
+        if loop not in self.yarns[loop.yarn_id]:  # make sure the loop is on the yarn specified
+            self.yarns[loop.yarn_id].add_loop_to_end(loop_id=None, loop=loop)
+        self._skip_to_loop_id(loop.loop_id)
+        self._loop_yarns.append(self._yarn_indices[loop.yarn_id])
+        self._loop_twisted.append(int(loop.is_twisted))
+        self._edge_starts.append(len(self._edge_parents))
+        self._edge_counts.append(0)
+        self._loop_courses.append(-1)
+        self._loop_count += 1
+        self._add_child_blocks(1)
+        self._index_new_loop(loop.loop_id)
+
+    def _skip_to_loop_id(self, loop_id: int):
+        """
+        Marks the ids between the last loop in the arrays and the given loop id as missing
+        :param loop_id: the id of the next loop added to the arrays
+        """
+        gap = loop_id - len(self._loop_yarns)
+        if gap > 0:  # ids skipped over are marked as missing
+            self._loop_yarns.extend([_NO_LOOP] * gap)
+            self._loop_twisted.extend([0] * gap)
+            self._edge_starts.extend([0] * gap)
+            self._edge_counts.extend([0] * gap)
+            self._loop_courses.extend([-1] * gap)
+            self._add_child_blocks(gap)
+
+    def _missing_loop_ids(self, loop_ids: Set[int]) -> Set[int]:
+        """
+        :param loop_ids: the loop ids to look for
+        :return: the loop ids that are not in the graph
+        """
+        loop_yarns = self._loop_yarns
+        return {loop_id for loop_id in loop_ids
+                if not 0 <= loop_id < len(loop_yarns) or loop_yarns[loop_id] == _NO_LOOP}
+
+    def add_course(self, yarn_id: str, parent_ids: Sequence[Sequence[int]],
+                   pull_directions: Union[Pull_Direction, Sequence[Pull_Direction]] = Pull_Direction.BtF,
+                   depths: Union[int, Sequence[int]] = 0,
+                   parent_offsets: Optional[Sequence[Sequence[int]]] = None,
+                   is_twisted: bool = False) -> List[int]:
+        """
+        Adds a course of new loops at the end of the yarn, see Knit_Graph.add_course
+        """
+        assert self._buffer is None, "Cannot add loops to a read-only knit graph"
+        return super().add_course(yarn_id, parent_ids, pull_directions, depths, parent_offsets, is_twisted)
+
+    @property
+    def is_read_only(self) -> bool:
+        """
+        :return: True if the graph was loaded from a file and cannot be changed
+        """
+        return self._buffer is not None
+
+    def _add_course_loops(self, yarn_id: str, loop_ids: range, parent_ids: Sequence[Sequence[int]],
+                          pull_directions: Sequence[Pull_Direction], depths: Sequence[int],
+                          parent_offsets: Sequence[Sequence[int]], is_twisted: bool):
+        """
+        Adds a validated course of loops that are already on the yarn by extending each array once, see add_course
+        """
+        if len(loop_ids) == 0:
+            return
+        assert loop_ids.start >= len(self._loop_yarns), \
+            f"Loop {loop_ids.start} must be added after loop {len(self._loop_yarns) - 1}"
+        self._skip_to_loop_id(loop_ids.start)
+        loop_count = len(loop_ids)
+        edge_counts = [len(parents) for parents in parent_ids]
+        edge_starts = []
+        next_start = len(self._edge_parents)
+        for count in edge_counts:
+            edge_starts.append(next_start)
+            next_start += count
+        self._loop_yarns.extend([self._yarn_indices[yarn_id]] * loop_count)
+        self._loop_twisted.extend([int(is_twisted)] * loop_count)
+        self._edge_starts.extend(edge_starts)
+        self._edge_counts.extend(edge_counts)
+        self._loop_courses.extend([-1] * loop_count)
+        self._loop_count += loop_count
+        self._add_child_blocks(loop_count)
+        for loop_id, parents, pull_direction, depth, offsets in zip(loop_ids, parent_ids, pull_directions, depths,
+                                                                     parent_offsets):
+            self._edge_parents.extend(parents)
+            self._edge_pull_directions.extend([_PULL_DIRECTION_CODES[pull_direction]] * len(parents))
+            self._edge_depths.extend([depth] * len(parents))
+            self._edge_offsets.extend(offsets)
+            self._edge_stack_positions.extend(range(0, len(parents)))
+            for parent_id in parents:
+                self._add_child(parent_id, loop_id)
+        self._index_new_course(loop_ids, parent_ids)
+
+    def _index_new_course(self, loop_ids: range, parent_ids: Sequence[Sequence[int]]):
+        """
+        Adds a course of new loops to the course index, starting a new course at each loop with a parent on the current course
+        :param loop_ids: the ids of the new loops
+        :param parent_ids: the parents of each new loop
+        """
+        self._course_maps = None
+        if not self._course_index_is_valid:
+            return
+        loop_courses = self._loop_courses
+        course_starts = self._course_starts
+        if len(course_starts) == 0:
+            course_starts.append(loop_ids.start)
+        course = len(course_starts) - 1
+        for loop_id, parents in zip(loop_ids, parent_ids):
+            if course_starts[course] != loop_id and any(loop_courses[parent_id] == course for parent_id in parents):
+                course_starts.append(loop_id)
+                course += 1
+            loop_courses[loop_id] = course
+
+    def remove_loop(self, loop_id: int):
+        """
+        Removes the loop and its stitch edges from the graph. The course index is rebuilt on the next course query
+        :param loop_id: the id of the loop to remove
+        """
+        assert self._buffer is None, "Cannot remove loops from a read-only knit graph"
+        assert loop_id in self, f"loop {loop_id} is not in this graph"
+        for child_id in [*self.graph.successors(loop_id)]:  # remove the stitches the loop is a parent of
+            self._remove_edge(child_id, self._edge_index(loop_id, child_id))
+        self._child_counts[loop_id] = 0
+        for parent_id in self.graph.predecessors(loop_id):
+            self._remove_child(parent_id, loop_id)
+        self._dead_edges += self._edge_counts[loop_id]
+        self._edge_counts[loop_id] = 0
+        yarn_id = self._yarn_table[self._loop_yarns[loop_id]]
+        self._loop_yarns[loop_id] = _NO_LOOP
+        self._loop_count -= 1
+        self.yarns[yarn_id].remove_loop(loop_id)
+        self._course_index_is_valid = False
+        self._course_maps = None
+
+    def _remove_edge(self, child_loop_id: int, removed_edge: int):
+        """
+        Moves the child's parent block to the end of the edge arrays without the removed edge
+        :param child_loop_id: the child of the removed edge
+        :param removed_edge: the index of the edge to remove
+        """
+        start = self._edge_starts[child_loop_id]
+        count = self._edge_counts[child_loop_id]
+        removed_stack_position = self._edge_stack_positions[removed_edge]
+        self._edge_starts[child_loop_id] = len(self._edge_parents)
+        for edge in range(start, start + count):
+            if edge != removed_edge:
+                stack_position = self._edge_stack_positions[edge]
+                if stack_position > removed_stack_position:
+                    stack_position -= 1
+                self._edge_parents.append(self._edge_parents[edge])
+                self._edge_pull_directions.append(self._edge_pull_directions[edge])
+                self._edge_depths.append(self._edge_depths[edge])
+                self._edge_offsets.append(self._edge_offsets[edge])
+                self._edge_stack_positions.append(stack_position)
+        self._edge_counts[child_loop_id] = count - 1
+        self._dead_edges += count
+
+    def _index_children(self):
+        """
+        Builds the child index from the parent blocks of every loop, with the children of each parent in one block
+        """
+        id_span = len(self._loop_yarns)
+        child_counts = array("i", [0]) * id_span
+        for child_id in self.graph.nodes:
+            for parent_id in self.graph.predecessors(child_id):
+                child_counts[parent_id] += 1
+        child_starts = array("q", [0]) * id_span
+        next_start = 0
+        for loop_id in range(0, id_span):
+            child_starts[loop_id] = next_start
+            next_start += child_counts[loop_id]
+        child_ids = array("q", [0]) * next_start
+        filled = array("i", [0]) * id_span
+        for child_id in self.graph.nodes:
+            for parent_id in self.graph.predecessors(child_id):
+                child_ids[child_starts[parent_id] + filled[parent_id]] = child_id
+                filled[parent_id] += 1
+        self._child_starts = child_starts
+        self._child_counts = child_counts
+        self._child_ids = child_ids
+
+    def child_ids(self, parent_loop_id: int) -> Sequence[int]:
+        """
+        :param parent_loop_id: the parent loop to find children of
+        :return: the ids of the loops pulled through the parent
+        """
+        if self._child_ids is None:
+            self._index_children()
+        start = self._child_starts[parent_loop_id]
+        return self._child_ids[start:start + self._child_counts[parent_loop_id]]
+
+    def _add_child_blocks(self, count: int):
+        """
+        Adds empty child blocks for new loop ids to the child index
+        :param count: the number of new loop ids
+        """
+        if self._child_ids is not None:
+            self._child_starts.extend([len(self._child_ids)] * count)
+            self._child_counts.extend([0] * count)
+
+    def _add_child(self, parent_loop_id: int, child_loop_id: int):
+        """
+        Adds a new child to the parent's block in the child index, moving the block to the end of the index if needed
+        :param parent_loop_id: the parent of the new stitch edge
+        :param child_loop_id: the child of the new stitch edge
+        """
+        child_ids = self._child_ids
+        if child_ids is None:
+            return
+        start = self._child_starts[parent_loop_id]
+        count = self._child_counts[parent_loop_id]
+        if start + count != len(child_ids):  # move the parent's block to the end of the index
+            self._child_starts[parent_loop_id] = len(child_ids)
+            child_ids.extend(child_ids[start:start + count])
+        child_ids.append(child_loop_id)
+        self._child_counts[parent_loop_id] = count + 1
+
+    def _remove_child(self, parent_loop_id: int, child_loop_id: int):
+        """
+        Removes a child from the parent's block in the child index, keeping the order of the other children
+        :param parent_loop_id: the parent of the removed stitch edge
+        :param child_loop_id: the child of the removed stitch edge
+        """
+        child_ids = self._child_ids
+        if child_ids is None:
+            return
+        start = self._child_starts[parent_loop_id]
+        end = start + self._child_counts[parent_loop_id]
+        for index in range(start, end):
+            if child_ids[index] == child_loop_id:
+                child_ids[index:end - 1] = child_ids[index + 1:end]
+                self._child_counts[parent_loop_id] -= 1
+                return
+
+    def add_yarn(self, yarn: Yarn):
+        """
+        :param yarn: the yarn to be added to the graph structure
+        """
+        if yarn.yarn_id not in self._yarn_indices:
+            self._yarn_indices[yarn.yarn_id] = len(self._yarn_table)
+            self._yarn_table.append(yarn.yarn_id)
+        self.yarns[yarn.yarn_id] = yarn
+
+    def connect_loops(self, parent_loop_id: int, child_loop_id: int,
+                      pull_direction: Pull_Direction = Pull_Direction.BtF,
+                      stack_position: Optional[int] = None, depth: int = 0, parent_offset: int = 0):
+        """
+        Creates a stitch-edge by connecting a parent and child loop
+        :param parent_offset: The direction and distance, oriented from the front, to the parent_loop
+        :param depth: -1, 0, 1: The crossing depth in a cable over other stitches. 0 if Not crossing other stitches
+        :param parent_loop_id: the id of the parent loop to connect to this child
+        :param child_loop_id:  the id of the child loop to connect to the parent
+        :param pull_direction: the direction the child is pulled through the parent
+        :param stack_position: The position to insert the parent into, by default add on top of the stack
+        """
+        assert self._buffer is None, "Cannot connect loops in a read-only knit graph"
+        assert parent_loop_id in self, f"parent loop {parent_loop_id} is not in this graph"
+        assert child_loop_id in self, f"child loop {child_loop_id} is not in this graph"
+        start = self._edge_starts[child_loop_id]
+        count = self._edge_counts[child_loop_id]
+        for edge in range(start, start + count):
+            if self._edge_parents[edge] == parent_loop_id:  # update the existing edge like networkx
+                self._edge_pull_directions[edge] = _PULL_DIRECTION_CODES[pull_direction]
+                self._edge_depths[edge] = depth
+                self._edge_offsets[edge] = parent_offset
+                return
+        if start + count != len(self._edge_parents):  # move the child's block to the end of the edge arrays
+            start = self._move_edge_block(child_loop_id)
+        if stack_position is None:
+            stack_position = count
+        else:
+            for edge in range(start, start + count):  # push up parents above the inserted parent
+                if self._edge_stack_positions[edge] >= stack_position:
+                    self._edge_stack_positions[edge] += 1
+        self._edge_parents.append(parent_loop_id)
+        self._edge_pull_directions.append(_PULL_DIRECTION_CODES[pull_direction])
+        self._edge_depths.append(depth)
+        self._edge_offsets.append(parent_offset)
+        self._edge_stack_positions.append(stack_position)
+        self._edge_counts[child_loop_id] = count + 1
+        self._add_child(parent_loop_id, child_loop_id)
+        self._index_new_edge(parent_loop_id, child_loop_id)
+
+    def _move_edge_block(self, child_loop_id: int) -> int:
+        """
+        Copies the parent block of the child to the end of the edge arrays
+        :param child_loop_id: the child loop whose parents are moved
+        :return: the new start of the child's block
+        """
+        start = self._edge_starts[child_loop_id]
+        end = start + self._edge_counts[child_loop_id]
+        new_start = len(self._edge_parents)
+        self._edge_parents.extend(self._edge_parents[start:end])
+        self._edge_pull_directions.extend(self._edge_pull_directions[start:end])
+        self._edge_depths.extend(self._edge_depths[start:end])
+        self._edge_offsets.extend(self._edge_offsets[start:end])
+        self._edge_stack_positions.extend(self._edge_stack_positions[start:end])
+        self._edge_starts[child_loop_id] = new_start
+        self._dead_edges += end - start
+        return new_start
+
+    def _index_new_loop(self, loop_id: int):
+        """
+        Adds a newly created loop to the current (last) course of the course index
+        :param loop_id: the id of the new loop
+        """
+        self._course_maps = None
+        if not self._course_index_is_valid:
+            return
+        if len(self._course_starts) == 0:
+            self._course_starts.append(loop_id)
+        self._loop_courses[loop_id] = len(self._course_starts) - 1
+
+    def _index_new_edge(self, parent_loop_id: int, child_loop_id: int):
+        """
+        Updates the course index for a new stitch edge.
+        A stitch into the last loop added starts a new course if its parent is on the current course.
+        A stitch into any other loop may shift later course boundaries, so the index is rebuilt on the next query
+        :param parent_loop_id: the parent of the new stitch edge
+        :param child_loop_id: the child of the new stitch edge
+        """
+        self._course_maps = None
+        if not self._course_index_is_valid or parent_loop_id == child_loop_id:
+            return
+        course = len(self._course_starts) - 1
+        if child_loop_id == len(self._loop_yarns) - 1:
+            if self._loop_courses[parent_loop_id] == course and self._course_starts[course] != child_loop_id:
+                self._course_starts.append(child_loop_id)  # the child starts the next course
+                self._loop_courses[child_loop_id] = course + 1
+        elif self._loop_courses[parent_loop_id] == self._loop_courses[child_loop_id]:
+            self._course_index_is_valid = False
+
+    def _rebuild_course_index(self):
+        """
+        Recomputes the course index from every loop in the graph
+        """
+        loop_courses = array("i", [-1]) * len(self._loop_yarns)
+        course_starts = array("q")
+        for loop_id in self.graph.nodes:
+            if len(course_starts) == 0:
+                course_starts.append(loop_id)
+            course = len(course_starts) - 1
+            for parent_id in self.graph.predecessors(loop_id):
+                if loop_courses[parent_id] == course:  # parent is on the current course, start a new course
+                    course_starts.append(loop_id)
+                    course += 1
+                    break
+            loop_courses[loop_id] = course
+        self._loop_courses = loop_courses
+        self._course_starts = course_starts
+        self._course_index_is_valid = True
+
+    def course_of(self, loop_id: int) -> int:
+        """
+        :param loop_id: the loop to find the course of
+        :return: the course the loop is on
+        """
+        if not self._course_index_is_valid:
+            self._rebuild_course_index()
+        assert loop_id in self, f"loop {loop_id} is not in this graph"
+        return self._loop_courses[loop_id]
+
+    def loops_in_course(self, course: int) -> List[int]:
+        """
+        :param course: the course to get loops from
+        :return: the loop ids on the course in the order of creation
+        """
+        if not self._course_index_is_valid:
+            self._rebuild_course_index()
+        start = self._course_starts[course]
+        if course + 1 < len(self._course_starts):
+            end = self._course_starts[course + 1]
+        else:
+            end = len(self._loop_yarns)
+        loop_yarns = self._loop_yarns
+        return [loop_id for loop_id in range(start, end) if loop_yarns[loop_id] != _NO_LOOP]
+
+    @property
+    def course_count(self) -> int:
+        """
+        :return: the number of courses in the graph
+        """
+        if not self._course_index_is_valid:
+            self._rebuild_course_index()
+        return len(self._course_starts)
+
+    def get_courses(self) -> Tuple[Dict[int, int], Dict[int, List[int]]]:
+        """
+        The dictionaries are built from the course index once and reused until the graph changes.
+        The returned dictionaries belong to the graph and should not be modified
+        :return: A dictionary of loop_ids to the course they are on,
+        a dictionary or course ids to the loops on that course in the order of creation
+        """
+        if self._course_maps is None:
+            course_to_loop_ids = {course: self.loops_in_course(course) for course in range(0, self.course_count)}
+            loop_ids_to_course = {loop_id: course for course, loop_ids in course_to_loop_ids.items()
+                                  for loop_id in loop_ids}
+            self._course_maps = loop_ids_to_course, course_to_loop_ids
+        return self._course_maps
+
+    def parent_ids(self, child_loop_id: int) -> List[int]:
+        """
+        :param child_loop_id: the child loop to find parents of
+        :return: the ids of the parent loops in stacking order, with the bottom of the stack first
+        """
+        start = self._edge_starts[child_loop_id]
+        end = start + self._edge_counts[child_loop_id]
+        stack = sorted(range(start, end), key=self._edge_stack_positions.__getitem__)
+        return [self._edge_parents[edge] for edge in stack]
+
+    def _edge_index(self, parent_loop_id: int, child_loop_id: int) -> Optional[int]:
+        """
+        :param parent_loop_id: the parent of the stitch edge
+        :param child_loop_id: the child of the stitch edge
+        :return: the index of the edge in the edge arrays or None if there is no such edge
+        """
+        if not self.graph.has_node(child_loop_id):
+            return None
+        start = self._edge_starts[child_loop_id]
+        for edge in range(start, start + self._edge_counts[child_loop_id]):
+            if self._edge_parents[edge] == parent_loop_id:
+                return edge
+        return None
+
+    def _edge_data(self, edge: int) -> Dict:
+        """
+        :param edge: the index of the edge in the edge arrays
+        :return: the stitch-edge attributes keyed like the networkx edge data
+        """
+        return {"pull_direction": _PULL_DIRECTIONS[self._edge_pull_directions[edge]],
+                "depth": self._edge_depths[edge],
+                "parent_offset": self._edge_offsets[edge]}
+
+    def _make_loop(self, loop_id: int) -> Loop:
+        """
+        :param loop_id: the id of the loop to create
+        :return: a Loop holding the loop's data and parent stack from the arrays
+        """
+        loop = Loop(loop_id, self._yarn_table[self._loop_yarns[loop_id]], bool(self._loop_twisted[loop_id]))
+        loop.parent_loop_ids = array("q", self.parent_ids(loop_id))
+        return loop
+
+    def __contains__(self, item):
+        """
+        :param item: the loop being checked for in the graph
+        :return: true if the loop_id of item or the loop is in the graph
+        """
+        if type(item) is int:
+            return self.graph.has_node(item)
+        elif isinstance(item, Loop):
+            return self.graph.has_node(item.loop_id)
+        else:
+            return False
+
+    def __getitem__(self, item: int) -> Loop:
+        """
+        :param item: the loop_id being checked for in the graph
+        :return: a Loop created from the graph's data with the matching id. Changes to it are not kept in the graph
+        """
+        if item not in self:
+            raise AttributeError
+        else:
+            return self._make_loop(item)
+
+    def __len__(self) -> int:
+        return self._loop_count
+
+
+class _Compact_Loop_View:
+    """
+    A read-only mapping of loop ids to Loops created from a Compact_Knit_Graph
+    """
+
+    def __init__(self, knit_graph: Compact_Knit_Graph):
+        self._knit_graph: Compact_Knit_Graph = knit_graph
+
+    def __getitem__(self, item: int) -> Loop:
+        if item not in self._knit_graph:
+            raise KeyError(item)
+        return self._knit_graph[item]
+
+    def __contains__(self, item) -> bool:
+        return item in self._knit_graph
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._knit_graph.graph.nodes)
+
+    def __len__(self) -> int:
+        return len(self._knit_graph)
+
+    def keys(self) -> Iterator[int]:
+        """
+        :return: the loop ids in the graph
+        """
+        return iter(self)
+
+    def values(self) -> Iterator[Loop]:
+        """
+        :return: the loops in the graph in order of loop ids
+        """
+        return (self._knit_graph[loop_id] for loop_id in self)
+
+    def items(self) -> Iterator[Tuple[int, Loop]]:
+        """
+        :return: the loop ids and loops in the graph in order of loop ids
+        """
+        return ((loop_id, self._knit_graph[loop_id]) for loop_id in self)
+
+
+class _Compact_Node_View:
+    """
+    A view of the loop ids in a Compact_Knit_Graph, matches networkx node views
+    """
+
+    def __init__(self, knit_graph: Compact_Knit_Graph):
+        self._knit_graph: Compact_Knit_Graph = knit_graph
+
+    def __iter__(self) -> Iterator[int]:
+        loop_yarns = self._knit_graph._loop_yarns
+        return (loop_id for loop_id in range(0, len(loop_yarns)) if loop_yarns[loop_id] != _NO_LOOP)
+
+    def __len__(self) -> int:
+        return len(self._knit_graph)
+
+    def __contains__(self, item) -> bool:
+        return self._knit_graph.graph.has_node(item)
+
+    def __getitem__(self, item: int) -> Dict[str, Loop]:
+        return {"loop": self._knit_graph[item]}
+
+
+class _Compact_Adjacency_View:
+    """
+    A view of the children of one parent loop, matches networkx adjacency views for graph[parent][child] lookups
+    """
+
+    def __init__(self, knit_graph: Compact_Knit_Graph, parent_loop_id: int):
+        self._knit_graph: Compact_Knit_Graph = knit_graph
+        self._parent_loop_id: int = parent_loop_id
+
+    def __getitem__(self, child_loop_id: int) -> Dict:
+        edge = self._knit_graph._edge_index(self._parent_loop_id, child_loop_id)
+        if edge is None:
+            raise KeyError(child_loop_id)
+        return self._knit_graph._edge_data(edge)
+
+    def __contains__(self, child_loop_id: int) -> bool:
+        return self._knit_graph._edge_index(self._parent_loop_id, child_loop_id) is not None
+
+
+class _Compact_Graph_View:
+    """
+    A read-only stand in for the networkx.DiGraph of a Knit_Graph that answers queries from the compact arrays
+    """
+
+    def __init__(self, knit_graph: Compact_Knit_Graph):
+        self._knit_graph: Compact_Knit_Graph = knit_graph
+
+    @property
+    def nodes(self) -> _Compact_Node_View:
+        """
+        :return: a view of the loop ids in the graph in increasing order
+        """
+        return _Compact_Node_View(self._knit_graph)
+
+    @property
+    def edges(self) -> Iterator[Tuple[int, int]]:
+        """
+        :return: the parent and child ids of every stitch edge, grouped by child loop
+        """
+        for child_id in self.nodes:
+            for parent_id in self.predecessors(child_id):
+                yield parent_id, child_id
+
+    def has_node(self, loop_id) -> bool:
+        """
+        :param loop_id: the loop id to check for
+        :return: True if the loop is in the graph
+        """
+        loop_yarns = self._knit_graph._loop_yarns
+        return type(loop_id) is int and 0 <= loop_id < len(loop_yarns) and loop_yarns[loop_id] != _NO_LOOP
+
+    def has_edge(self, parent_loop_id: int, child_loop_id: int) -> bool:
+        """
+        :param parent_loop_id: the parent of the stitch edge
+        :param child_loop_id: the child of the stitch edge
+        :return: True if the parent is connected to the child
+        """
+        return self._knit_graph._edge_index(parent_loop_id, child_loop_id) is not None
+
+    def predecessors(self, loop_id: int) -> Iterator[int]:
+        """
+        :param loop_id: the child loop
+        :return: the parent loop ids in the order the stitch-edges were made
+        """
+        knit_graph = self._knit_graph
+        start = knit_graph._edge_starts[loop_id]
+        return iter(knit_graph._edge_parents[start:start + knit_graph._edge_counts[loop_id]])
+
+    def successors(self, loop_id: int) -> Iterator[int]:
+        """
+        :param loop_id: the parent loop
+        :return: the child loop ids
+        """
+        return iter(self._knit_graph.child_ids(loop_id))
+
+    def in_degree(self, loop_id: int) -> int:
+        """
+        :param loop_id: the child loop
+        :return: the number of parent loops
+        """
+        return self._knit_graph._edge_counts[loop_id]
+
+    def number_of_nodes(self) -> int:
+        """
+        :return: the number of loops in the graph
+        """
+        return len(self._knit_graph)
+
+    def number_of_edges(self) -> int:
+        """
+        :return: the number of stitch edges in the graph
+        """
+        knit_graph = self._knit_graph
+        return len(knit_graph._edge_parents) - knit_graph._dead_edges
+
+    def __getitem__(self, parent_loop_id: int) -> _Compact_Adjacency_View:
+        return _Compact_Adjacency_View(self._knit_graph, parent_loop_id)
+
+    def __contains__(self, loop_id) -> bool:
+        return self.has_node(loop_id)
+
+    def __len__(self) -> int:
+        return len(self._knit_graph)
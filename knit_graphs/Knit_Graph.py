@@ -1,6 +1,7 @@
 """The graph structure used to represent knitted objects"""
+from array import array
 from enum import Enum
-from typing import Dict, Optional, List, Tuple
+from typing import Dict, Optional, List, Tuple, Set, Sequence, Union
 
 import networkx
 
@@ -50,16 +51,38 @@ class Knit_Graph:
         self.loops: Dict[int, Loop] = {}
         self.last_loop_id: int = -1
         self.yarns: Dict[str, Yarn] = {}
+        # course index maintained as loops and stitches are added, see get_courses
+        self._loop_ids_to_course: Dict[int, int] = {}
+        self._course_to_loop_ids: Dict[int, List[int]] = {}
+        self._current_course_set: Set[int] = set()
+        self._course_index_is_valid: bool = True
 
     def add_loop(self, loop: Loop):
         """
         :param loop: the loop to be added in as a node in the graph
         """
+        is_new_loop = loop.loop_id not in self
         self.graph.add_node(loop.loop_id, loop=loop)
         assert loop.yarn_id in self.yarns, f"No yarn {loop.yarn_id} in this graph"
         if loop not in self.yarns[loop.yarn_id]:  # make sure the loop is on the yarn specified
             self.yarns[loop.yarn_id].add_loop_to_end(loop_id=None, loop=loop)
         self.loops[loop.loop_id] = loop
+        if is_new_loop:
+            self._index_new_loop(loop.loop_id)
+
+    def remove_loop(self, loop_id: int):
+        """
+        Removes the loop and its stitch edges from the graph. The course index is rebuilt on the next course query
+        :param loop_id: the id of the loop to remove
+        """
+        assert loop_id in self, f"loop {loop_id} is not in this graph"
+        loop = self.loops[loop_id]
+        for child_id in self.graph.successors(loop_id):
+            self.loops[child_id].remove_parent_loop(loop_id)
+        self.graph.remove_node(loop_id)
+        del self.loops[loop_id]
+        self.yarns[loop.yarn_id].remove_loop(loop_id)
+        self._course_index_is_valid = False
 
     def add_yarn(self, yarn: Yarn):
         """
@@ -83,16 +106,171 @@ class Knit_Graph:
         assert child_loop_id in self, f"child loop {child_loop_id} is not in this graph"
         self.graph.add_edge(parent_loop_id, child_loop_id, pull_direction=pull_direction, depth=depth, parent_offset=parent_offset)
         child_loop = self[child_loop_id]
-        parent_loop = self[parent_loop_id]
-        child_loop.add_parent_loop(parent_loop, stack_position)
+        child_loop.add_parent_loop(parent_loop_id, stack_position)
+        self._index_new_edge(parent_loop_id, child_loop_id)
+
+    def add_course(self, yarn_id: str, parent_ids: Sequence[Sequence[int]],
+                   pull_directions: Union[Pull_Direction, Sequence[Pull_Direction]] = Pull_Direction.BtF,
+                   depths: Union[int, Sequence[int]] = 0,
+                   parent_offsets: Optional[Sequence[Sequence[int]]] = None,
+                   is_twisted: bool = False) -> List[int]:
+        """
+        Adds a course of new loops at the end of the yarn and connects each new loop to its parent loops.
+        The whole course is validated before the graph is changed
+        :param yarn_id: the yarn the new loops are made on
+        :param parent_ids: for each new loop in yarn-wise order, the stack of its parent loop ids with the bottom first.
+            An empty stack creates a loop without parents (e.g., a yarn-over or a cast-on loop)
+        :param pull_directions: the pull direction of each new loop through its parents or one direction for every loop
+        :param depths: the crossing depth of each new loop or one depth for every loop
+        :param parent_offsets: for each new loop, the offsets to each of its parents. By default, all offsets are 0
+        :param is_twisted: True if the new loops should be twisted
+        :return: the ids of the new loops in yarn-wise order
+        """
+        assert yarn_id in self.yarns, f"No yarn {yarn_id} in this graph"
+        loop_count = len(parent_ids)
+        if isinstance(pull_directions, Pull_Direction):
+            pull_directions = [pull_directions] * loop_count
+        if isinstance(depths, int):
+            depths = [depths] * loop_count
+        if parent_offsets is None:
+            parent_offsets = [[0] * len(parents) for parents in parent_ids]
+        assert len(pull_directions) == loop_count, f"Expected {loop_count} pull directions, got {len(pull_directions)}"
+        assert len(depths) == loop_count, f"Expected {loop_count} depths, got {len(depths)}"
+        assert len(parent_offsets) == loop_count, f"Expected {loop_count} parent offset stacks, got {len(parent_offsets)}"
+        assert all(len(parents) == len(offsets) for parents, offsets in zip(parent_ids, parent_offsets)), \
+            "Each parent loop needs a parent offset"
+        all_parent_ids = [parent_id for parents in parent_ids for parent_id in parents]
+        parent_set = set(all_parent_ids)
+        assert len(parent_set) == len(all_parent_ids), "A parent loop is used more than once in the course"
+        missing_parents = self._missing_loop_ids(parent_set)
+        assert len(missing_parents) == 0, f"parent loops {sorted(missing_parents)} are not in this graph"
+        loop_ids = self.yarns[yarn_id].add_loops_to_end(loop_count)
+        self._add_course_loops(yarn_id, loop_ids, parent_ids, pull_directions, depths, parent_offsets, is_twisted)
+        return [*loop_ids]
+
+    def _missing_loop_ids(self, loop_ids: Set[int]) -> Set[int]:
+        """
+        :param loop_ids: the loop ids to look for
+        :return: the loop ids that are not in the graph
+        """
+        return loop_ids.difference(self.loops)
+
+    def _add_course_loops(self, yarn_id: str, loop_ids: range, parent_ids: Sequence[Sequence[int]],
+                          pull_directions: Sequence[Pull_Direction], depths: Sequence[int],
+                          parent_offsets: Sequence[Sequence[int]], is_twisted: bool):
+        """
+        Adds a validated course of loops that are already on the yarn, see add_course
+        """
+        loops = Loop.create_loops(loop_ids.start, len(loop_ids), yarn_id, is_twisted)
+        self.graph.add_nodes_from((loop.loop_id, {"loop": loop}) for loop in loops)
+        self.loops.update((loop.loop_id, loop) for loop in loops)
+        edges = []
+        for loop, parents, pull_direction, depth, offsets in zip(loops, parent_ids, pull_directions, depths,
+                                                                 parent_offsets):
+            if len(parents) > 0:
+                loop.parent_loop_ids = array("q", parents)
+                edges.extend((parent_id, loop.loop_id,
+                              {"pull_direction": pull_direction, "depth": depth, "parent_offset": offset})
+                             for parent_id, offset in zip(parents, offsets))
+        self.graph.add_edges_from(edges)
+        for loop_id, parents in zip(loop_ids, parent_ids):
+            self._index_new_loop(loop_id)
+            for parent_id in parents:
+                self._index_new_edge(parent_id, loop_id)
+
+    def _index_new_loop(self, loop_id: int):
+        """
+        Adds a newly created loop to the current (last) course of the course index
+        :param loop_id: the id of the new loop
+        """
+        if not self._course_index_is_valid:
+            return
+        if len(self._course_to_loop_ids) == 0:
+            self._course_to_loop_ids[0] = []
+        course = len(self._course_to_loop_ids) - 1
+        self._course_to_loop_ids[course].append(loop_id)
+        self._current_course_set.add(loop_id)
+        self._loop_ids_to_course[loop_id] = course
+
+    def _index_new_edge(self, parent_loop_id: int, child_loop_id: int):
+        """
+        Updates the course index for a new stitch edge.
+        A stitch into the last loop added starts a new course if its parent is on the current course.
+        A stitch into any other loop may shift later course boundaries, so the index is rebuilt on the next query
+        :param parent_loop_id: the parent of the new stitch edge
+        :param child_loop_id: the child of the new stitch edge
+        """
+        if not self._course_index_is_valid or parent_loop_id == child_loop_id:
+            return
+        course = len(self._course_to_loop_ids) - 1
+        current_course = self._course_to_loop_ids[course]
+        if current_course[-1] == child_loop_id:
+            if parent_loop_id in self._current_course_set:  # the child starts the next course
+                current_course.pop()
+                self._course_to_loop_ids[course + 1] = [child_loop_id]
+                self._current_course_set = {child_loop_id}
+                self._loop_ids_to_course[child_loop_id] = course + 1
+        elif self._loop_ids_to_course[parent_loop_id] == self._loop_ids_to_course[child_loop_id]:
+            self._course_index_is_valid = False
+
+    def _rebuild_course_index(self):
+        """
+        Recomputes the course index from every loop in the graph
+        """
+        loop_ids_to_course, course_to_loop_ids, current_course_set = self._find_courses()
+        self._loop_ids_to_course = loop_ids_to_course
+        self._course_to_loop_ids = course_to_loop_ids
+        self._current_course_set = current_course_set
+        self._course_index_is_valid = True
+
+    def course_of(self, loop_id: int) -> int:
+        """
+        :param loop_id: the loop to find the course of
+        :return: the course the loop is on
+        """
+        if not self._course_index_is_valid:
+            self._rebuild_course_index()
+        return self._loop_ids_to_course[loop_id]
+
+    def loops_in_course(self, course: int) -> List[int]:
+        """
+        :param course: the course to get loops from
+        :return: the loop ids on the course in the order of creation. The list should not be modified
+        """
+        if not self._course_index_is_valid:
+            self._rebuild_course_index()
+        return self._course_to_loop_ids[course]
+
+    @property
+    def course_count(self) -> int:
+        """
+        :return: the number of courses in the graph
+        """
+        if not self._course_index_is_valid:
+            self._rebuild_course_index()
+        return len(self._course_to_loop_ids)
 
     def get_courses(self) -> Tuple[Dict[int, int], Dict[int, List[int]]]:
         """
+        The courses are maintained as loops and stitches are added, so repeated calls do not walk the graph.
+        The returned dictionaries belong to the graph and should not be modified
         :return: A dictionary of loop_ids to the course they are on,
         a dictionary or course ids to the loops on that course in the order of creation
         The first set of loops in the graph is on course 0.
         A course change occurs when a loop has a parent loop that is in the last course.
         """
+        if not self._course_index_is_valid:
+            self._rebuild_course_index()
+        return self._loop_ids_to_course, self._course_to_loop_ids
+
+    def _find_courses(self) -> Tuple[Dict[int, int], Dict[int, List[int]], Set[int]]:
+        """
+        :return: A dictionary of loop_ids to the course they are on,
+        a dictionary or course ids to the loops on that course in the order of creation,
+        and the set of loops on the last course
+        """
+        if self.graph.number_of_nodes() == 0:
+            return {}, {}, set()
         loop_ids_to_course = {}
         course_to_loop_ids = {}
         current_course_set = set()
@@ -114,7 +292,7 @@ class Knit_Graph:
                 course += 1
             loop_ids_to_course[loop_id] = course
         course_to_loop_ids[course] = current_course
-        return loop_ids_to_course, course_to_loop_ids
+        return loop_ids_to_course, course_to_loop_ids, current_course_set
 
     # @deprecated("Deprecated because this only works in rows, but not round construction")
     def deprecated_get_course(self) -> Tuple[Dict[int, int], Dict[int, List[int]]]:
@@ -1,5 +1,7 @@
 """The Loop data structure"""
-from typing import List, Optional
+import sys
+from array import array
+from typing import List, Optional, Union
 
 
 class Loop:
@@ -11,10 +13,14 @@ class Loop:
     ----------
     is_twisted: bool
         True if the loop is twisted
-    parent_loops: List[Loop]
-        The list of loops that this loop is pulled through.
-        The order in the list implies the stacking order with the first loop at the bottom the stack
+    yarn_id: str
+        the id of the yarn that makes this loop, interned so loops on the same yarn share one string
+    parent_loop_ids: array
+        The ids of the loops that this loop is pulled through.
+        The order in the array implies the stacking order with the first loop at the bottom the stack
     """
+    __slots__ = ("_loop_id", "yarn_id", "is_twisted", "parent_loop_ids")
+
     def __init__(self, loop_id: int, yarn_id: str, is_twisted: bool = False):
         """
         :param loop_id: id of loop. IDs should represent the order that loops are created
@@ -22,22 +28,57 @@ class Loop:
         :param is_twisted: True if the loop should be twistedpa
             (created by pulling a carrier backwards across the needle)
         """
-        self.is_twisted = is_twisted
+        self.is_twisted: bool = is_twisted
         assert loop_id >= 0, f"{loop_id}: Loop_id must be non-negative"
         self._loop_id: int = loop_id
-        self.yarn_id = yarn_id
-        self.parent_loops: List[Loop] = []
+        self.yarn_id: str = sys.intern(yarn_id)
+        self.parent_loop_ids: array = array("q")
 
-    def add_parent_loop(self, parent, stack_position: Optional[int] = None):
+    @classmethod
+    def create_loops(cls, first_loop_id: int, count: int, yarn_id: str, is_twisted: bool = False) -> List:
+        """
+        Creates loops with consecutive ids without repeating the checks made for each loop in the constructor
+        :param first_loop_id: the id of the first loop created
+        :param count: the number of loops to create
+        :param yarn_id: the id of the yarn that makes these loops
+        :param is_twisted: True if the loops should be twisted
+        :return: the list of new loops in order of their ids
         """
-        Adds the parent Loop onto the stack of parent_loops.
-        :param parent: the Loop to be added onto the stack
+        assert first_loop_id >= 0, f"{first_loop_id}: Loop_id must be non-negative"
+        yarn_id = sys.intern(yarn_id)
+        loops = []
+        for loop_id in range(first_loop_id, first_loop_id + count):
+            loop = cls.__new__(cls)
+            loop.is_twisted = is_twisted
+            loop._loop_id = loop_id
+            loop.yarn_id = yarn_id
+            loop.parent_loop_ids = array("q")
+            loops.append(loop)
+        return loops
+
+    def add_parent_loop(self, parent: Union[int, "Loop"], stack_position: Optional[int] = None):
+        """
+        Adds the parent Loop onto the stack of parent_loop_ids.
+        :param parent: the Loop or the loop_id to be added onto the stack
         :param stack_position: The position to insert the parent into, by default add on top of the stack
         """
+        if isinstance(parent, Loop):
+            parent = parent.loop_id
+        parent_loop_ids = self.parent_loop_ids.tolist()
         if stack_position is not None:
-            self.parent_loops.insert(stack_position, parent)
+            parent_loop_ids.insert(stack_position, parent)
         else:
-            self.parent_loops.append(parent)
+            parent_loop_ids.append(parent)
+        self.parent_loop_ids = array("q", parent_loop_ids)  # rebuilt to fit, appending to an array over-allocates
+
+    def remove_parent_loop(self, parent_id: int):
+        """
+        Removes the parent from the stack of parent_loop_ids
+        :param parent_id: the id of the parent loop to remove
+        """
+        parent_loop_ids = self.parent_loop_ids.tolist()
+        parent_loop_ids.remove(parent_id)
+        self.parent_loop_ids = array("q", parent_loop_ids)
 
     @property
     def loop_id(self) -> int:
@@ -69,28 +110,6 @@ class Loop:
         else:
             return None
 
-    @property
-    def is_twisted(self) -> bool:
-        """
-        :return: True if the loop is twisted
-        """
-        return self._is_twisted
-
-    @is_twisted.setter
-    def is_twisted(self, is_twisted: bool):
-        self._is_twisted = is_twisted
-
-    @property
-    def yarn_id(self) -> str:
-        """
-        :return: the id of the yarn that makes this loop
-        """
-        return self._yarn_id
-
-    @yarn_id.setter
-    def yarn_id(self, yarn_id: str):
-        self._yarn_id: str = yarn_id
-
     def __hash__(self):
         return self.loop_id
 
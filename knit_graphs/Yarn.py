@@ -1,13 +1,16 @@
 """
 The Yarn Data Structure
 """
-from typing import Optional, Tuple
+from array import array
+from typing import Dict, List, Optional, Tuple, Sequence, Union
 
 import networkx as networkx
 
 from knit_graphs.Loop import Loop
 from knitting_machine.Machine_State import Yarn_Carrier
 
+_REMOVED = -1  # marks the position of a loop removed from the yarn
+
 
 class Yarn:
     """
@@ -16,28 +19,34 @@ class Yarn:
 
     Attributes
     ----------
-    yarn_graph: networkx.DiGraph
-        A directed graph structure (always a list) of loops on the yarn
     last_loop_id: int
         The id of the last loop on the yarn, none if no loops on the yarn
     """
 
-    def __init__(self, yarn_id: str, knit_graph, last_loop: Optional[Loop] = None, carrier_id: int = 3):
+    def __init__(self, yarn_id: str, knit_graph, last_loop: Optional[Loop] = None,
+                 carrier_id: Union[int, List[int]] = 3):
         """
-        A Graph structure to show the yarn-wise relationship between loops
+        A sequence of loop ids to show the yarn-wise relationship between loops
         :param knit_graph: The knitgraph the yarn is used in
         :param yarn_id: the identifier for this loop
         :param last_loop: the loop to add onto this yarn at the beginning. May be none if yarn is empty.
+        :param carrier_id: the carrier of the yarn, or a list of the carriers plated together
         """
         self.knit_graph = knit_graph
-        assert 0 < carrier_id < 11, f"Invalid yarn carrier {carrier_id}"
+        for carrier in (carrier_id if type(carrier_id) is list else [carrier_id]):
+            assert 0 < carrier < 11, f"Invalid yarn carrier {carrier}"
         self._carrier: Yarn_Carrier = Yarn_Carrier(carrier_id)
-        self.yarn_graph: networkx.DiGraph = networkx.DiGraph()
-        if last_loop is None:
-            self.last_loop_id = None
-        else:
-            self.last_loop_id: int = last_loop.loop_id
+        self._loop_ids: array = array("q")  # loop ids in yarn-wise order, removed loops are marked as _REMOVED
+        self._first_loop_id: Optional[int] = None
+        # while loop ids are consecutive, the position of a loop is its id minus the first id and no index is kept
+        self._consecutive_ids: bool = True
+        self._loop_positions: Optional[Dict[int, int]] = None  # built on the first lookup after ids stop being consecutive
+        self._loop_count: int = 0
+        self._yarn_graph: Optional[networkx.DiGraph] = None  # built from the loop ids when requested
+        self.last_loop_id: Optional[int] = None
         self._yarn_id: str = yarn_id
+        if last_loop is not None:
+            self._append_loop_ids(range(last_loop.loop_id, last_loop.loop_id + 1))
 
     @property
     def carrier(self) -> Yarn_Carrier:
@@ -53,6 +62,75 @@ class Yarn:
         """
         return self._yarn_id
 
+    @property
+    def yarn_graph(self) -> networkx.DiGraph:
+        """
+        :return: A directed graph structure (always a list) of loops on the yarn, rebuilt after the yarn changes
+        """
+        if self._yarn_graph is None:
+            self._yarn_graph = networkx.DiGraph()
+            prior_id = None
+            for loop_id in self:
+                self._yarn_graph.add_node(loop_id)
+                if prior_id is not None:
+                    self._yarn_graph.add_edge(prior_id, loop_id)
+                prior_id = loop_id
+        return self._yarn_graph
+
+    def _append_loop_ids(self, loop_ids: range):
+        """
+        Adds the loop ids to the end of the yarn and its position index
+        :param loop_ids: the ids of the loops added at the end of the yarn, in yarn-wise order
+        """
+        if len(loop_ids) == 0:
+            return
+        if self._first_loop_id is None:
+            self._first_loop_id = loop_ids[0]
+        elif loop_ids[0] != self._first_loop_id + len(self._loop_ids):
+            self._consecutive_ids = False
+        if self._loop_positions is not None:
+            first_position = len(self._loop_ids)
+            self._loop_positions.update(zip(loop_ids, range(first_position, first_position + len(loop_ids))))
+        self._loop_ids.extend(loop_ids)
+        self._loop_count += len(loop_ids)
+        self.last_loop_id = loop_ids[-1]
+        self._yarn_graph = None
+
+    def _position_of(self, loop_id: int) -> Optional[int]:
+        """
+        :param loop_id: the loop to find on the yarn
+        :return: the position of the loop in the yarn or None if it is not on the yarn
+        """
+        if self._consecutive_ids:
+            if self._first_loop_id is None:
+                return None
+            position = loop_id - self._first_loop_id
+            if 0 <= position < len(self._loop_ids) and self._loop_ids[position] == loop_id:
+                return position
+            return None
+        if self._loop_positions is None:
+            self._loop_positions = {prior_id: position for position, prior_id in enumerate(self._loop_ids)
+                                    if prior_id != _REMOVED}
+        return self._loop_positions.get(loop_id)
+
+    def _set_loop_ids(self, loop_ids: Sequence[int]):
+        """
+        Replaces the loops on the yarn without copying the loop ids. Used to load yarns of stored knit graphs
+        :param loop_ids: increasing loop ids in yarn-wise order, such as a memoryview over a file
+        """
+        self._loop_ids = loop_ids
+        self._loop_count = len(loop_ids)
+        self._loop_positions = None
+        self._yarn_graph = None
+        if len(loop_ids) == 0:
+            self._first_loop_id = None
+            self.last_loop_id = None
+            self._consecutive_ids = True
+        else:
+            self._first_loop_id = loop_ids[0]
+            self.last_loop_id = loop_ids[-1]
+            self._consecutive_ids = self.last_loop_id - self._first_loop_id + 1 == len(loop_ids)
+
     def add_loop_to_end(self, loop_id: int = None, loop: Optional[Loop] = None,
                         is_twisted: bool = False) -> Tuple[int, Loop]:
         """
@@ -64,31 +142,97 @@ class Yarn:
         """
         if loop_id is None:  # Create a new Loop ID
             if loop is not None:  # get the loop id from the provided loop
-                assert self.last_loop_id > loop.loop_id, \
+                assert self.last_loop_id is None or self.last_loop_id < loop.loop_id, \
                     f"Cannot add loop {loop.loop_id} after loop {self.last_loop_id}."
                 loop_id = loop.loop_id
-            elif self.last_loop_id is None:  # the first loop on the yarn
-                loop_id = 0
-            else:  # the next loop on this yarn
+            else:  # follow the last loop in the graph, so loops of different yarns never share an id
                 loop_id = self.knit_graph.last_loop_id + 1
         if loop is None:  # create a loop from default information
             loop = Loop(loop_id, self.yarn_id, is_twisted)
-        self.yarn_graph.add_node(loop_id, loop=loop)
-        if self.last_loop_id is not None:  # make a link between this and the last yarn
-            self.yarn_graph.add_edge(self.last_loop_id, loop_id)
-        self.last_loop_id = loop_id
-        self.knit_graph.last_loop_id = loop_id
+        self._append_loop_ids(range(loop_id, loop_id + 1))
+        self.knit_graph.last_loop_id = max(loop_id, self.knit_graph.last_loop_id)
         return loop_id, loop
 
+    def add_loops_to_end(self, count: int) -> range:
+        """
+        Adds count new loop ids at the end of the yarn, following the last loop in the graph.
+        Loops are not created for the ids, see Knit_Graph.add_course
+        :param count: the number of loop ids to add
+        :return: the loop_ids added to the yarn
+        """
+        first_loop_id = self.knit_graph.last_loop_id + 1
+        loop_ids = range(first_loop_id, first_loop_id + count)
+        self._append_loop_ids(loop_ids)
+        self.knit_graph.last_loop_id = max(first_loop_id + count - 1, self.knit_graph.last_loop_id)
+        return loop_ids
+
+    def remove_loop(self, loop_id: int):
+        """
+        Removes the loop from the yarn, joining the loops on either side of it
+        :param loop_id: the id of the loop to remove
+        """
+        position = self._position_of(loop_id)
+        assert position is not None, f"Loop {loop_id} is not on yarn {self.yarn_id}"
+        self._loop_ids[position] = _REMOVED
+        if self._loop_positions is not None:
+            del self._loop_positions[loop_id]
+        self._loop_count -= 1
+        if self.last_loop_id == loop_id:
+            self.last_loop_id = self.prior_loop_id_from_position(position)
+        self._yarn_graph = None
+
+    def prior_loop_id_from_position(self, position: int) -> Optional[int]:
+        """
+        :param position: a position in the yarn
+        :return: the id of the closest loop before the position or None if there is no such loop
+        """
+        for prior_position in range(position - 1, -1, -1):
+            if self._loop_ids[prior_position] != _REMOVED:
+                return self._loop_ids[prior_position]
+        return None
+
+    def prior_loop_id(self, loop_id: int) -> Optional[int]:
+        """
+        :param loop_id: a loop on the yarn
+        :return: the id of the loop before it on the yarn or None if it is the first loop
+        """
+        position = self._position_of(loop_id)
+        assert position is not None, f"Loop {loop_id} is not on yarn {self.yarn_id}"
+        return self.prior_loop_id_from_position(position)
+
+    def next_loop_id(self, loop_id: int) -> Optional[int]:
+        """
+        :param loop_id: a loop on the yarn
+        :return: the id of the loop after it on the yarn or None if it is the last loop
+        """
+        position = self._position_of(loop_id)
+        assert position is not None, f"Loop {loop_id} is not on yarn {self.yarn_id}"
+        for next_position in range(position + 1, len(self._loop_ids)):
+            if self._loop_ids[next_position] != _REMOVED:
+                return self._loop_ids[next_position]
+        return None
+
+    def get_segment(self, first_loop_id: int, last_loop_id: int) -> List[int]:
+        """
+        :param first_loop_id: the first loop in the segment
+        :param last_loop_id: the last loop in the segment
+        :return: the ids of the loops on the yarn from the first to the last loop, inclusive
+        """
+        first_position = self._position_of(first_loop_id)
+        last_position = self._position_of(last_loop_id)
+        assert first_position is not None, f"Loop {first_loop_id} is not on yarn {self.yarn_id}"
+        assert last_position is not None, f"Loop {last_loop_id} is not on yarn {self.yarn_id}"
+        return [loop_id for loop_id in self._loop_ids[first_position:last_position + 1] if loop_id != _REMOVED]
+
     def __contains__(self, item):
         """
         :param item: the loop being checked for in the yarn
         :return: true if the loop_id of item or the loop is in the yarn
         """
         if type(item) is int:
-            return self.yarn_graph.has_node(item)
+            return self._position_of(item) is not None
         elif isinstance(item, Loop):
-            return self.yarn_graph.has_node(item.loop_id)
+            return self._position_of(item.loop_id) is not None
         else:
             return False
 
@@ -100,4 +244,10 @@ class Yarn:
         if item not in self:
             raise AttributeError
         else:
-            return self.yarn_graph.nodes[item].loop
+            return self.knit_graph[item]
+
+    def __iter__(self):
+        return (loop_id for loop_id in self._loop_ids if loop_id != _REMOVED)
+
+    def __len__(self) -> int:
+        return self._loop_count
@@ -0,0 +1,148 @@
+"""Reading and writing knit graphs in a compact binary file format"""
+import mmap
+import struct
+import sys
+from array import array
+from typing import Dict, List, Tuple
+
+from knit_graphs.Compact_Knit_Graph import Compact_Knit_Graph, _NO_LOOP, _PULL_DIRECTION_CODES
+from knit_graphs.Knit_Graph import Knit_Graph
+from knit_graphs.Yarn import Yarn
+
+FORMAT_VERSION = 2
+_MAGIC = b"KNTG"
+# magic, format version, 1 if the tables are little-endian, yarn count,
+# loop id span (length of the loop table), loop count, edge count, course count, last loop id
+_HEADER = struct.Struct("<4sHHIqqqqq")
+# loop count, carrier count, byte length of the utf-8 yarn id.
+# Followed by the carrier ids (uint16, several for plated yarns), the yarn id, and the yarn's loop ids
+_YARN_HEADER = struct.Struct("<qHH")
+# The tables are the arrays of Compact_Knit_Graph written in this order, each starting on an 8 byte boundary
+_LOOP_COLUMNS: List[Tuple[str, str]] = [("_loop_yarns", "h"), ("_loop_twisted", "b"), ("_edge_starts", "q"),
+                                        ("_edge_counts", "h"), ("_loop_courses", "i")]
+_EDGE_COLUMNS: List[Tuple[str, str]] = [("_edge_parents", "q"), ("_edge_pull_directions", "b"), ("_edge_depths", "b"),
+                                        ("_edge_offsets", "i"), ("_edge_stack_positions", "h")]
+_COURSE_COLUMNS: List[Tuple[str, str]] = [("_course_starts", "q")]
+
+
+def _aligned(offset: int) -> int:
+    """
+    :param offset: a position in the file
+    :return: the first 8 byte boundary at or after the offset
+    """
+    return offset + (-offset % 8)
+
+
+def write_knit_graph(knit_graph: Knit_Graph, filename: str):
+    """
+    Writes the knit graph to a binary file that can be opened with read_knit_graph.
+    The file holds a header, a yarn table, a loop table indexed by loop id,
+    an edge table with the pull direction, depth, parent offset and stack position of each stitch,
+    and a course table with the first loop id of each course
+    :param knit_graph: the knit graph to write
+    :param filename: the name of the file to write
+    """
+    yarn_ids, columns, last_loop_id = _table_columns(knit_graph)
+    id_span = len(columns["_loop_yarns"])
+    edge_count = len(columns["_edge_parents"])
+    course_count = len(columns["_course_starts"])
+    loop_count = knit_graph.graph.number_of_nodes()
+    with open(filename, "wb") as file:
+        file.write(_HEADER.pack(_MAGIC, FORMAT_VERSION, int(sys.byteorder == "little"), len(yarn_ids),
+                                id_span, loop_count, edge_count, course_count, last_loop_id))
+        file.write(bytes(-file.tell() % 8))
+        for yarn_id in yarn_ids:
+            yarn = knit_graph.yarns[yarn_id]
+            encoded_id = yarn_id.encode("utf-8")
+            loop_ids = array("q", yarn)
+            carrier_ids = [*yarn.carrier]
+            file.write(_YARN_HEADER.pack(len(loop_ids), len(carrier_ids), len(encoded_id)))
+            file.write(array("H", carrier_ids).tobytes())
+            file.write(encoded_id)
+            file.write(bytes(-file.tell() % 8))
+            file.write(loop_ids.tobytes())
+        for name, _ in _LOOP_COLUMNS + _EDGE_COLUMNS + _COURSE_COLUMNS:
+            file.write(columns[name])
+            file.write(bytes(-file.tell() % 8))
+
+
+def _table_columns(knit_graph: Knit_Graph) -> Tuple[List[str], Dict, int]:
+    """
+    :param knit_graph: the knit graph to convert to tables
+    :return: the yarn ids in the order of the yarn table, the table columns by name, and the last loop id
+    """
+    if isinstance(knit_graph, Compact_Knit_Graph) and knit_graph._dead_edges == 0:
+        knit_graph.course_count  # makes sure the course index is up-to-date
+        columns = {name: getattr(knit_graph, name) for name, _ in _LOOP_COLUMNS + _EDGE_COLUMNS + _COURSE_COLUMNS}
+        return [*knit_graph._yarn_table], columns, knit_graph.last_loop_id
+    # build the tables from the graph queries, which also drops edge slots left behind in a Compact_Knit_Graph
+    yarn_ids = [*knit_graph.yarns]
+    yarn_indices = {yarn_id: index for index, yarn_id in enumerate(yarn_ids)}
+    loop_ids = sorted(knit_graph.graph.nodes)
+    id_span = 0 if len(loop_ids) == 0 else loop_ids[-1] + 1
+    columns = {"_loop_yarns": array("h", [_NO_LOOP]) * id_span, "_loop_twisted": array("b", [0]) * id_span,
+               "_edge_starts": array("q", [0]) * id_span, "_edge_counts": array("h", [0]) * id_span,
+               "_loop_courses": array("i", [-1]) * id_span}
+    for name, typecode in _EDGE_COLUMNS:
+        columns[name] = array(typecode)
+    loop_ids_to_course, course_to_loop_ids = knit_graph.get_courses()
+    for loop_id in loop_ids:
+        loop = knit_graph.loops[loop_id]
+        columns["_loop_yarns"][loop_id] = yarn_indices[loop.yarn_id]
+        columns["_loop_twisted"][loop_id] = int(loop.is_twisted)
+        columns["_loop_courses"][loop_id] = loop_ids_to_course[loop_id]
+        columns["_edge_starts"][loop_id] = len(columns["_edge_parents"])
+        parent_stack = [*loop.parent_loop_ids]
+        for parent_id in knit_graph.graph.predecessors(loop_id):
+            edge_data = knit_graph.graph[parent_id][loop_id]
+            columns["_edge_parents"].append(parent_id)
+            columns["_edge_pull_directions"].append(_PULL_DIRECTION_CODES[edge_data["pull_direction"]])
+            columns["_edge_depths"].append(edge_data["depth"])
+            columns["_edge_offsets"].append(edge_data["parent_offset"])
+            columns["_edge_stack_positions"].append(parent_stack.index(parent_id))
+        columns["_edge_counts"][loop_id] = len(columns["_edge_parents"]) - columns["_edge_starts"][loop_id]
+    columns["_course_starts"] = array("q", [course_to_loop_ids[course][0] for course in sorted(course_to_loop_ids)])
+    return yarn_ids, columns, knit_graph.last_loop_id
+
+
+def read_knit_graph(filename: str) -> Compact_Knit_Graph:
+    """
+    Opens a knit graph written by write_knit_graph without reading the file.
+    The tables are memory-mapped, so only the pages of the loops, edges, and courses that are accessed are read
+    :param filename: the name of the file to open
+    :return: a read-only Compact_Knit_Graph backed by the file
+    """
+    with open(filename, "rb") as file:
+        buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)  # the mapping stays open after the file closes
+    assert len(buffer) >= _HEADER.size, f"{filename} is not a knit graph file"
+    view = memoryview(buffer)
+    magic, version, little_endian, yarn_count, id_span, loop_count, edge_count, course_count, last_loop_id = \
+        _HEADER.unpack_from(buffer, 0)
+    assert magic == _MAGIC, f"{filename} is not a knit graph file"
+    assert version == FORMAT_VERSION, f"{filename} has knit graph format {version}, expected {FORMAT_VERSION}"
+    assert bool(little_endian) == (sys.byteorder == "little"), f"{filename} was written with a different byte order"
+    knit_graph = Compact_Knit_Graph()
+    offset = _aligned(_HEADER.size)
+    for _ in range(0, yarn_count):
+        yarn_loop_count, carrier_count, id_length = _YARN_HEADER.unpack_from(buffer, offset)
+        offset += _YARN_HEADER.size
+        carrier_ids = [*view[offset:offset + 2 * carrier_count].cast("H")]
+        offset += 2 * carrier_count
+        yarn_id = bytes(view[offset:offset + id_length]).decode("utf-8")
+        offset = _aligned(offset + id_length)
+        yarn = Yarn(yarn_id, knit_graph, carrier_id=carrier_ids[0] if carrier_count == 1 else carrier_ids)
+        yarn_end = offset + 8 * yarn_loop_count
+        assert yarn_end <= len(buffer), f"{filename} is truncated"
+        yarn._set_loop_ids(view[offset:yarn_end].cast("q"))
+        offset = yarn_end
+        knit_graph.add_yarn(yarn)
+    for columns, length in [(_LOOP_COLUMNS, id_span), (_EDGE_COLUMNS, edge_count), (_COURSE_COLUMNS, course_count)]:
+        for name, typecode in columns:
+            column_end = offset + array(typecode).itemsize * length
+            assert column_end <= len(buffer), f"{filename} is truncated"
+            setattr(knit_graph, name, view[offset:column_end].cast(typecode))
+            offset = _aligned(column_end)
+    knit_graph.last_loop_id = last_loop_id
+    knit_graph._loop_count = loop_count
+    knit_graph._buffer = buffer
+    return knit_graph
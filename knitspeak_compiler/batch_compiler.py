@@ -0,0 +1,164 @@
+"""Compiles batches of knitspeak files to knitout across a pool of processes"""
+import multiprocessing
+import os
+import sys
+import time
+from typing import Iterable, Iterator, List, Optional
+
+from knitspeak_compiler.compile_cache import Compile_Cache
+from knitspeak_compiler.knitspeak_compiler import Knitspeak_Compiler
+from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+
+
+class Batch_Job:
+    """
+    A knitspeak file to compile and write as knitout
+    ...
+
+    Attributes
+    ----------
+    pattern_file: str
+        the knitspeak file to compile
+    starting_width: int
+        the number of loops in the 0th course
+    row_count: int
+        the number of rows to compile
+    output_path: str
+        the knitout file to write
+    """
+
+    def __init__(self, pattern_file: str, starting_width: int, row_count: int, output_path: str):
+        self.pattern_file: str = pattern_file
+        self.starting_width: int = starting_width
+        self.row_count: int = row_count
+        self.output_path: str = output_path
+
+    def __str__(self):
+        return f"{self.pattern_file} ({self.starting_width}x{self.row_count}) -> {self.output_path}"
+
+    def __repr__(self):
+        return str(self)
+
+
+class Batch_Result:
+    """
+    The outcome of a Batch_Job
+    ...
+
+    Attributes
+    ----------
+    job: Batch_Job
+        the job that was run
+    error: Optional[str]
+        a description of the error that stopped the job, None if the job succeeded
+    compile_time: float
+        seconds spent compiling the knitspeak
+    generate_time: float
+        seconds spent generating and writing the knitout
+    """
+
+    def __init__(self, job: Batch_Job, error: Optional[str] = None, compile_time: float = 0.0,
+                 generate_time: float = 0.0):
+        self.job: Batch_Job = job
+        self.error: Optional[str] = error
+        self.compile_time: float = compile_time
+        self.generate_time: float = generate_time
+
+    @property
+    def succeeded(self) -> bool:
+        """
+        :return: True if the knitout was written
+        """
+        return self.error is None
+
+    def __str__(self):
+        if self.succeeded:
+            return f"{self.job}: compiled in {self.compile_time:.3f}s, wrote knitout in {self.generate_time:.3f}s"
+        return f"{self.job}: failed after {self.compile_time + self.generate_time:.3f}s with {self.error}"
+
+    def __repr__(self):
+        return str(self)
+
+
+_worker_compiler: Optional[Knitspeak_Compiler] = None  # the compiler of this worker process, see _start_worker
+
+
+def _start_worker(cache_directory: Optional[str]):
+    """
+    Builds the compiler, and with it the parser, once for every job run by this process
+    :param cache_directory: the directory of a compile cache shared by the workers or None to not use a cache
+    """
+    global _worker_compiler
+    cache = None
+    if cache_directory is not None:
+        cache = Compile_Cache(cache_directory)
+    _worker_compiler = Knitspeak_Compiler(cache=cache)
+
+
+def _run_job(job: Batch_Job) -> Batch_Result:
+    """
+    Compiles the job's pattern and writes its knitout. Errors are reported in the result instead of raised
+    :param job: the job to run
+    :return: the result of the job
+    """
+    start = time.perf_counter()
+    try:
+        knit_graph = _worker_compiler.compile(job.starting_width, job.row_count, job.pattern_file, patternIsFile=True)
+    except Exception as error:
+        return Batch_Result(job, f"compile error: {type(error).__name__}: {error}", time.perf_counter() - start)
+    compile_time = time.perf_counter() - start
+    start = time.perf_counter()
+    try:
+        Knitout_Generator(knit_graph).write_instructions(job.output_path)
+    except Exception as error:
+        return Batch_Result(job, f"knitout error: {type(error).__name__}: {error}", compile_time,
+                            time.perf_counter() - start)
+    return Batch_Result(job, None, compile_time, time.perf_counter() - start)
+
+
+def compile_batch(jobs: Iterable[Batch_Job], processes: Optional[int] = None,
+                  cache_directory: Optional[str] = None) -> Iterator[Batch_Result]:
+    """
+    Runs the jobs across a pool of processes, each with its own compiler. A failed job does not stop the batch
+    :param jobs: the jobs to run
+    :param processes: the number of worker processes, by default the number of cpus. 1 runs the jobs in this process
+    :param cache_directory: if provided, the workers share a compile cache in this directory
+    :return: the result of each job in the order that the jobs complete
+    """
+    if processes == 1:
+        _start_worker(cache_directory)
+        for job in jobs:
+            yield _run_job(job)
+        return
+    with multiprocessing.Pool(processes, initializer=_start_worker, initargs=(cache_directory,)) as pool:
+        for result in pool.imap_unordered(_run_job, jobs):
+            yield result
+
+
+def directory_jobs(pattern_directory: str, starting_width: int, row_count: int, output_directory: str) -> List[Batch_Job]:
+    """
+    :param pattern_directory: a directory of knitspeak (.ks) files
+    :param starting_width: the number of loops in the 0th course of every pattern
+    :param row_count: the number of rows compiled for every pattern
+    :param output_directory: the directory to write the knitout files to, created if it does not exist
+    :return: a job for each knitspeak file writing a knitout file of the same name
+    """
+    os.makedirs(output_directory, exist_ok=True)
+    jobs = []
+    for file_name in sorted(os.listdir(pattern_directory)):
+        name, extension = os.path.splitext(file_name)
+        if extension == ".ks":
+            jobs.append(Batch_Job(os.path.join(pattern_directory, file_name), starting_width, row_count,
+                                  os.path.join(output_directory, f"{name}.k")))
+    return jobs
+
+
+if __name__ == "__main__":
+    # python -m knitspeak_compiler.batch_compiler <pattern directory> <width> <rows> <output directory>
+    pattern_directory, width, rows, output_directory = sys.argv[1:5]
+    failures = 0
+    for batch_result in compile_batch(directory_jobs(pattern_directory, int(width), int(rows), output_directory)):
+        print(batch_result)
+        if not batch_result.succeeded:
+            failures += 1
+    sys.exit(1 if failures > 0 else 0)
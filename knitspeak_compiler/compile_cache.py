@@ -0,0 +1,155 @@
+"""An on-disk cache of compiled knit graphs"""
+import hashlib
+import os
+from typing import Optional, List
+
+from knit_graphs.Compact_Knit_Graph import Compact_Knit_Graph
+from knit_graphs.Knit_Graph import Knit_Graph
+from knit_graphs.knit_graph_io import FORMAT_VERSION, write_knit_graph, read_knit_graph
+
+_ENTRY_EXTENSION = ".kg"
+
+
+class Compile_Cache:
+    """
+    A directory of compiled knit graphs keyed by a hash of the pattern and compile parameters.
+    When the directory grows past max_bytes, the least recently used graphs are removed
+    ...
+
+    Attributes
+    ----------
+    directory: str
+        the directory the compiled graphs are stored in
+    max_bytes: int
+        the largest total size of the stored graphs
+    hits: int
+        the number of compiles answered by the cache
+    misses: int
+        the number of compiles that were not in the cache
+    evictions: int
+        the number of graphs removed to keep the cache under max_bytes
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+        """
+        :param directory: the directory to store compiled graphs in, created if it does not exist
+        :param max_bytes: the largest total size of the stored graphs
+        """
+        self.directory: str = directory
+        self.max_bytes: int = max_bytes
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(pattern: str, starting_width: int, row_count: int, compiler_version: int) -> str:
+        """
+        :param pattern: the knitspeak pattern text
+        :param starting_width: the number of loops in the 0th course
+        :param row_count: the number of rows compiled
+        :param compiler_version: the version of the compiler, changed when compiled graphs change
+        :return: the key of the compiled graph
+        """
+        key = hashlib.sha256(pattern.encode("utf-8"))
+        key.update(f"|{starting_width}|{row_count}|{compiler_version}|{FORMAT_VERSION}".encode("utf-8"))
+        return key.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        """
+        :param key: the key of a compiled graph
+        :return: the file the graph is stored in
+        """
+        return os.path.join(self.directory, key + _ENTRY_EXTENSION)
+
+    def get(self, key: str) -> Optional[Compact_Knit_Graph]:
+        """
+        :param key: the key of the compiled graph
+        :return: the stored graph as a read-only Compact_Knit_Graph or None if it is not in the cache
+        """
+        path = self._entry_path(key)
+        try:
+            knit_graph = read_knit_graph(path)
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (AssertionError, ValueError, OSError) as error:  # a damaged or outdated entry is compiled again
+            print(f"Compile Cache Warning: removing unreadable entry {path}: {error}")
+            self._remove(path)
+            self.misses += 1
+            return None
+        os.utime(path)  # marks the entry as recently used
+        self.hits += 1
+        return knit_graph
+
+    def put(self, key: str, knit_graph: Knit_Graph):
+        """
+        Stores the compiled graph and removes the least recently used graphs if the cache is too large
+        :param key: the key of the compiled graph
+        :param knit_graph: the compiled graph
+        """
+        path = self._entry_path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            write_knit_graph(knit_graph, temporary_path)
+        except BaseException:  # entries are only counted by their .kg files, so a partial file would never be removed
+            self._remove(temporary_path)
+            raise
+        os.replace(temporary_path, path)  # other processes never see a partial entry
+        self._evict()
+
+    @property
+    def hit_rate(self) -> float:
+        """
+        :return: the fraction of lookups answered by the cache, 0 if there have been no lookups
+        """
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return self.hits / lookups
+
+    def size(self) -> int:
+        """
+        :return: the total size in bytes of the stored graphs
+        """
+        return sum(entry.stat().st_size for entry in self._entries())
+
+    def clear(self):
+        """
+        Removes every stored graph
+        """
+        for entry in self._entries():
+            self._remove(entry.path)
+
+    def _entries(self) -> List[os.DirEntry]:
+        """
+        :return: the files of the stored graphs
+        """
+        return [entry for entry in os.scandir(self.directory)
+                if entry.is_file() and entry.name.endswith(_ENTRY_EXTENSION)]
+
+    def _evict(self):
+        """
+        Removes the least recently used graphs until the cache is at most max_bytes
+        """
+        entries = [(entry.stat().st_mtime, entry.stat().st_size, entry.path) for entry in self._entries()]
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+            self.evictions += 1
+
+    @staticmethod
+    def _remove(path: str):
+        """
+        :param path: the file of a stored graph to remove, may already have been removed by another process
+        """
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def __str__(self):
+        return f"Compile_Cache({self.directory}): {self.hits} hits, {self.misses} misses, {self.evictions} evictions"
@@ -1,30 +1,66 @@
 """Compiler code for converting knitspeak AST to knitgraph"""
-from typing import List, Dict, Union, Tuple, Set
+from typing import List, Dict, Union, Tuple, Set, Type, Optional, Iterable, Iterator
 
-from knit_graphs.Knit_Graph import Knit_Graph
+from knit_graphs.Knit_Graph import Knit_Graph, Pull_Direction
 from knit_graphs.Yarn import Yarn
+from knitspeak_compiler.compile_cache import Compile_Cache
 from knitspeak_compiler.knitspeak_interpreter.knitspeak_interpreter import KnitSpeak_Interpreter
 from knitspeak_compiler.knitspeak_interpreter.cable_definitions import Cable_Definition
-from knitspeak_compiler.knitspeak_interpreter.closures import Num_Closure, Iterator_Closure
+from knitspeak_compiler.knitspeak_interpreter.closures import Num_Closure, Iterator_Closure, Current_Row_Closure, \
+    Operation_Closure, Num_Assignment_Closure
 from knitspeak_compiler.knitspeak_interpreter.stitch_definitions import Stitch_Definition
 
+COMPILER_VERSION = 1  # increase when changes to the compiler change the knit graphs it produces
+
 
 class Knitspeak_Compiler:
     """
     A class used to compile knit graphs from knitspeak
     """
 
-    def __init__(self):
+    def __init__(self, knit_graph_type: Type[Knit_Graph] = Knit_Graph, cache: Optional[Compile_Cache] = None,
+                 precompile_courses: bool = True, tile_repeats: bool = True):
+        """
+        :param knit_graph_type: the Knit_Graph class used to store the compiled graph (e.g., Compact_Knit_Graph)
+        :param cache: if provided, compiled graphs are looked up in and added to the cache.
+            Graphs found in the cache are read-only Compact_Knit_Graphs
+        :param precompile_courses: if True, the stitches of each course are recorded as a stitch program
+            the first time the course is interpreted and the program is run the next time, see _compile_course
+        :param tile_repeats: if True, the remaining rows are copied from the last repeat of the courses
+            once two repeats in a row make the same stitches, see _tile_repeat
+        """
+        self._cache: Optional[Compile_Cache] = cache
+        self._precompile_courses: bool = precompile_courses
+        self._tile_repeats: bool = tile_repeats
+        self._knit_graph_type: Type[Knit_Graph] = knit_graph_type
         self._parser = KnitSpeak_Interpreter()
+        self.reset()
+
+    def reset(self):
+        """
+        Clears the state of the last compile so the compiler can compile another pattern.
+        The parser is kept and its symbol table is reset to the language defaults
+        """
+        self._parser.parser.symbolTable.reset()
         self.parse_results: List[Dict[str, Union[List[int, Num_Closure, Iterator_Closure], List[tuple]]]] = []
         self.course_ids_to_operations: Dict[int, List[tuple]] = {}
-        self.knit_graph = Knit_Graph()
+        self.knit_graph = self._knit_graph_type()
         self.yarn = Yarn("yarn", self.knit_graph)
         self.knit_graph.add_yarn(self.yarn)
         self.last_course_loop_ids: List[int] = []
         self.cur_course_loop_ids: List[int] = []
         self.current_row = 0
         self.loop_ids_consumed_by_current_course: Set[int] = set()
+        # stitches of the current course, added to the knit graph together when the course is complete
+        self._course_parent_ids: List[List[int]] = []
+        self._course_pull_directions: List[Pull_Direction] = []
+        self._course_depths: List[int] = []
+        self._course_parent_offsets: List[List[int]] = []
+        # stitch programs keyed by course id, width of the last course, and wrong-side,
+        # each a list of (parent offsets, pull direction, depth, child loop count) for every stitch in the course
+        self._stitch_programs: Dict[Tuple[int, int, bool], List[Tuple[List[int], Pull_Direction, int, int]]] = {}
+        self._recorded_stitches: Optional[List[Tuple[List[int], Pull_Direction, int, int]]] = None
+        self._is_used: bool = False
 
     def _increment_current_row(self):
         """
@@ -49,36 +85,184 @@ class Knitspeak_Compiler:
         :param patternIsFile: True if pattern is provided in a file
         :return: the resulting compiled knit graph
         """
+        if self._is_used:  # clears the last pattern's state
+            self.reset()
+        self._is_used = True
+        cache_key = None
+        if self._cache is not None:
+            if patternIsFile:
+                with open(pattern, "r") as pattern_file:
+                    pattern_text = pattern_file.read()
+            else:
+                pattern_text = pattern
+            cache_key = Compile_Cache.make_key(pattern_text, starting_width, row_count, COMPILER_VERSION)
+            cached_graph = self._cache.get(cache_key)
+            if cached_graph is not None:
+                self.knit_graph = cached_graph
+                return cached_graph
         self.parse_results = self._parser.interpret(pattern, patternIsFile)
         self._organize_courses()
         self.populate_0th_course(starting_width)
+        course_ids = sorted(self.course_ids_to_operations)
+        # a repeat can only be tiled if it does not flip between rs and ws rows or read the current row
+        closures = {id(closure): closure for closure in self._num_closures(self.course_ids_to_operations)}.values()
+        row_independent = not any(isinstance(closure, Current_Row_Closure) for closure in closures)
+        can_tile = self._tile_repeats and len(course_ids) % 2 == 0 and row_independent
+        # stitch programs skip assignments, so each variable must only be assigned by one instruction
+        assigned_variables = [closure.var_name for closure in closures if isinstance(closure, Num_Assignment_Closure)]
+        use_programs = self._precompile_courses and row_independent and \
+            len(assigned_variables) == len(set(assigned_variables))
+        repeats: List[Tuple[int, List[tuple]]] = []  # first loop id and course records of the last complete repeats
         while self.current_row < row_count:
-            for course_id in sorted(self.course_ids_to_operations):
+            if can_tile and len(repeats) == 2 and self._repeats_match(*repeats):
+                self._tile_repeat(*repeats[1], row_count)
+                break
+            first_loop_id = self.knit_graph.last_loop_id + 1
+            courses = []
+            for course_id in course_ids:
                 self._increment_current_row()
-                assert self.current_row % course_id == 0
-                course_instructions = self.course_ids_to_operations[course_id]
-                while len(self.loop_ids_consumed_by_current_course) < len(self.last_course_loop_ids):
-                    for instruction in course_instructions:
-                        self._process_instruction(instruction)
-                        if len(self.loop_ids_consumed_by_current_course) == len(self.last_course_loop_ids):
-                            break
-                self.last_course_loop_ids = self.cur_course_loop_ids
-                self.cur_course_loop_ids = []
-                self.loop_ids_consumed_by_current_course = set()
+                assert (self.current_row - 1) % len(course_ids) + 1 == course_id
+                courses.append(self._compile_course(course_id, use_programs))
                 if self.current_row == row_count:
                     break
+            if len(courses) == len(course_ids):
+                repeats = [*repeats[-1:], (first_loop_id, courses)]
+        if cache_key is not None:
+            self._cache.put(cache_key, self.knit_graph)
         return self.knit_graph
 
+    def compile_many(self, patterns: Iterable[Tuple[int, int, str]], patternIsFile: bool = False) -> Iterator[Knit_Graph]:
+        """
+        Compiles each pattern with this compiler, reusing its parser between patterns. May throw errors from compilation
+        :param patterns: the starting width, row count, and pattern of each compile
+        :param patternIsFile: True if the patterns are provided in files
+        :return: the compiled knit graph of each pattern, in order, as each compile completes
+        """
+        for starting_width, row_count, pattern in patterns:
+            yield self.compile(starting_width, row_count, pattern, patternIsFile)
+
+    def _compile_course(self, course_id: int, use_programs: bool) -> tuple:
+        """
+        Executes the instructions of a course over the last course and adds the resulting loops to the knit graph.
+        The stitches a course makes depend only on the width of the last course and the side it is worked on,
+        unless its instructions read the current row.
+        So if use_programs is True, the first time a course is worked at a width and side its stitches are recorded
+        and later they are run as a flat stitch program instead of re-interpreting the instructions
+        :param course_id: the id of the course to compile
+        :param use_programs: True if the instructions do not depend on the current row
+        :return: the parent ids, pull directions, depths, and parent offsets of the course's new loops
+         and the loop ids left in the course (including slipped loops)
+        """
+        program_key = (course_id, len(self.last_course_loop_ids), self._working_ws)
+        if use_programs and program_key in self._stitch_programs:
+            self._run_stitch_program(self._stitch_programs[program_key])
+        else:
+            if use_programs:
+                self._recorded_stitches = []
+            course_instructions = self.course_ids_to_operations[course_id]
+            while len(self.loop_ids_consumed_by_current_course) < len(self.last_course_loop_ids):
+                for instruction in course_instructions:
+                    self._process_instruction(instruction)
+                    if len(self.loop_ids_consumed_by_current_course) == len(self.last_course_loop_ids):
+                        break
+            if use_programs:
+                self._stitch_programs[program_key] = self._recorded_stitches
+                self._recorded_stitches = None
+        course = (self._course_parent_ids, self._course_pull_directions, self._course_depths,
+                  self._course_parent_offsets, self.cur_course_loop_ids)
+        self._add_current_course()
+        self.last_course_loop_ids = self.cur_course_loop_ids
+        self.cur_course_loop_ids = []
+        self.loop_ids_consumed_by_current_course = set()
+        return course
+
+    @staticmethod
+    def _shifted(course: tuple, shift: int) -> tuple:
+        """
+        :param course: a course record made by _compile_course
+        :param shift: the offset added to every loop id
+        :return: the course record with every loop id shifted
+        """
+        parent_ids, pull_directions, depths, parent_offsets, loop_ids = course
+        return ([[parent_id + shift for parent_id in parents] for parents in parent_ids], pull_directions, depths,
+                parent_offsets, [loop_id + shift for loop_id in loop_ids])
+
+    def _repeats_match(self, first_repeat: Tuple[int, List[tuple]], second_repeat: Tuple[int, List[tuple]]) -> bool:
+        """
+        :param first_repeat: the first loop id and course records of a repeat
+        :param second_repeat: the first loop id and course records of the repeat that follows it
+        :return: True if the second repeat is the first repeat with its loop ids shifted,
+         in which case every following repeat is the second shifted by the same amount
+        """
+        shift = second_repeat[0] - first_repeat[0]
+        return all(self._shifted(first_course, shift) == second_course
+                   for first_course, second_course in zip(first_repeat[1], second_repeat[1]))
+
+    def _tile_repeat(self, first_loop_id: int, courses: List[tuple], row_count: int):
+        """
+        Adds copies of the last compiled repeat until row_count rows are compiled, without interpreting their instructions
+        :param first_loop_id: the first loop id made by the repeat
+        :param courses: the course records of the repeat
+        :param row_count: the number of rows to compile
+        """
+        shift = self.knit_graph.last_loop_id + 1 - first_loop_id  # the number of loops made by each repeat
+        copy_shift = shift
+        while self.current_row < row_count:
+            for course in courses:
+                parent_ids, pull_directions, depths, parent_offsets, loop_ids = self._shifted(course, copy_shift)
+                self._increment_current_row()
+                self.knit_graph.add_course(self.yarn.yarn_id, parent_ids, pull_directions, depths, parent_offsets)
+                self.last_course_loop_ids = loop_ids
+                if self.current_row == row_count:
+                    break
+            copy_shift += shift
+
+    @staticmethod
+    def _num_closures(instructions) -> Iterator[Num_Closure]:
+        """
+        :param instructions: course instructions or any part of them
+        :return: every number closure in the instructions, including those nested in other closures
+        """
+        if isinstance(instructions, Num_Closure):
+            yield instructions
+            if isinstance(instructions, Operation_Closure):
+                yield from Knitspeak_Compiler._num_closures(instructions.first_num)
+                yield from Knitspeak_Compiler._num_closures(instructions.second_num)
+            elif isinstance(instructions, Num_Assignment_Closure):
+                yield from Knitspeak_Compiler._num_closures(instructions.assignment)
+        elif isinstance(instructions, dict):
+            for value in instructions.values():
+                yield from Knitspeak_Compiler._num_closures(value)
+        elif isinstance(instructions, (list, tuple)):
+            for item in instructions:
+                yield from Knitspeak_Compiler._num_closures(item)
+
     def populate_0th_course(self, starting_width: int):
         """
         Populates the first course of the knitgraph with starting_width loops.
         Adds loop_ids in yarn-wise order to self.last_course_loop_ids
         :param starting_width: the number of loops to create
         """
-        for i in range(0, starting_width):
-            loop_id, loop = self.yarn.add_loop_to_end()
-            self.knit_graph.add_loop(loop)
-            self.last_course_loop_ids.append(loop_id)
+        loop_ids = self.knit_graph.add_course(self.yarn.yarn_id, [[] for _ in range(0, starting_width)])
+        self.last_course_loop_ids.extend(loop_ids)
+
+    def _add_current_course(self):
+        """
+        Adds the loops made by the stitches of the current course to the knit graph in one batch
+        """
+        self.knit_graph.add_course(self.yarn.yarn_id, self._course_parent_ids, self._course_pull_directions,
+                                   self._course_depths, self._course_parent_offsets)
+        self._course_parent_ids = []
+        self._course_pull_directions = []
+        self._course_depths = []
+        self._course_parent_offsets = []
+
+    @property
+    def _next_loop_id(self) -> int:
+        """
+        :return: the id of the loop made by the next stitch in the current course
+        """
+        return self.knit_graph.last_loop_id + 1 + len(self._course_parent_ids)
 
     def _organize_courses(self):
         """
@@ -185,38 +369,48 @@ class Knitspeak_Compiler:
         """
         if self._working_ws and not flipped_by_cable:  # flips stitches following hand-knitting conventions
             stitch_def = stitch_def.copy_and_flip()
-        course_index = len(self.cur_course_loop_ids)
-        prior_course_index = (len(self.last_course_loop_ids) - 1) - course_index
-        if stitch_def.child_loops == 1:
-            # Todo: Implement processing the stitch into the knitgraph
-            #  add a new loop to the end of  self.yarn and add it to the self.knitgraph
-            #  iterate over the stitch's parent offsets in their stack order
-            #   the index of the parent_loop in self.last_course_loop_ids will be the prior_course_index plus the offset
-            #   mark the parent_loop as "consumed" by putting it in the loop_ids_consumed_by_current_course set
-            #   then connect that parent loop to the new child_loop given the stitch information in the stitch_def
-            #  add the newly created loop to the end of self.cur_course_loop_ids
-            loop_id, loop = self.yarn.add_loop_to_end()
-            self.knit_graph.add_loop(loop)
-            for stack_position, parent_offset in enumerate(stitch_def.offset_to_parent_loops):
-                parent_index = prior_course_index + parent_offset
-                assert 0 <= parent_index < len(self.last_course_loop_ids), f"Knitspeak Error: Cannot find a loop at index {parent_index}"
-                parent_loop_id = self.last_course_loop_ids[parent_index]
-                assert parent_loop_id not in self.loop_ids_consumed_by_current_course, \
-                    f"Knitspeak Error: Loop {parent_loop_id} has already been used"
-                self.loop_ids_consumed_by_current_course.add(parent_loop_id)
-                self.knit_graph.connect_loops(parent_loop_id, loop_id, stitch_def.pull_direction,
-                                              stack_position, stitch_def.cabling_depth, parent_offset)
-            self.cur_course_loop_ids.append(loop_id)
-        else:  # slip statement
-            assert len(stitch_def.offset_to_parent_loops) == 1, "Cannot slip multiple loops"
-            for stack_position, parent_offset in enumerate(stitch_def.offset_to_parent_loops):
-                parent_index = (len(self.last_course_loop_ids) - 1) - course_index + parent_offset
-                assert 0 <= parent_index < len(self.last_course_loop_ids), f"Knitspeak Error: Cannot find a loop at index {parent_index}"
-                parent_loop_id = self.last_course_loop_ids[parent_index]
-                assert parent_loop_id not in self.loop_ids_consumed_by_current_course, \
-                    f"Knitspeak Error: Loop {parent_loop_id} has already been used"
-                self.loop_ids_consumed_by_current_course.add(parent_loop_id)
-                self.cur_course_loop_ids.append(parent_loop_id)
+        stitch = (stitch_def.offset_to_parent_loops, stitch_def.pull_direction, stitch_def.cabling_depth,
+                  stitch_def.child_loops)
+        if self._recorded_stitches is not None:
+            self._recorded_stitches.append(stitch)
+        self._run_stitch_program([stitch])
+
+    def _run_stitch_program(self, stitches: List[Tuple[List[int], Pull_Direction, int, int]]):
+        """
+        Makes each stitch over the next loops of the last course. Stitches are already flipped for wrong-side rows.
+        May throw the compiler errors of _process_stitch
+        :param stitches: the parent offsets, pull direction, depth, and child loop count of each stitch
+        """
+        last_course_loop_ids = self.last_course_loop_ids
+        last_index = len(last_course_loop_ids) - 1
+        consumed = self.loop_ids_consumed_by_current_course
+        cur_course_loop_ids = self.cur_course_loop_ids
+        for offset_to_parent_loops, pull_direction, cabling_depth, child_loops in stitches:
+            prior_course_index = last_index - len(cur_course_loop_ids)
+            if child_loops == 1:
+                # the loop is added to the knit graph with the rest of the course, see _add_current_course
+                loop_id = self._next_loop_id
+                parent_ids = []
+                for parent_offset in offset_to_parent_loops:
+                    parent_index = prior_course_index + parent_offset
+                    assert 0 <= parent_index <= last_index, f"Knitspeak Error: Cannot find a loop at index {parent_index}"
+                    parent_loop_id = last_course_loop_ids[parent_index]
+                    assert parent_loop_id not in consumed, f"Knitspeak Error: Loop {parent_loop_id} has already been used"
+                    consumed.add(parent_loop_id)
+                    parent_ids.append(parent_loop_id)
+                self._course_parent_ids.append(parent_ids)
+                self._course_pull_directions.append(pull_direction)
+                self._course_depths.append(cabling_depth)
+                self._course_parent_offsets.append(offset_to_parent_loops)
+                cur_course_loop_ids.append(loop_id)
+            else:  # slip statement
+                assert len(offset_to_parent_loops) == 1, "Cannot slip multiple loops"
+                parent_index = prior_course_index + offset_to_parent_loops[0]
+                assert 0 <= parent_index <= last_index, f"Knitspeak Error: Cannot find a loop at index {parent_index}"
+                parent_loop_id = last_course_loop_ids[parent_index]
+                assert parent_loop_id not in consumed, f"Knitspeak Error: Loop {parent_loop_id} has already been used"
+                consumed.add(parent_loop_id)
+                cur_course_loop_ids.append(parent_loop_id)
 
     def _process_cable(self, cable_def: Cable_Definition):
         """
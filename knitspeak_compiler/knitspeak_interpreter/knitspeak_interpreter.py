@@ -1,10 +1,36 @@
 """Components of the parglare parser for knitspeak"""
 
 import os
-from typing import List, Dict, Union
+import threading
+from typing import List, Dict, Union, Optional, Tuple
 
 from knitspeak_compiler.knitspeak_interpreter.symbol_table import Symbol_Table
 from parglare import Grammar, Parser
+from parglare.closure import LR_1
+from parglare.tables import LRTable, create_load_table
+
+_GRAMMAR_LOCATION = os.path.join(os.path.dirname(__file__), "knitspeak.pg")
+_shared_grammar_lock = threading.Lock()
+_shared_grammar: Optional[Tuple[float, Grammar, LRTable]] = None  # .pg modification time, grammar, LR table
+
+
+def shared_grammar() -> Tuple[Grammar, LRTable]:
+    """
+    The knitspeak grammar and its LR table are built once per process and shared by every KnitSpeak_Interpreter.
+    The table is loaded from knitspeak.pgt, which parglare regenerates if knitspeak.pg is newer.
+    Both are rebuilt if knitspeak.pg changes while the process is running
+    :return: the knitspeak grammar and its LR table
+    """
+    global _shared_grammar
+    with _shared_grammar_lock:
+        grammar_mtime = os.path.getmtime(_GRAMMAR_LOCATION)
+        if _shared_grammar is None or _shared_grammar[0] != grammar_mtime:
+            grammar = Grammar.from_file(_GRAMMAR_LOCATION, ignore_case=True)
+            # parameters match the defaults of parglare.Parser so the shared table matches a Parser built table
+            table = create_load_table(grammar, itemset_type=LR_1, start_production=1, prefer_shifts=True,
+                                      prefer_shifts_over_empty=True, lexical_disambiguation=True)
+            _shared_grammar = grammar_mtime, grammar, table
+        return _shared_grammar[1], _shared_grammar[2]
 
 
 class KnitSpeak_Interpreter:
@@ -19,15 +45,17 @@ class KnitSpeak_Interpreter:
 
     def __init__(self, debugGrammar: bool = False, debugParser: bool = False, debugParserLayout: bool = False):
         """
-        Initializes a parser
-        :param debugGrammar: If true, parglare is set to debug mode
+        Initializes a parser over the shared grammar, see shared_grammar
+        :param debugGrammar: If true, parglare is set to debug mode and a new grammar and table are built
         :param debugParser: if true, parglare parser is set to debug mod
         :param debugParserLayout: if true, parser layout is debuggable
         """
-        directory = os.path.dirname(__file__)
-        pg_loc = directory + f"{os.path.sep}knitspeak.pg"
-        self._grammar = Grammar.from_file(pg_loc, debug=debugGrammar, ignore_case=True)
-        self.parser = Parser(self._grammar, debug=debugParser, debug_layout=debugParserLayout)
+        if debugGrammar:
+            self._grammar = Grammar.from_file(_GRAMMAR_LOCATION, debug=debugGrammar, ignore_case=True)
+            self.parser = Parser(self._grammar, debug=debugParser, debug_layout=debugParserLayout)
+        else:
+            self._grammar, table = shared_grammar()
+            self.parser = Parser(self._grammar, debug=debugParser, debug_layout=debugParserLayout, table=table)
         self.parser.symbolTable = Symbol_Table()
 
     def interpret(self, pattern: str, pattern_is_file: bool = False) -> List[Dict[str, Union[List[int], List[tuple]]]]:
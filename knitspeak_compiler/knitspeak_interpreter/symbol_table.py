@@ -1,5 +1,5 @@
 """Symbol Table structure holds definitions of stitches and context for number variables"""
-from typing import Dict, Union
+from typing import Dict, Union, Optional
 
 from knit_graphs.Knit_Graph import Pull_Direction
 from knitspeak_compiler.knitspeak_interpreter.cable_definitions import Cable_Definition
@@ -10,14 +10,27 @@ class Symbol_Table:
     """
     A class used to keep track of how stitches and number variables have been defined. Includes language defaults
     """
+    # the language defaults, built by the first symbol table and copied by the rest.
+    # Definitions are shared between tables, they are copied before they are changed (e.g., copy_and_flip)
+    _default_symbols: Optional[Dict[str, Union[Cable_Definition, Stitch_Definition, int]]] = None
 
     def __init__(self):
-        self._symbol_table: Dict[str, Union[Cable_Definition, Stitch_Definition, int]] = {"k": self._knit(), "p": self._purl(),
-                                                                                         "yo": self._yo(), "slip": self._slip()}
-        self._decreases()
-        self._cables()
-        # set current row variable
-        self._symbol_table["current_row"] = 0
+        self._symbol_table: Dict[str, Union[Cable_Definition, Stitch_Definition, int]] = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Removes the symbols defined by compiled patterns, leaving only the language defaults
+        """
+        if Symbol_Table._default_symbols is None:
+            self._symbol_table = {"k": self._knit(), "p": self._purl(), "yo": self._yo(), "slip": self._slip()}
+            self._decreases()
+            self._cables()
+            # set current row variable
+            self._symbol_table["current_row"] = 0
+            Symbol_Table._default_symbols = dict(self._symbol_table)
+        else:
+            self._symbol_table = dict(Symbol_Table._default_symbols)
 
     def _cables(self):
         # Todo: Add cable symbols keyed to their definitions to the symbol table
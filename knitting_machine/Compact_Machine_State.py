@@ -0,0 +1,234 @@
+"""An array-backed machine state used for wide beds and long knitting programs"""
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence
+
+from knitting_machine.Machine_State import Machine_Bed, Machine_State, Needle, Yarn_Carrier
+
+_NO_NEEDLE = -1  # needle position of loops that are not held on the bed
+
+
+class Compact_Machine_Bed(Machine_Bed):
+    """
+    A Machine_Bed that keeps the loops on its needles in typed arrays instead of a dictionary of lists
+    ...
+    Most needles hold at most one loop, so each needle stores its loop count and its top loop.
+    The loops beneath the top loop are only stored for needles holding a stack of loops.
+    Loop ids are indexed directly to find the needle holding them.
+    held_loops and loops_to_needle are built on request and are copies of the bed.
+
+    Attributes
+    ----------
+    held_loops : Dict[int, List[int]
+        a dictionary keyed by needle positions to the stack of loops on the needle
+    loops_to_needle: Dict[int, Optional[int]]
+        A dictionary keyed by the ids of loops held on the bed to the needle location that holds them
+    """
+
+    def __init__(self, is_front: bool, needle_count: int = 250):
+        """
+        A representation of the state of a bed on the machine
+        :param is_front: True if this is the front bed, false if it is the back bed
+        :param needle_count: the number of needles that are on this bed
+        """
+        self._is_front: bool = is_front
+        self._needle_count: int = needle_count
+        self._loop_counts: array = array("h", [0]) * needle_count  # the number of loops held on each needle
+        self._top_loops: array = array("q", [0]) * needle_count  # the last loop added to each needle, if it has loops
+        self._stacked_loops: Dict[int, List[int]] = {}  # needles with more than one loop to the loops below the top
+        self._loop_needles: array = array("i")  # the needle position of each loop id, _NO_NEEDLE if not held
+        self._other_loop_needles: Dict[int, int] = {}  # needle positions of negative loop ids (e.g., cast-on tucks)
+        self._occupied_positions: List[int] = []  # sorted positions of the needles holding loops
+
+    @property
+    def held_loops(self) -> Dict[int, List[int]]:
+        """
+        :return: a dictionary keyed by needle positions to the stack of loops on the needle
+        """
+        return {needle_position: self[needle_position] for needle_position in range(0, self.needle_count)}
+
+    @property
+    def loops_to_needle(self) -> Dict[int, Optional[int]]:
+        """
+        :return: A dictionary keyed by the ids of loops held on the bed to the needle location that holds them
+        """
+        loops_to_needle = {loop_id: position for loop_id, position in enumerate(self._loop_needles)
+                           if position != _NO_NEEDLE}
+        loops_to_needle.update((loop_id, position) for loop_id, position in self._other_loop_needles.items()
+                               if position != _NO_NEEDLE)
+        return loops_to_needle
+
+    def _set_needle_of_loop(self, loop_id: int, needle_position: int):
+        """
+        :param loop_id: the loop that was moved
+        :param needle_position: the needle now holding the loop or _NO_NEEDLE
+        """
+        if loop_id < 0:
+            self._other_loop_needles[loop_id] = needle_position
+            return
+        if loop_id >= len(self._loop_needles):
+            if needle_position == _NO_NEEDLE:
+                return
+            self._loop_needles.extend(array("i", [_NO_NEEDLE]) * max(loop_id + 1 - len(self._loop_needles),
+                                                                     len(self._loop_needles)))
+        self._loop_needles[loop_id] = needle_position
+
+    def add_loop(self, loop_id: Optional[int], needle_position: int, drop_prior_loops: bool = True):
+        """
+        Puts the loop_id on given needle, overrides existing loops as if a knit operation took place
+        :param drop_prior_loops: If true, any loops currently held on this needle are dropped
+        :param loop_id: the loop_id to be held on the needle
+        :param needle_position: the position of the needle
+        """
+        assert 0 <= needle_position < self.needle_count, f"Cannot place a loop at position {needle_position}"
+        assert loop_id is not None, "Compact_Machine_Bed only holds loops with ids"
+        if drop_prior_loops:
+            self.drop_loop(needle_position)
+        loop_count = self._loop_counts[needle_position]
+        if loop_count == 0:
+            self._mark_occupied(needle_position)
+        else:
+            if needle_position in self._stacked_loops:
+                self._stacked_loops[needle_position].append(self._top_loops[needle_position])
+            else:
+                self._stacked_loops[needle_position] = [self._top_loops[needle_position]]
+        self._top_loops[needle_position] = loop_id
+        self._loop_counts[needle_position] = loop_count + 1
+        self._set_needle_of_loop(loop_id, needle_position)
+
+    def add_loops(self, first_position: int, loop_ids: Sequence[int]):
+        """
+        Puts one loop on each needle in a range, dropping the loops held on those needles, as if the range was knit
+        :param first_position: the position of the first needle in the range
+        :param loop_ids: the loop made on each needle in the range, left to right
+        """
+        end_position = first_position + len(loop_ids)
+        assert 0 <= first_position and end_position <= self.needle_count, \
+            f"Cannot place loops at positions {first_position} to {end_position - 1}"
+        for needle_position in range(first_position, end_position):
+            if self._loop_counts[needle_position] > 0:
+                self.drop_loop(needle_position)
+        self._top_loops[first_position:end_position] = array("q", loop_ids)
+        self._loop_counts[first_position:end_position] = array("h", [1]) * len(loop_ids)
+        self._occupied_positions[bisect_left(self._occupied_positions, first_position):
+                                 bisect_left(self._occupied_positions, end_position)] = range(first_position, end_position)
+        for needle_position, loop_id in enumerate(loop_ids, first_position):
+            self._set_needle_of_loop(loop_id, needle_position)
+
+    def drop_loop(self, needle_position: int):
+        """
+        Clears the loops held at this position as though a drop operation has been done
+        :param needle_position:
+        """
+        assert 0 <= needle_position < self.needle_count, f"Cannot drop a loop at position {needle_position}"
+        if self._loop_counts[needle_position] == 0:
+            return
+        for loop_id in self[needle_position]:
+            self._set_needle_of_loop(loop_id, _NO_NEEDLE)
+        self._loop_counts[needle_position] = 0
+        self._mark_empty(needle_position)
+        self._stacked_loops.pop(needle_position, None)
+
+    def __getitem__(self, item: int) -> List[int]:
+        """
+        :param item: the needle position to get a loop from
+        :return: the loop_ids held at that position, a copy of the bed
+        """
+        assert 0 <= item < self.needle_count, f"No needle at position {item}"
+        loop_count = self._loop_counts[item]
+        if loop_count == 0:
+            return []
+        elif loop_count == 1:
+            return [self._top_loops[item]]
+        else:
+            return [*self._stacked_loops[item], self._top_loops[item]]
+
+    def get_needle_of_loop(self, loop_id: int) -> Optional[int]:
+        """
+        :param loop_id: the loop being searched for
+        :return: None if the bed does not hold the loop, otherwise the needle position that holds it
+        """
+        if loop_id is None:
+            return None
+        elif loop_id < 0:
+            needle_position = self._other_loop_needles.get(loop_id, _NO_NEEDLE)
+        elif loop_id < len(self._loop_needles):
+            needle_position = self._loop_needles[loop_id]
+        else:
+            return None
+        if needle_position == _NO_NEEDLE:
+            return None
+        return needle_position
+
+
+class Compact_Machine_State(Machine_State):
+    """
+    A Machine_State with array-backed beds and operations that apply to many needles at once
+    ...
+
+    Attributes
+    ----------
+    racking: int
+        The current racking of the machine: R = f-b
+    front_bed: Compact_Machine_Bed
+        The status of needles on the front bed
+    back_bed: Compact_Machine_Bed
+        The status of needles on the back bed
+    last_carriage_direction: Pass_Direction
+        the last direction the carriage took, used to infer the current position of the carriage (left or right)
+    in_hooks: Set[Yarn_Carrier]
+        The set of yarn carriers that are currently hooked on the machine and active
+    yarns_in_operation: Set[Yarn_Carrier]
+        The current yarns that being knit with and have not been cut, may also be hooked
+    """
+    _bed_type = Compact_Machine_Bed
+
+    def knit_needles(self, first_position: int, loop_ids: Sequence[int], on_front: bool,
+                     carrier_set: Optional[Yarn_Carrier] = None):
+        """
+        Makes a loop on each needle in a range, dropping the loops held on those needles
+        :param first_position: the position of the first needle in the range
+        :param loop_ids: the loop made on each needle in the range, left to right
+        :param on_front: True if the range is on the front bed, false if it is on the back bed
+        :param carrier_set: the set of yarns making the loops
+        """
+        if carrier_set is not None:
+            assert len(carrier_set.not_in_operation(self)) == 0, f"{carrier_set} not in operation"
+        if on_front:
+            self.front_bed.add_loops(first_position, loop_ids)
+        else:
+            self.back_bed.add_loops(first_position, loop_ids)
+
+    def xfer_needles(self, starting_positions: Sequence[int], racking: int, front_to_back: bool):
+        """
+        Racks the machine and transfers the loops on each starting needle to the opposite bed
+        :param starting_positions: the needles to transfer loops from
+        :param racking: the racking of the transfers: R = f-b
+        :param front_to_back: True if transferring from the front bed to the back bed, false otherwise
+        """
+        assert abs(racking) <= self.machine_profile.max_racking, f"Cannot rack to {racking} on the {self.machine_profile}"
+        self.racking = racking
+        if front_to_back:
+            source_bed, target_bed, target_offset = self.front_bed, self.back_bed, -racking
+        else:
+            source_bed, target_bed, target_offset = self.back_bed, self.front_bed, racking
+        for starting_position in starting_positions:
+            loops = source_bed[starting_position]
+            assert len(loops) > 0, f"No loop at {Needle(front_to_back, starting_position)}"
+            source_bed.drop_loop(starting_position)
+            for loop_id in loops:
+                target_bed.add_loop(loop_id, starting_position + target_offset, drop_prior_loops=False)
+
+    def get_needle_of_loop(self, loop_id: int) -> Optional[Needle]:
+        """
+        :param loop_id: the loop being searched for
+        :return: the needle holding the loop or None if it not held
+        """
+        front_pos = self.front_bed.get_needle_of_loop(loop_id)
+        if front_pos is not None:
+            assert self.back_bed.get_needle_of_loop(loop_id) is None, f"Loop {loop_id} cannot be on both beds"
+            return self.needles.needle(is_front=True, position=front_pos)
+        back_pos = self.back_bed.get_needle_of_loop(loop_id)
+        if back_pos is None:
+            return None
+        return self.needles.needle(is_front=False, position=back_pos)
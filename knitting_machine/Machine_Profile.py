@@ -0,0 +1,67 @@
+"""The description of a knitting machine used to model it and write knitout headers"""
+from typing import List
+
+
+class Machine_Profile:
+    """
+    The properties of a V-bed knitting machine
+    ...
+
+    Attributes
+    ----------
+    name: str
+        the machine name written to the knitout header
+    needle_count: int
+        the number of needles on each bed
+    gauge: int
+        the number of needles per inch
+    carrier_count: int
+        the number of yarn carriers, carriers are numbered 1 to carrier_count
+    max_racking: int
+        the largest offset between the front and back beds that the machine can rack to
+    """
+
+    def __init__(self, name: str = "SWG091N2", needle_count: int = 250, gauge: int = 5, carrier_count: int = 10,
+                 max_racking: int = 8):
+        """
+        The defaults describe the Shima Seiki SWG091N2
+        :param name: the machine name written to the knitout header
+        :param needle_count: the number of needles on each bed
+        :param gauge: the number of needles per inch
+        :param carrier_count: the number of yarn carriers
+        :param max_racking: the largest offset between the front and back beds that the machine can rack to
+        """
+        assert needle_count > 0, f"A machine needs needles, not {needle_count}"
+        assert carrier_count > 0, f"A machine needs carriers, not {carrier_count}"
+        self.name: str = name
+        self.needle_count: int = needle_count
+        self.gauge: int = gauge
+        self.carrier_count: int = carrier_count
+        self.max_racking: int = max_racking
+
+    @property
+    def carrier_ids(self) -> List[int]:
+        """
+        :return: the ids of the carriers on the machine
+        """
+        return [*range(1, self.carrier_count + 1)]
+
+    def header(self, position: str = "Center") -> List[str]:
+        """
+        :param position: where to place the operations on the needle bed; Left, Center, Right,
+         and Keep are standard values
+        :return: the knitout header lines describing this machine
+        """
+        carriers = " ".join(str(carrier_id) for carrier_id in self.carrier_ids)
+        return [";!knitout-2\n",
+                f";;Machine: {self.name}\n",
+                f";;Gauge: {self.gauge}\n",
+                f";;Width: {self.needle_count}\n",
+                f";;Carriers: {carriers}\n",
+                f";;Position: {position}\n"]
+
+    def __str__(self):
+        return f"{self.name} ({self.needle_count} needles, gauge {self.gauge})"
+
+    def __repr__(self):
+        return str(self)
@@ -1,7 +1,10 @@
 """The class structures used to maintain the machine state"""
+from bisect import bisect_left, bisect_right, insort
 from enum import Enum
 from typing import Optional, List, Tuple, Dict, Union, Set
 
+from knitting_machine.Machine_Profile import Machine_Profile
+
 
 class Pass_Direction(Enum):
     """
@@ -47,22 +50,52 @@ class Pass_Direction(Enum):
 
 class Needle:
     """
-    A Simple class structure for keeping track of needle locations
+    A Simple class structure for keeping track of needle locations.
+    Needles are immutable and equal to any needle on the same bed at the same position.
+    Needles from a Needle_Table are interned, so their opposite and offset needles are looked up, not made
+    ...
     """
+    __slots__ = ("_is_front", "_position", "_index", "_table")
 
-    def __init__(self, is_front: bool, position: int):
+    def __init__(self, is_front: bool, position: int, needle_table: Optional["Needle_Table"] = None):
         """
         :param is_front: True if front bed needle, False otherwise
         :param position: the needle index of this needle
+        :param needle_table: the Needle_Table interning this needle, None for a needle that is not interned
+        """
+        assert position is not None
+        self._is_front: bool = is_front
+        self._position: int = position
+        self._index: int = position * 2 + (0 if is_front else 1)
+        self._table: Optional[Needle_Table] = needle_table
+
+    @property
+    def index(self) -> int:
+        """
+        :return: twice the position of the needle, plus one for back needles
         """
-        self.is_front: bool = is_front
-        self.position: int = position
-        assert self.position is not None
+        return self._index
+
+    @property
+    def is_front(self) -> bool:
+        """
+        :return: True if front bed needle, False otherwise
+        """
+        return self._is_front
+
+    @property
+    def position(self) -> int:
+        """
+        :return: the needle index of this needle
+        """
+        return self._position
 
     def opposite(self):
         """
         :return: the needle on the opposite bed at the same position
         """
+        if self._table is not None:
+            return self._table[self._index ^ 1]
         return Needle(is_front=not self.is_front, position=self.position)
 
     def offset(self, offset: int):
@@ -70,6 +103,8 @@ class Needle:
         :param offset: the amount to offset the needle from
         :return: the needle offset spaces away on the same bed
         """
+        if self._table is not None:
+            return self._table[self._index + 2 * offset]
         return Needle(is_front=self.is_front, position=self.position + offset)
 
     def __str__(self):
@@ -82,7 +117,12 @@ class Needle:
         return str(self)
 
     def __hash__(self):
-        return self.position
+        return self._index
+
+    def __eq__(self, other):
+        if isinstance(other, Needle):
+            return self._index == other._index
+        return False
 
     def __lt__(self, other):
         if isinstance(other, Needle):
@@ -93,9 +133,67 @@ class Needle:
             raise AttributeError
 
 
+class Needle_Table:
+    """
+    The interned needles of a machine, one needle object per bed and position, indexed by Needle.index.
+    Tables are shared by machines with the same number of needles, see needle_table
+    ...
+
+    Attributes
+    ----------
+    needle_count: int
+        the number of needles on each bed
+    """
+
+    def __init__(self, needle_count: int):
+        """
+        :param needle_count: the number of needles on each bed
+        """
+        self.needle_count: int = needle_count
+        self._needles: List[Needle] = []
+        for position in range(0, needle_count):
+            for is_front in [True, False]:
+                self._needles.append(Needle(is_front, position, needle_table=self))
+
+    def needle(self, is_front: bool, position: int) -> Needle:
+        """
+        :param is_front: True for a front bed needle
+        :param position: the position of the needle
+        :return: the interned needle, or a new needle if the position is off the beds
+        """
+        return self[position * 2 + (0 if is_front else 1)]
+
+    def __getitem__(self, index: int) -> Needle:
+        """
+        :param index: the index of a needle: twice its position, plus one for back needles
+        :return: the interned needle, or a new needle if the position is off the beds
+        """
+        if 0 <= index < len(self._needles):
+            return self._needles[index]
+        return Needle(is_front=index % 2 == 0, position=index // 2)
+
+    def __len__(self):
+        return len(self._needles)
+
+
+_needle_tables: Dict[int, Needle_Table] = {}  # needle counts to the table of needles shared by machines of that size
+
+
+def needle_table(needle_count: int) -> Needle_Table:
+    """
+    :param needle_count: the number of needles on each bed
+    :return: the interned needles of machines with that many needles
+    """
+    if needle_count not in _needle_tables:
+        _needle_tables[needle_count] = Needle_Table(needle_count)
+    return _needle_tables[needle_count]
+
+
 class Machine_Bed:
     """
     A structure to hold information about loops held on one bed of needles...
+    The positions of needles holding loops are kept sorted so that occupied needles can be found
+     without visiting every needle on the bed
 
     Attributes
     ----------
@@ -117,6 +215,7 @@ class Machine_Bed:
         self.held_loops: Dict[int, List[int]] = {i: [] for i in range(0, self.needle_count)}  # increasing indices indicate needles moving from left to right
         # i.e., LEFT -> 0 1 2....N <- RIGHT of Machine
         self.loops_to_needle: Dict[int, Optional[int]] = {}
+        self._occupied_positions: List[int] = []  # sorted positions of the needles holding loops
 
     @property
     def needle_count(self) -> int:
@@ -140,9 +239,16 @@ class Machine_Bed:
         :param needle_position: the position of the needle
         """
         assert 0 <= needle_position < self.needle_count, f"Cannot place a loop at position {needle_position}"
-        if drop_prior_loops:
-            self.drop_loop(needle_position)
-        self.held_loops[needle_position].append(loop_id)
+        current_loops = self.held_loops[needle_position]
+        if len(current_loops) == 0:
+            self._mark_occupied(needle_position)
+            current_loops.append(loop_id)
+        elif drop_prior_loops:  # the needle stays occupied, so the occupied needle index is unchanged
+            for loop in current_loops:
+                self.loops_to_needle[loop] = None
+            self.held_loops[needle_position] = [loop_id]
+        else:
+            current_loops.append(loop_id)
         self.loops_to_needle[loop_id] = needle_position
 
     def drop_loop(self, needle_position: int):
@@ -152,10 +258,26 @@ class Machine_Bed:
         """
         assert 0 <= needle_position < self.needle_count, f"Cannot drop a loop at position {needle_position}"
         current_loops = self.held_loops[needle_position]
+        if len(current_loops) > 0:
+            self._mark_empty(needle_position)
         self.held_loops[needle_position] = []
         for loop in current_loops:
             self.loops_to_needle[loop] = None
 
+    def _mark_occupied(self, needle_position: int):
+        """
+        Adds an empty needle that is getting a loop to the occupied needle index
+        :param needle_position: the position of the needle
+        """
+        insort(self._occupied_positions, needle_position)
+
+    def _mark_empty(self, needle_position: int):
+        """
+        Removes a needle that no longer holds loops from the occupied needle index
+        :param needle_position: the position of the needle
+        """
+        del self._occupied_positions[bisect_left(self._occupied_positions, needle_position)]
+
     def __getitem__(self, item: int) -> List[int]:
         """
         :param item: the needle position to get a loop from
@@ -163,6 +285,42 @@ class Machine_Bed:
         """
         return self.held_loops[item]
 
+    def occupied_needles(self, first_position: int = 0, last_position: Optional[int] = None) -> List[int]:
+        """
+        :param first_position: the leftmost needle position to include
+        :param last_position: the rightmost needle position to include, by default the last needle on the bed
+        :return: the positions of the needles holding loops in the range, left to right
+        """
+        start = bisect_left(self._occupied_positions, first_position)
+        if last_position is None:
+            return self._occupied_positions[start:]
+        return self._occupied_positions[start:bisect_right(self._occupied_positions, last_position)]
+
+    @property
+    def occupied_count(self) -> int:
+        """
+        :return: the number of needles holding loops
+        """
+        return len(self._occupied_positions)
+
+    @property
+    def leftmost_occupied(self) -> Optional[int]:
+        """
+        :return: the position of the leftmost needle holding loops or None if the bed is empty
+        """
+        if len(self._occupied_positions) == 0:
+            return None
+        return self._occupied_positions[0]
+
+    @property
+    def rightmost_occupied(self) -> Optional[int]:
+        """
+        :return: the position of the rightmost needle holding loops or None if the bed is empty
+        """
+        if len(self._occupied_positions) == 0:
+            return None
+        return self._occupied_positions[-1]
+
     def get_needle_of_loop(self, loop_id: int) -> Optional[int]:
         """
         :param loop_id: the loop being searched for
@@ -277,17 +435,31 @@ class Machine_State:
         The set of yarn carriers that are currently hooked on the machine and active
     yarns_in_operation: Set[Yarn_Carrier]
         The current yarns that being knit with and have not been cut, may also be hooked
+    machine_profile: Machine_Profile
+        The machine being modeled
+    needles: Needle_Table
+        The interned needles of the machine
     """
+    _bed_type = Machine_Bed  # the class used for the front and back beds
 
-    def __init__(self, needle_count: int = 250, racking: float = 0):
+    def __init__(self, needle_count: Optional[int] = None, racking: float = 0,
+                 machine_profile: Optional[Machine_Profile] = None):
         """
         Maintains the state of the machine
-        :param needle_count:the number of needles that are on this bed
+        :param needle_count:the number of needles that are on this bed, by default the needle count of the profile
         :param racking:the current racking between the front and back bed: r=f-b
-        """
+        :param machine_profile: the machine to model, by default a SWG091N2 with needle_count needles
+        """
+        if machine_profile is None:
+            machine_profile = Machine_Profile() if needle_count is None else Machine_Profile(needle_count=needle_count)
+        assert needle_count is None or needle_count == machine_profile.needle_count, \
+            f"{needle_count} needles does not match {machine_profile}"
+        needle_count = machine_profile.needle_count
+        self.machine_profile: Machine_Profile = machine_profile
+        self.needles: Needle_Table = needle_table(needle_count)
         self.racking: float = racking
-        self.front_bed: Machine_Bed = Machine_Bed(is_front=True, needle_count=needle_count)
-        self.back_bed: Machine_Bed = Machine_Bed(is_front=False, needle_count=needle_count)
+        self.front_bed: Machine_Bed = self._bed_type(is_front=True, needle_count=needle_count)
+        self.back_bed: Machine_Bed = self._bed_type(is_front=False, needle_count=needle_count)
         self.last_carriage_direction: Pass_Direction = Pass_Direction.Left_to_Right
         # Presumes carriage is left on Right side before knitting
         self.in_hooks: Set[Yarn_Carrier] = set()
@@ -298,6 +470,9 @@ class Machine_State:
         Declares that the in_hook for this yarn carrier is in use
         :param yarn_carrier: the yarn_carrier to bring in
         """
+        for carrier_id in yarn_carrier:
+            assert carrier_id <= self.machine_profile.carrier_count, \
+                f"Carrier {carrier_id} is not on the {self.machine_profile}"
         self.in_hooks.add(yarn_carrier)
         self.yarns_in_operation.add(yarn_carrier)
 
@@ -390,6 +565,8 @@ class Machine_State:
         :return: Return the updated racking, True if the racking is the same as original
         """
         original = self.racking
+        assert abs(front_pos - back_pos) <= self.machine_profile.max_racking, \
+            f"Cannot rack to {front_pos - back_pos} on the {self.machine_profile}"
         self.racking = front_pos - back_pos
         return self.racking, original == self.racking
 
@@ -428,7 +605,7 @@ class Machine_State:
         if front_pos is None and back_pos is None:
             return None
         elif front_pos is None:
-            return Needle(is_front=False, position=back_pos)
+            return self.needles.needle(is_front=False, position=back_pos)
         else:
             assert back_pos is None, f"Loop {loop_id} cannot be on f{front_pos} and b{back_pos}"
-            return Needle(is_front=True, position=front_pos)
+            return self.needles.needle(is_front=True, position=front_pos)
@@ -0,0 +1,721 @@
+"""
+Encodes executed carriage passes into the DAT raster format knit by Shima Seiki SWG-N2 machines.
+A port of the pass building and raster encoding in KnittingMachineSupport/knitout-backend-swg-master/knitout-to-dat.js
+"""
+import math
+import struct
+from typing import Dict, List, Optional, Tuple
+
+from knitting_machine.Machine_Profile import Machine_Profile
+from knitting_machine.Machine_State import Needle, Pass_Direction, Yarn_Carrier
+from knitting_machine.instruction_buffer import Instruction_Buffer, Opcode
+
+_LEFT = str(Pass_Direction.Right_to_Left)
+_RIGHT = str(Pass_Direction.Left_to_Right)
+_NO_DIRECTION = ""  # drops and transfers
+
+_KNIT_TUCK = "knit-tuck"
+_A_MISS = "a-miss"
+_SPLIT = "split"
+_XFER = "xfer"
+
+_HOOK_IN = "hook-in"  # bring the yarn in with the inserting hook before the pass starts
+_HOOK_RELEASE = "hook-release"  # release the yarn from the hook before the pass starts
+_HOOK_OUT = "hook-out"  # take the yarn out with the hook after the pass ends
+_GRIPPER_IN = "gripper-in"
+_GRIPPER_OUT = "gripper-out"
+
+_KNIT_STITCH = 5  # the machine's stitch table entry used for knitting
+_XFER_STITCH = 0  # the machine's default transfer stitch
+_MAX_RACKING = 8
+
+# margins around the needle slots of each course, in pixels
+_LEFT_SPACE = 10 + 20 * 2 + 5
+_RIGHT_SPACE = 5 + 20 * 2 + 10
+_TOP_SPACE = 1 + 2 + 5
+_BOTTOM_SPACE = 5
+
+
+class Dat_Operation:
+    """
+    The operation done at one needle slot of a pass, drawn as a color in the raster.
+    Operations are compared by identity, combined operations can share a color with a single operation
+    ...
+
+    Attributes
+    ----------
+    color: int
+        the palette index of the operation
+    """
+
+    def __init__(self, color: int):
+        """
+        :param color: the palette index of the operation
+        """
+        self.color: int = color
+
+
+_OP_SOFT_MISS = Dat_Operation(16)  # replaced by any other operation in the same slot
+_OP_MISS_FRONT = Dat_Operation(216)
+_OP_MISS_BACK = Dat_Operation(217)
+_OP_TUCK_FRONT = Dat_Operation(11)
+_OP_TUCK_BACK = Dat_Operation(12)
+_OP_KNIT_FRONT = Dat_Operation(51)
+_OP_KNIT_BACK = Dat_Operation(52)
+_OP_XFER_TO_BACK = Dat_Operation(20)
+_OP_XFER_TO_FRONT = Dat_Operation(30)
+_OP_SPLIT_TO_BACK = Dat_Operation(101)
+_OP_SPLIT_TO_FRONT = Dat_Operation(102)
+_COMBINED_OPERATIONS: Dict[Tuple[Dat_Operation, Dat_Operation], Dat_Operation] = {
+    (_OP_MISS_FRONT, _OP_MISS_BACK): Dat_Operation(16),
+    (_OP_MISS_FRONT, _OP_TUCK_BACK): Dat_Operation(12),
+    (_OP_MISS_FRONT, _OP_KNIT_BACK): Dat_Operation(52),
+    (_OP_TUCK_FRONT, _OP_MISS_BACK): Dat_Operation(11),
+    (_OP_TUCK_FRONT, _OP_TUCK_BACK): Dat_Operation(88),
+    (_OP_TUCK_FRONT, _OP_KNIT_BACK): Dat_Operation(42),
+    (_OP_KNIT_FRONT, _OP_MISS_BACK): Dat_Operation(51),
+    (_OP_KNIT_FRONT, _OP_TUCK_BACK): Dat_Operation(41),
+    (_OP_KNIT_FRONT, _OP_KNIT_BACK): Dat_Operation(3)}
+
+_PALETTE = bytes.fromhex(  # red, then green, then blue values of the 256 colors
+    "ff 00 ff 00 ff 00 ff 00 6c 4a ff b4 99 90 80 cf 52 51 eb 00 fc b2 fc fc fc fc 64 d8 eb a0 90 73 "
+    "9d 73 d8 eb ff b4 ac d7 d8 7f d8 90 ca d8 ae bc 80 9f ff dc fc c0 d8 fc 90 ff fd b4 00 a0 32 32 "
+    "00 35 d8 d8 a8 c0 ff 99 b7 00 e2 c5 90 c0 90 90 4a 00 90 6d 00 00 66 33 85 99 78 ca b4 90 7d ff "
+    "ff ff 7f 69 fa 81 fc ac 7f b2 b4 b4 b4 d4 ff 90 ff c0 c0 73 d8 a9 bf b4 ff 90 d8 b2 aa 00 d8 00 "
+    "fb 90 81 9d 37 ac dd bf b9 3f ef d7 de fd fe 73 2f 8d fb ff fe ed 06 f5 ea ed ad 3d fc fa ef fd "
+    "66 8d 7f 7a 5f 79 9b 71 ff ee a8 ff 9f db f5 ff cd f3 e0 fe c8 79 73 1f bf e5 f3 f6 e0 de f0 cc "
+    "4b 64 40 a1 f7 1a e0 67 ff 64 f5 3f 97 ef 14 96 d7 67 b7 ee ba ea 6c bd 26 4e 64 2f bf 9f 7f f3 "
+    "aa ff e6 bf 57 eb 06 fe 4f ed 6a ef 62 b7 dd cf 66 6b b2 7a 5a f7 9c 4c 96 9d 00 00 6e c8 00 64 "
+    "00 00 ff ff 00 00 ff ff 24 89 67 b4 99 6c 80 90 91 ff eb 7c b4 76 6c 94 b4 d8 c8 90 ac 66 d8 73 "
+    "7f b2 d8 eb 00 b4 ac c3 48 00 d8 6c a7 b4 8d 9a 60 7f 90 76 fc ff fc fc ff 90 eb 90 ff ff ca e9 "
+    "d5 af 6c 6c 54 60 ff 66 bc a0 c5 ae cf ff b4 d8 89 70 c0 a5 99 66 c1 ad 7a d6 30 28 6c 48 8f 00 "
+    "99 66 00 3f a3 64 d8 eb 7f b2 6c 90 d8 95 bf 6c cf cf 90 b2 d8 e5 6a d8 dd d8 b4 73 00 00 9d 96 "
+    "fd 65 df 5a 9d ac f3 df f7 6e ff db ff fb fb ab 31 c7 fa af 6a af 03 9d fe ea 0c 9f de a7 f5 7d "
+    "00 c7 ff 67 bf 7f 7f 87 fc ce bf 2f 6f be ba fd f2 5f 2d df c8 7f 5b b5 77 6f 8f db 92 7e f0 5f "
+    "ff 9d 40 ba f7 ec 6d fb 64 64 96 e3 c7 f7 d3 ff af 7f f5 f6 73 f7 b2 5a 5f 88 89 b7 bc fd 7f e9 "
+    "7f 7e 2f fa 7c f7 03 a5 c7 ea fb 8d ff ff 79 5b 00 e7 8d 67 b9 ec 59 f7 00 bd 96 af 00 00 7d 64 "
+    "00 00 00 00 ff ff ff ff 90 99 bd d8 99 b4 ff c0 db de 24 91 6c b2 48 63 fc fc c8 fc eb 00 48 b2 "
+    "01 73 48 ac a0 6c eb e1 90 7f fc d8 e1 d8 f5 46 ff ff 90 75 b4 90 48 90 c0 cf c7 90 ff ff e9 e9 "
+    "00 ed b4 d8 b4 b4 ff ff bc a0 b2 b7 c0 cf fc fc 99 99 cf b4 ff ff ff ff 03 ff 9c 91 d8 b4 a5 8f "
+    "d2 bb 00 24 b9 0c 6c ac 00 73 6c 48 d8 95 bf 6c 90 90 cf b2 b4 e7 69 90 ad fc 6c 73 00 7f 49 00 "
+    "fe fd a5 6f 7f ff 7b be ab 11 67 ff b9 55 9d 7f fb de 7f 7f 7f fb f0 93 fe fb eb bf ef 5d f7 fc "
+    "8a de ff 96 3a bd df bb f8 3d b0 cf 9e fe 5f fd f3 d9 ff 93 c8 bd aa 37 fd 81 7f be ff 7f f0 91 "
+    "4b 4c 40 4b 67 ce ff a9 7d ff 64 d3 6f f7 b4 f7 ad cf fc e9 cd 7f 81 af 64 f7 51 f5 a4 7d df 3f "
+    "cf f7 fd f9 7f df f0 4d 5f fb ff fb 4f df a9 f0 8a 45 ba 96 fc bd 09 b7 00 f2 00 00 00 00 00 64")
+
+
+def _merge_operations(first: Dat_Operation, second: Dat_Operation, quarter_pitch: bool) -> Optional[Dat_Operation]:
+    """
+    :param first: the operation done first
+    :param second: the operation done second, to the right of the first
+    :param quarter_pitch: True if the beds are racked by a quarter pitch so front and back operations can be combined
+    :return: an operation that does the first and then the second operation, None if there is no such operation
+    """
+    if first is _OP_SOFT_MISS:
+        return second
+    elif second is _OP_SOFT_MISS:
+        return first
+    elif not quarter_pitch:
+        return None
+    return _COMBINED_OPERATIONS.get((first, second))
+
+
+class Dat_Pass:
+    """
+    A row of the DAT raster: the operations done in one pass of the carriage and the options set for the pass
+    ...
+
+    Attributes
+    ----------
+    pass_type: str
+        knit-tuck, a-miss, split, or xfer
+    racking: float
+        the racking of the pass
+    stitch: int
+        the stitch table entry used by the pass
+    direction: str
+        - or + for passes that carry yarn, empty for drops and transfers
+    carriers: Tuple[int, ...]
+        the carriers used by the pass
+    slots: Dict[int, Dat_Operation]
+        needle slots to the operation done at the slot
+    hook: Optional[str]
+        the inserting hook operation done with the pass
+    gripper: Optional[str]
+        the gripper operation done with the pass
+    """
+
+    def __init__(self, pass_type: str, racking: float, stitch: int, direction: str, carriers: Tuple[int, ...],
+                 slots: Dict[int, Dat_Operation], hook: Optional[str] = None, gripper: Optional[str] = None):
+        """
+        :param pass_type: knit-tuck, a-miss, split, or xfer
+        :param racking: the racking of the pass
+        :param stitch: the stitch table entry used by the pass
+        :param direction: - or + for passes that carry yarn, empty for drops and transfers
+        :param carriers: the carriers used by the pass
+        :param slots: needle slots to the operation done at the slot
+        :param hook: the inserting hook operation done with the pass
+        :param gripper: the gripper operation done with the pass
+        """
+        self.pass_type: str = pass_type
+        self.racking: float = racking
+        self.stitch: int = stitch
+        self.direction: str = direction
+        self.carriers: Tuple[int, ...] = carriers
+        self.slots: Dict[int, Dat_Operation] = slots
+        self.hook: Optional[str] = hook
+        self.gripper: Optional[str] = gripper
+
+    def append(self, other) -> bool:
+        """
+        Adds the operations of the other pass to this pass if both can be done in one pass of the carriage
+        :param other: the pass done after this pass
+        :return: True if the other pass was added to this pass
+        """
+        if (self.pass_type, self.racking, self.stitch, self.direction, self.carriers) != \
+                (other.pass_type, other.racking, other.stitch, other.direction, other.carriers):
+            return False
+        if not (self.hook is None and other.hook is None) \
+                and not (self.hook in [_HOOK_IN, _HOOK_RELEASE] and other.hook is None) \
+                and not (self.hook is None and other.hook == _HOOK_OUT):
+            return False  # hooks can only start this pass or end the other pass
+        if not (self.gripper is None and other.gripper is None) \
+                and not (self.gripper == _GRIPPER_IN and other.gripper is None) \
+                and not (self.gripper is None and other.gripper == _GRIPPER_OUT):
+            return False
+        quarter_pitch = self.racking != math.floor(self.racking)
+        if self.direction == _RIGHT:  # the new operations must be right of the operations in this pass
+            last_slot = max(self.slots, default=-math.inf)
+            for slot, operation in other.slots.items():
+                if slot < last_slot or \
+                        (slot == last_slot and _merge_operations(self.slots[slot], operation, quarter_pitch) is None):
+                    return False
+        elif self.direction == _LEFT:
+            last_slot = min(self.slots, default=math.inf)
+            for slot, operation in other.slots.items():
+                if slot > last_slot or \
+                        (slot == last_slot and _merge_operations(operation, self.slots[slot], quarter_pitch) is None):
+                    return False
+        else:
+            for slot, operation in other.slots.items():
+                if slot in self.slots and _merge_operations(self.slots[slot], operation, quarter_pitch) is None \
+                        and _merge_operations(operation, self.slots[slot], quarter_pitch) is None:
+                    return False
+        if self.hook is None:
+            self.hook = other.hook
+        if self.gripper is None:
+            self.gripper = other.gripper
+        for slot, operation in other.slots.items():
+            if slot not in self.slots:
+                self.slots[slot] = operation
+            elif self.direction == _LEFT:
+                self.slots[slot] = _merge_operations(operation, self.slots[slot], quarter_pitch)
+            else:
+                merged_operation = _merge_operations(self.slots[slot], operation, quarter_pitch)
+                if merged_operation is None:
+                    merged_operation = _merge_operations(operation, self.slots[slot], quarter_pitch)
+                self.slots[slot] = merged_operation
+        return True
+
+    def carrier_option(self) -> int:
+        """
+        :return: the option line value that names the carriers of the pass
+        """
+        if len(self.carriers) == 0:
+            return 255 if self.pass_type == _KNIT_TUCK else 0  # 255 means that no carriers were meant
+        elif len(self.carriers) == 1:
+            return self.carriers[0]
+        assert len(self.carriers) == 2, f"Cannot name the carrier combination {self.carriers} in a DAT file"
+        leading, following = str(self.carriers[0]), str(self.carriers[1])
+        if leading == "10":
+            return int("1" + following)
+        elif following == "10" and leading != "1":
+            return int(leading + "0")
+        return int(leading + following)
+
+
+class _Carrier_State:
+    """
+    Where a carrier last stitched and where it was last parked
+    ...
+
+    Attributes
+    ----------
+    last: Optional[Tuple[Tuple[bool, int], str]]
+        the needle (on front, needle number) and direction of the last stitch, None if the carrier has not stitched
+    kick: Optional[Tuple[Tuple[bool, int], str]]
+        the needle and direction the carrier was last parked relative to
+    in_operation: Optional[Tuple[str, Tuple[int, ...]]]
+        the instruction and carriers that brought the carrier in, until the carrier first stitches
+    """
+
+    def __init__(self, in_operation: Tuple[str, Tuple[int, ...]]):
+        """
+        :param in_operation: the instruction and carriers that brought the carrier in
+        """
+        self.last: Optional[Tuple[Tuple[bool, int], str]] = None
+        self.kick: Optional[Tuple[Tuple[bool, int], str]] = None
+        self.in_operation: Optional[Tuple[str, Tuple[int, ...]]] = in_operation
+
+
+class Dat_Writer:
+    """
+    Builds the passes of a DAT file from the instructions of executed carriage passes and encodes them as a raster.
+    Instructions are merged into passes and carriers are kicked out of the way of stitches
+     as in knitout-to-dat.js, so the files match those made by translating the knitout.
+    Stitch and speed numbers, sliders, the fabric presser, and pauses are not used by Knitout_Generator
+     and are not supported
+    ...
+
+    Attributes
+    ----------
+    machine_profile: Machine_Profile
+        the machine the DAT file is for
+    position: str
+        where to place the slots on the needle bed; Left, Center, Right, or Keep
+    passes: List[Dat_Pass]
+        the passes built so far
+    racking: float
+        the current racking
+    """
+
+    def __init__(self, machine_profile: Optional[Machine_Profile] = None, position: str = "Center"):
+        """
+        :param machine_profile: the machine the DAT file is for, by default a SWG091N2
+        :param position: where to place the slots on the needle bed; Left, Center, Right, or Keep
+        """
+        if machine_profile is None:
+            machine_profile = Machine_Profile()
+        assert position in ["Left", "Center", "Right", "Keep"], f"Cannot position a DAT file at {position}"
+        self.machine_profile: Machine_Profile = machine_profile
+        self.position: str = position
+        self.passes: List[Dat_Pass] = []
+        self.racking: float = 0.0
+        self._carriers: Dict[int, _Carrier_State] = {}  # the carriers brought in
+        self._hook: Optional[Tuple[str, Tuple[int, ...]]] = None  # the direction and carriers held by the hook
+
+    def in_hook(self, carrier: Yarn_Carrier):
+        """
+        Brings the carriers in with the inserting hook on their first stitch
+        :param carrier: the carriers to bring in
+        """
+        carriers = tuple(carrier)
+        for carrier_id in carriers:
+            assert carrier_id not in self._carriers, f"Cannot bring in carrier {carrier_id}, it is already in"
+            self._carriers[carrier_id] = _Carrier_State(("inhook", carriers))
+
+    def release_hook(self, carrier: Yarn_Carrier):
+        """
+        Releases the carriers from the inserting hook in a pass that does not move the carriage
+        :param carrier: the carriers held by the hook
+        """
+        carriers = tuple(carrier)
+        assert self._hook is not None and self._hook[1] == carriers, f"The hook is not holding carriers {carriers}"
+        hook_direction = self._hook[0]
+        last_stitch = self._carriers[carriers[0]].last
+        assert last_stitch is not None, f"Cannot release carrier {carriers[0]}, it has not stitched"
+        slot = self._slot(last_stitch[0])
+        if self.passes[-1].direction == hook_direction:  # the machine cannot release the hook on a carriage move
+            opposite_direction = _RIGHT if hook_direction == _LEFT else _LEFT
+            self.passes.append(Dat_Pass(_KNIT_TUCK, self.racking, _KNIT_STITCH, opposite_direction, (),
+                                        {slot: _OP_SOFT_MISS}))
+        self.passes.append(Dat_Pass(_KNIT_TUCK, self.racking, _KNIT_STITCH, hook_direction, (),
+                                    {slot: _OP_SOFT_MISS}, hook=_HOOK_RELEASE))
+        self._hook = None
+
+    def out_hook(self, carrier: Yarn_Carrier):
+        """
+        Takes the carriers out with the inserting hook, right of their rightmost stitch
+        :param carrier: the carriers to take out
+        """
+        carriers = tuple(carrier)
+        assert self._hook is None, f"Cannot take out carriers {carriers}, the hook is holding {self._hook[1]}"
+        out_slot = -math.inf
+        for carrier_id in carriers:
+            assert carrier_id in self._carriers, f"Cannot take out carrier {carrier_id}, it is not in"
+            last_stitch = self._carriers[carrier_id].last
+            assert last_stitch is not None, f"Cannot take out carrier {carrier_id}, it has not stitched"
+            out_slot = max(out_slot, self._slot(last_stitch[0]))
+        self._merge(Dat_Pass(_KNIT_TUCK, self.racking, _KNIT_STITCH, _RIGHT, carriers, {out_slot: _OP_SOFT_MISS},
+                             hook=_HOOK_OUT, gripper=_GRIPPER_OUT))
+        for carrier_id in carriers:
+            del self._carriers[carrier_id]
+
+    def rack(self, racking: float):
+        """
+        :param racking: the new racking
+        """
+        assert racking - math.floor(racking) in [0, .25], f"Cannot rack to {racking}, only to whole or quarter pitch"
+        self.racking = racking
+
+    def knit(self, direction: Pass_Direction, needle: Needle, carrier: Optional[Yarn_Carrier]):
+        """
+        :param direction: the direction of the stitch
+        :param needle: the needle to knit on
+        :param carrier: the carriers to knit with, None to drop
+        """
+        self._stitch(_OP_KNIT_FRONT if needle.is_front else _OP_KNIT_BACK, str(direction), needle, carrier)
+
+    def tuck(self, direction: Pass_Direction, needle: Needle, carrier: Optional[Yarn_Carrier]):
+        """
+        :param direction: the direction of the stitch
+        :param needle: the needle to tuck on
+        :param carrier: the carriers to tuck with, None for an a-miss
+        """
+        self._stitch(_OP_TUCK_FRONT if needle.is_front else _OP_TUCK_BACK, str(direction), needle, carrier)
+
+    def miss(self, direction: Pass_Direction, needle: Needle, carrier: Yarn_Carrier):
+        """
+        :param direction: the direction to move the carriers
+        :param needle: the needle to move the carriers past
+        :param carrier: the carriers to move
+        """
+        assert carrier is not None, f"Cannot miss {needle} without carriers"
+        self._stitch(_OP_MISS_FRONT if needle.is_front else _OP_MISS_BACK, str(direction), needle, carrier)
+
+    def drop(self, needle: Needle):
+        """
+        :param needle: the needle to drop the loops from
+        """
+        self.knit(Pass_Direction.Left_to_Right, needle, None)
+
+    def xfer(self, needle_1: Needle, needle_2: Needle):
+        """
+        :param needle_1: the needle to transfer loops from
+        :param needle_2: the needle on the opposite bed to transfer the loops to
+        """
+        self.split(Pass_Direction.Left_to_Right, needle_1, needle_2, None)
+
+    def split(self, direction: Pass_Direction, needle_1: Needle, needle_2: Needle, carrier: Optional[Yarn_Carrier]):
+        """
+        :param direction: the direction of the stitch
+        :param needle_1: the needle to make the new loop on
+        :param needle_2: the needle on the opposite bed to transfer the loops to
+        :param carrier: the carriers to split with, None to transfer
+        """
+        assert needle_1.is_front != needle_2.is_front, f"Cannot split between {needle_1} and {needle_2} on one bed"
+        carriers = () if carrier is None else tuple(carrier)
+        from_needle, to_needle = self._slot_needle(needle_1), self._slot_needle(needle_2)
+        front_number, back_number = (from_needle[1], to_needle[1]) if needle_1.is_front else (to_needle[1],
+                                                                                              from_needle[1])
+        assert front_number == back_number + self.racking, \
+            f"{needle_1} and {needle_2} are not aligned at racking {self.racking}"
+        if len(carriers) == 0:
+            pass_type, stitch, pass_direction = _XFER, _XFER_STITCH, _NO_DIRECTION
+            operation = _OP_XFER_TO_BACK if needle_1.is_front else _OP_XFER_TO_FRONT
+        else:
+            pass_type, stitch, pass_direction = _SPLIT, _KNIT_STITCH, str(direction)
+            operation = _OP_SPLIT_TO_BACK if needle_1.is_front else _OP_SPLIT_TO_FRONT
+        self._kick_others(from_needle, carriers)
+        dat_pass = Dat_Pass(pass_type, self.racking, stitch, pass_direction, carriers,
+                            {self._slot(from_needle): operation})
+        self._bring_in(dat_pass)
+        self._merge(dat_pass)
+        for carrier_state in self._carriers.values():  # the loops the carriers last made have moved
+            if carrier_state.last is not None and carrier_state.last[0] == from_needle:
+                carrier_state.last = (to_needle, carrier_state.last[1])
+        self._set_last(carriers, pass_direction, from_needle)
+
+    def add_instructions(self, instructions: Instruction_Buffer, start: int = 0):
+        """
+        Adds executed instructions to the passes
+        :param instructions: the executed instructions
+        :param start: the index of the first instruction to add
+        """
+        for index in range(start, len(instructions)):
+            opcode = instructions.opcodes[index]
+            if opcode == Opcode.Rack:
+                self.rack(instructions.rackings[index])
+            elif opcode == Opcode.In_Hook:
+                self.in_hook(instructions.carrier(index))
+            elif opcode == Opcode.Release_Hook:
+                self.release_hook(instructions.carrier(index))
+            elif opcode == Opcode.Out_Hook:
+                self.out_hook(instructions.carrier(index))
+            elif opcode == Opcode.Knit:
+                self.knit(instructions.direction(index), instructions.needle_1(index), instructions.carrier(index))
+            elif opcode == Opcode.Tuck:
+                self.tuck(instructions.direction(index), instructions.needle_1(index), instructions.carrier(index))
+            elif opcode == Opcode.Miss:
+                self.miss(instructions.direction(index), instructions.needle_1(index), instructions.carrier(index))
+            elif opcode == Opcode.Drop:
+                self.drop(instructions.needle_1(index))
+            elif opcode == Opcode.Xfer:
+                self.xfer(instructions.needle_1(index), instructions.needle_2(index))
+            elif opcode == Opcode.Split:
+                self.split(instructions.direction(index), instructions.needle_1(index), instructions.needle_2(index),
+                           instructions.carrier(index))
+
+    def to_bytes(self) -> bytes:
+        """
+        :return: the DAT file: a header, the palette, and the run length encoded raster
+        """
+        assert len(self._carriers) == 0, f"Carriers {sorted(self._carriers)} need to be taken out"
+        width, height, raster = self._raster()
+        runs = bytearray()
+        for y in range(0, height):  # run length encode each row as color, length pairs
+            row = raster[y * width: (y + 1) * width]
+            color = row[0]
+            length = 0
+            for x, next_color in enumerate(row):
+                if color == next_color:
+                    length += 1
+                if next_color != color or length == 0xff or x + 1 == width:
+                    runs.append(color)
+                    runs.append(length)
+                    color = next_color
+                    length = 0 if length == 0xff else 1
+        header = bytearray(0x200)
+        struct.pack_into("<HHHH", header, 0, 0, 0, width - 1, height - 1)
+        struct.pack_into("<H", header, 8, 1000)
+        struct.pack_into("<H", header, 16, 1000)
+        return bytes(header) + _PALETTE.ljust(0x400, b"\x00") + bytes(runs)  # the raster starts at 0x600
+
+    def write(self, filename: str):
+        """
+        :param filename: the name of the DAT file to write
+        """
+        with open(filename, "wb") as file:
+            file.write(self.to_bytes())
+
+    def _slot_needle(self, needle: Needle) -> Tuple[bool, int]:
+        """
+        :param needle: a needle
+        :return: True if the needle is on the front bed, and its knitout needle number
+        """
+        return needle.is_front, needle.position + 1
+
+    def _slot(self, slot_needle: Tuple[bool, int]) -> int:
+        """
+        :param slot_needle: True if the needle is on the front bed, and its knitout needle number
+        :return: the raster column of the needle at the current racking
+        """
+        is_front, number = slot_needle
+        if is_front:
+            return number
+        return number + math.floor(self.racking)
+
+    def _stitch(self, operation: Dat_Operation, direction: str, needle: Needle, carrier: Optional[Yarn_Carrier]):
+        """
+        Adds a knit, tuck, miss, drop, or a-miss
+        :param operation: the operation at the needle
+        :param direction: the direction of the stitch
+        :param needle: the needle of the stitch
+        :param carrier: the carriers of the stitch, None for drops and a-misses
+        """
+        carriers = () if carrier is None else tuple(carrier)
+        if len(carriers) == 0:
+            direction = _NO_DIRECTION
+        slot_needle = self._slot_needle(needle)
+        if operation is not _OP_MISS_FRONT and operation is not _OP_MISS_BACK:
+            self._kick_others(slot_needle, carriers)
+        pass_type = _A_MISS if len(carriers) == 0 and operation in [_OP_TUCK_FRONT, _OP_TUCK_BACK] else _KNIT_TUCK
+        dat_pass = Dat_Pass(pass_type, self.racking, _KNIT_STITCH, direction, carriers,
+                            {self._slot(slot_needle): operation})
+        self._bring_in(dat_pass)
+        self._merge(dat_pass)
+        self._set_last(carriers, direction, slot_needle)
+
+    def _bring_in(self, dat_pass: Dat_Pass):
+        """
+        Sets the gripper and hook of the first pass that uses carriers that were just brought in
+        :param dat_pass: a pass with a single operation
+        """
+        in_operation = None
+        for carrier_id in dat_pass.carriers:
+            assert carrier_id in self._carriers, f"Carrier {carrier_id} is used before it is brought in"
+            if self._carriers[carrier_id].in_operation is not None:
+                in_operation = self._carriers[carrier_id].in_operation
+                self._carriers[carrier_id].in_operation = None
+        if in_operation is None:
+            return
+        operation, carriers = in_operation
+        assert carriers == dat_pass.carriers, f"Carriers {dat_pass.carriers} were not brought in together"
+        dat_pass.gripper = _GRIPPER_IN
+        if operation == "inhook":
+            assert self._hook is None, f"Cannot bring in {carriers} with the hook, it is holding {self._hook[1]}"
+            dat_pass.hook = _HOOK_IN
+            self._hook = (dat_pass.direction, carriers)
+
+    def _set_last(self, carriers: Tuple[int, ...], direction: str, slot_needle: Tuple[bool, int]):
+        """
+        :param carriers: the carriers that stitched
+        :param direction: the direction of the stitch
+        :param slot_needle: the needle of the stitch
+        """
+        for carrier_id in carriers:
+            self._carriers[carrier_id].last = (slot_needle, direction)
+            self._carriers[carrier_id].kick = (slot_needle, direction)
+
+    def _kick_others(self, slot_needle: Tuple[bool, int], carriers: Tuple[int, ...]):
+        """
+        Parks the carriers that are not used by a stitch so that they are clear of its needle
+        :param slot_needle: the needle of the stitch
+        :param carriers: the carriers used by the stitch
+        """
+        needle_slot = self._slot(slot_needle)
+        for carrier_id in sorted(self._carriers):
+            carrier_state = self._carriers[carrier_id]
+            if carrier_id in carriers or carrier_state.last is None:
+                continue
+            last_needle, last_direction = carrier_state.last
+            last_slot = self._slot(last_needle)
+            last_side = last_slot - .1 if last_direction == _LEFT else last_slot + .1
+            kick_needle, kick_direction = carrier_state.kick
+            kick_slot = self._slot(kick_needle)
+            if last_side < needle_slot:
+                if kick_direction == _LEFT and kick_slot <= needle_slot:
+                    continue  # already parked left of the needle
+                direction = _LEFT
+            else:
+                if kick_direction == _RIGHT and kick_slot >= needle_slot:
+                    continue
+                direction = _RIGHT
+            self._merge(Dat_Pass(_KNIT_TUCK, self.racking, _KNIT_STITCH, direction, (carrier_id,),
+                                 {last_slot: _OP_SOFT_MISS}))
+            carrier_state.kick = ((True, last_slot), direction)
+
+    def _merge(self, dat_pass: Dat_Pass):
+        """
+        Adds a pass with one operation to the last pass if possible, otherwise starts a new pass.
+        A new pass first kicks its carriers to the side of its operation that the pass starts from
+        :param dat_pass: the pass to add
+        """
+        if len(self.passes) > 0 and self.passes[-1].append(dat_pass):
+            return
+        pass_slot = next(iter(dat_pass.slots))
+        kicks: Dict[int, List[int]] = {}  # slots to the carriers to kick past them
+        for carrier_id in dat_pass.carriers:
+            carrier_state = self._carriers[carrier_id]
+            if carrier_state.last is None:  # carriers being brought in are not kicked
+                continue
+            kick_needle, kick_direction = carrier_state.kick
+            kick_slot = self._slot(kick_needle)
+            if kick_direction == _LEFT:
+                if dat_pass.direction == _LEFT:
+                    kicks.setdefault(kick_slot, []).append(carrier_id)
+                elif kick_slot > pass_slot:
+                    kicks.setdefault(pass_slot, []).append(carrier_id)
+            else:
+                if dat_pass.direction == _RIGHT:
+                    kicks.setdefault(kick_slot, []).append(carrier_id)
+                elif kick_slot < pass_slot:
+                    kicks.setdefault(pass_slot, []).append(carrier_id)
+        if len(kicks) == 0:
+            self.passes.append(dat_pass)
+            return
+        assert dat_pass.direction in [_LEFT, _RIGHT], "Only passes with a direction carry yarn"
+        kick_direction = _RIGHT if dat_pass.direction == _LEFT else _LEFT
+        for slot in sorted(kicks):
+            self._merge(Dat_Pass(_KNIT_TUCK, self.racking, _KNIT_STITCH, kick_direction, tuple(kicks[slot]),
+                                 {slot: _OP_SOFT_MISS}))
+            for carrier_id in kicks[slot]:
+                self._carriers[carrier_id].kick = ((True, slot), kick_direction)
+        self._merge(dat_pass)
+
+    def _raster(self) -> Tuple[int, int, bytearray]:
+        """
+        Draws the passes between the fixed starting and ending courses, with the option lines of each pass to its sides
+        :return: the width, height, and palette indices (bottom row first) of the raster
+        """
+        assert len(self.passes) > 0, "Cannot write a DAT file without passes"
+        min_slot = min(slot for dat_pass in self.passes for slot in dat_pass.slots)
+        max_slot = max(slot for dat_pass in self.passes for slot in dat_pass.slots)
+        slot_count = max_slot - min_slot + 1
+        width = _LEFT_SPACE + slot_count + _RIGHT_SPACE
+        height = _TOP_SPACE + len(self.passes) + _BOTTOM_SPACE + 6  # 6 courses of fixed data
+        raster = bytearray(width * height)
+
+        y = height - _TOP_SPACE + 1
+        needle_count = self.machine_profile.needle_count
+        assert slot_count <= needle_count, f"Slots {min_slot} to {max_slot} do not fit on {needle_count} needles"
+        if self.position == "Center":
+            position = math.floor((needle_count - slot_count) / 2 + .5)
+        elif self.position == "Keep":
+            assert 0 < min_slot and max_slot <= needle_count, \
+                f"Cannot keep slots {min_slot} to {max_slot} on needles 1 to {needle_count}"
+            position = min_slot
+        elif self.position == "Right":
+            position = 0  # the machine sets the right edge
+        else:
+            position = 1
+        raster[y * width + _LEFT_SPACE - 7] = position % 100
+        raster[(y + 1) * width + _LEFT_SPACE - 7] = position // 100
+        for slot in range(min_slot - 5, max_slot + 6):  # the pattern width line
+            raster[y * width + slot - min_slot + _LEFT_SPACE] = 1
+
+        def write_options(row: int, direction: str, options: Dict[str, int]):
+            left_base = row * width + _LEFT_SPACE - 5
+            for option in range(20, 0, -1):
+                raster[left_base - 2 * option + 1] = option
+                if f"L{option}" in options:
+                    raster[left_base - 2 * option] = options[f"L{option}"]
+            right_base = row * width + _LEFT_SPACE + slot_count + 4
+            for option in range(1, 21):
+                raster[right_base + 2 * option - 1] = option
+                if f"R{option}" in options:
+                    raster[right_base + 2 * option] = options[f"R{option}"]
+            direction_mark = 7 if direction == _LEFT else 6 if direction == _RIGHT else 1
+            raster[left_base - 1] = raster[right_base + 1] = direction_mark
+
+        def write_full_course(row: int, color: int, direction: str, options: Dict[str, int]):
+            base = row * width + _LEFT_SPACE
+            raster[base: base + slot_count] = bytes([color]) * slot_count
+            raster[base - 1] = raster[base + slot_count] = 13  # stopping marks
+            write_options(row, direction, options)
+
+        y = _BOTTOM_SPACE
+        write_full_course(y, 216, _RIGHT, {"R3": 255, "R9": 1, "L4": 10})
+        write_full_course(y + 1, 51, _LEFT, {"R3": 255, "R9": 1, "L4": 10})
+        write_full_course(y + 2, 52, _RIGHT, {"R3": 255, "R9": 1, "L4": 10})
+        y += 3
+        carriage = _RIGHT  # the side of the bed the carriage is on
+        for dat_pass in self.passes:
+            base = y * width + _LEFT_SPACE
+            for slot, operation in dat_pass.slots.items():
+                raster[base + slot - min_slot] = operation.color
+            raster[base + min(dat_pass.slots) - min_slot - 1] = 13
+            raster[base + max(dat_pass.slots) - min_slot + 1] = 13
+            options = {"R9": 1, "R3": dat_pass.carrier_option()}  # R9: ignore the links process
+            if dat_pass.pass_type == _SPLIT:
+                options["L12"] = 10
+            if dat_pass.gripper == _GRIPPER_IN:
+                options["R10"] = dat_pass.carrier_option()
+            elif dat_pass.gripper == _GRIPPER_OUT:
+                options["R10"] = 100 + dat_pass.carrier_option()
+            if dat_pass.hook == _HOOK_IN:
+                options["R15"] = 10
+            elif dat_pass.hook == _HOOK_OUT:
+                options["R15"] = 20
+            elif dat_pass.hook == _HOOK_RELEASE:
+                options["R15"] = 90
+            options["R6"] = dat_pass.stitch
+            options["L5"] = options["L6"] = 0  # knit and transfer speeds
+            if dat_pass.pass_type == _XFER:
+                options["R5"] = 1  # knit cancel
+                if dat_pass.stitch != 0:
+                    options["R13"] = 100
+            if dat_pass.pass_type == _A_MISS:
+                options["L12"] = 20
+            assert abs(dat_pass.racking) <= _MAX_RACKING, f"Cannot rack to {dat_pass.racking} in a DAT file"
+            if dat_pass.racking >= 1:
+                options["L4"] = 11  # racked right
+                options["L2"] = math.floor(dat_pass.racking - 1)
+            else:
+                options["L4"] = 10
+                options["L2"] = -math.floor(dat_pass.racking)
+            options["L3"] = 0 if dat_pass.racking == math.floor(dat_pass.racking) else 1  # quarter pitch
+            direction = dat_pass.direction
+            if direction == _NO_DIRECTION and dat_pass.pass_type in [_KNIT_TUCK, _A_MISS]:
+                direction = _RIGHT if carriage == _LEFT else _LEFT  # drops and a-misses still move the carriage
+            if direction != _NO_DIRECTION and direction == carriage:  # move the carriage to the side the pass starts
+                assert "R5" not in options and dat_pass.hook != _HOOK_RELEASE, "Cannot move the carriage in this pass"
+                options["R5"] = 2
+            write_options(y, direction, options)
+            if direction != _NO_DIRECTION:
+                carriage = direction
+            y += 1
+        write_full_course(y, 51, _LEFT, {"R3": 255, "R5": 2 if carriage == _LEFT else 0, "R9": 1, "L4": 10})
+        write_full_course(y + 1, 52, _RIGHT, {"R3": 255, "R9": 1, "L4": 10})
+        write_full_course(y + 2, 3, _LEFT, {"L4": 10, "L3": 1, "R3": 255, "R7": 11, "R9": 1})  # R7: drop detection
+        return width, height, raster
@@ -0,0 +1,273 @@
+"""A compact record of executed knitout instructions that is only rendered as knitout text when it is needed"""
+import math
+from array import array
+from enum import IntEnum
+from typing import Dict, List, Optional, TextIO, Tuple
+
+from knitting_machine.Machine_Profile import Machine_Profile
+from knitting_machine.Machine_State import Needle, Needle_Table, Pass_Direction, Yarn_Carrier, needle_table
+
+NO_NEEDLE = -1  # the needle id of instructions without a needle
+NO_LOOP = -(2 ** 63)  # the loop id of instructions that do not make a loop
+_DIRECTION_CODES = {None: 0, Pass_Direction.Left_to_Right: 1, Pass_Direction.Right_to_Left: -1}
+_DIRECTIONS = {0: None, 1: Pass_Direction.Left_to_Right, -1: Pass_Direction.Right_to_Left}
+
+
+class Opcode(IntEnum):
+    """The knitout operations recorded in an Instruction_Buffer"""
+    Knit = 0
+    Tuck = 1
+    Split = 2
+    Miss = 3
+    Drop = 4
+    Xfer = 5
+    Rack = 6
+    In_Hook = 7
+    Release_Hook = 8
+    Out_Hook = 9
+
+
+def needle_id(needle: Needle) -> int:
+    """
+    :param needle: a needle
+    :return: twice the needle's position, plus one for back needles
+    """
+    return needle.index
+
+
+def carrier_mask(carrier: Optional[Yarn_Carrier]) -> int:
+    """
+    :param carrier: the carriers of an instruction, None for no carriers
+    :return: the carriers as a bit mask, bit 0 is carrier 1
+    """
+    if carrier is None:
+        return 0
+    mask = 0
+    for carrier_id in carrier:
+        mask |= 1 << (carrier_id - 1)
+    return mask
+
+
+def carrier_ids(mask: int) -> Tuple[int, ...]:
+    """
+    :param mask: carriers as a bit mask
+    :return: the ids of the carriers, in increasing order
+    """
+    return tuple(bit + 1 for bit in range(0, mask.bit_length()) if mask & (1 << bit))
+
+
+class Instruction_Buffer:
+    """
+    Executed instructions stored as parallel typed arrays, one entry per instruction.
+    Analyses, optimizers, and backends such as Dat_Writer read the arrays directly;
+     knitout text is only made by render and write_knitout.
+    Needles are stored as ids (see needle_id) and carriers as bit masks (see carrier_mask).
+    The few carrier sets that are not in increasing order keep their order for rendering
+    ...
+
+    Attributes
+    ----------
+    opcodes: array
+        the Opcode of each instruction
+    directions: array
+        1 for left to right instructions, -1 for right to left, 0 for instructions without a direction
+    needles_1: array
+        the id of the first (or only) needle of each instruction, NO_NEEDLE if it has no needle
+    needles_2: array
+        the id of the needle that loops are moved to by splits and transfers, otherwise NO_NEEDLE
+    carriers: array
+        the carriers of each instruction as a bit mask, 0 if it uses no carriers
+    rackings: array
+        the racking of the machine when each instruction is done, for racks the new racking
+    loop_ids: array
+        the loop made by each knit, tuck, or split, otherwise NO_LOOP
+    needles: Needle_Table
+        the interned needles that needle ids are read as
+    """
+
+    def __init__(self, needles: Optional[Needle_Table] = None):
+        """
+        :param needles: the interned needles of the machine, by default those of a SWG091N2
+        """
+        if needles is None:
+            needles = needle_table(Machine_Profile().needle_count)
+        self.needles: Needle_Table = needles
+        self.opcodes: array = array("b")
+        self.directions: array = array("b")
+        self.needles_1: array = array("i")
+        self.needles_2: array = array("i")
+        self.carriers: array = array("H")
+        self.rackings: array = array("d")
+        self.loop_ids: array = array("q")
+        self._comments: Dict[int, str] = {}  # the indices of instructions with comments to their comment
+        self._carrier_orders: Dict[int, Tuple[int, ...]] = {}  # indices to carrier sets not in increasing order
+        self._needle_names: Dict[int, str] = {}  # needle ids to their knitout names
+        self._racking: float = 0.0  # the racking set by the last rack instruction
+
+    def append(self, opcode: Opcode, racking: Optional[float] = None, direction: Optional[Pass_Direction] = None,
+               needle_1: Optional[Needle] = None, needle_2: Optional[Needle] = None,
+               carrier: Optional[Yarn_Carrier] = None, loop_id: Optional[int] = None, comment: str = ""):
+        """
+        Records an executed instruction
+        :param opcode: the operation
+        :param racking: the racking of the machine when the instruction is done, for racks the new racking.
+         None for the racking of the last rack instruction
+        :param direction: the direction of the instruction, None if it has no direction
+        :param needle_1: the first (or only) needle of the instruction
+        :param needle_2: the needle that loops are moved to by a split or transfer
+        :param carrier: the carriers used by the instruction
+        :param loop_id: the loop made by the instruction
+        :param comment: the comment written after the instruction
+        """
+        index = len(self.opcodes)
+        if comment != "":
+            self._comments[index] = comment
+        if racking is None:
+            racking = self._racking
+        elif opcode == Opcode.Rack:
+            self._racking = racking
+        mask = carrier_mask(carrier)
+        if carrier is not None and carrier.many_yarns and tuple(carrier) != carrier_ids(mask):
+            self._carrier_orders[index] = tuple(carrier)
+        self.opcodes.append(opcode)
+        self.directions.append(_DIRECTION_CODES[direction])
+        self.needles_1.append(NO_NEEDLE if needle_1 is None else needle_id(needle_1))
+        self.needles_2.append(NO_NEEDLE if needle_2 is None else needle_id(needle_2))
+        self.carriers.append(mask)
+        self.rackings.append(racking)
+        self.loop_ids.append(NO_LOOP if loop_id is None else loop_id)
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def opcode(self, index: int) -> Opcode:
+        """
+        :param index: the index of an instruction
+        :return: the operation of the instruction
+        """
+        return Opcode(self.opcodes[index])
+
+    def direction(self, index: int) -> Optional[Pass_Direction]:
+        """
+        :param index: the index of an instruction
+        :return: the direction of the instruction, None if it has no direction
+        """
+        return _DIRECTIONS[self.directions[index]]
+
+    def needle_1(self, index: int) -> Optional[Needle]:
+        """
+        :param index: the index of an instruction
+        :return: the first (or only) needle of the instruction, None if it has no needle
+        """
+        return self._needle(self.needles_1[index])
+
+    def needle_2(self, index: int) -> Optional[Needle]:
+        """
+        :param index: the index of an instruction
+        :return: the needle that loops are moved to, None if the instruction is not a split or transfer
+        """
+        return self._needle(self.needles_2[index])
+
+    def carrier(self, index: int) -> Optional[Yarn_Carrier]:
+        """
+        :param index: the index of an instruction
+        :return: the carriers used by the instruction, None if it uses no carriers
+        """
+        ids = self._carrier_ids(index)
+        if len(ids) == 0:
+            return None
+        elif len(ids) == 1:
+            return Yarn_Carrier(ids[0])
+        return Yarn_Carrier([*ids])
+
+    def comment(self, index: int) -> str:
+        """
+        :param index: the index of an instruction
+        :return: the comment of the instruction
+        """
+        return self._comments.get(index, "")
+
+    def clear(self):
+        """
+        Removes all instructions, e.g., once they have been streamed to a file. The last racking is kept
+        """
+        racking = self._racking
+        self.__init__(self.needles)
+        self._racking = racking
+
+    def render(self, index: int) -> str:
+        """
+        :param index: the index of an instruction
+        :return: the knitout line of the instruction
+        """
+        opcode = self.opcodes[index]
+        comment = self._comments.get(index, "")
+        if opcode == Opcode.Rack:
+            racking = self.rackings[index]
+            if racking != .25 and racking != -.75:  # racking for all needle knitting
+                racking = math.floor(racking)
+            return f"rack {racking} ;{comment}\n"
+        carriers = "".join(f" {carrier_id}" for carrier_id in self._carrier_ids(index))
+        if opcode >= Opcode.In_Hook:
+            return f"{_HOOK_OPERATIONS[opcode]} {carriers} ;{comment}\n"
+        needle = self._needle_name(self.needles_1[index])
+        if opcode == Opcode.Drop:
+            return f"drop {needle} ;{comment}\n"
+        elif opcode == Opcode.Xfer:
+            return f"xfer {needle} {self._needle_name(self.needles_2[index])} ;{comment}\n"
+        direction = "+" if self.directions[index] == 1 else "-"
+        if opcode == Opcode.Miss:
+            return f"miss {direction} {needle}{carriers} ;{comment}\n"
+        loop_id = self.loop_ids[index]
+        if opcode == Opcode.Split:
+            needle_2 = self._needle_name(self.needles_2[index])
+            return f"split {direction} {needle} {needle_2}{carriers} ; split loop {loop_id}, {comment}\n"
+        operation = "knit" if opcode == Opcode.Knit else "tuck"
+        return f"{operation} {direction} {needle}{carriers} ; {operation} loop {loop_id}, {comment}\n"
+
+    def render_all(self, start: int = 0) -> List[str]:
+        """
+        :param start: the index of the first instruction to render
+        :return: the knitout lines of the instructions from start
+        """
+        return [self.render(index) for index in range(start, len(self.opcodes))]
+
+    def write_knitout(self, sink: TextIO, start: int = 0):
+        """
+        :param sink: a writable text file
+        :param start: the index of the first instruction to write
+        """
+        sink.writelines(self.render(index) for index in range(start, len(self.opcodes)))
+
+    def _carrier_ids(self, index: int) -> Tuple[int, ...]:
+        """
+        :param index: the index of an instruction
+        :return: the ids of the carriers used by the instruction, in the order they were given
+        """
+        carrier_order = self._carrier_orders.get(index)
+        if carrier_order is not None:
+            return carrier_order
+        return carrier_ids(self.carriers[index])
+
+    def _needle(self, needle_id: int) -> Optional[Needle]:
+        """
+        :param needle_id: the id of a needle
+        :return: the needle, None for NO_NEEDLE
+        """
+        if needle_id == NO_NEEDLE:
+            return None
+        return self.needles[needle_id]
+
+    def _needle_name(self, needle_id: int) -> str:
+        """
+        :param needle_id: the id of a needle
+        :return: the knitout name of the needle
+        """
+        name = self._needle_names.get(needle_id)
+        if name is None:
+            name = f"{'f' if needle_id % 2 == 0 else 'b'}{needle_id // 2 + 1}"
+            self._needle_names[needle_id] = name
+        return name
+
+
+_HOOK_OPERATIONS = {Opcode.In_Hook: "inhook", Opcode.Release_Hook: "releasehook", Opcode.Out_Hook: "outhook"}
@@ -1,31 +1,98 @@
 """Script used to create knitout instructions from a knitgraph"""
-from typing import Dict, List, Tuple
+import gzip
+import os
+from typing import Dict, List, Tuple, Optional, TextIO, Type
 
 from knit_graphs.Knit_Graph import Knit_Graph, Pull_Direction
-from knitting_machine.Machine_State import Machine_State, Needle, Pass_Direction
+from knitting_machine.Machine_Profile import Machine_Profile
+from knitting_machine.Machine_State import Machine_State, Needle, Pass_Direction, Yarn_Carrier
+from knitting_machine.dat_writer import Dat_Writer
+from knitting_machine.instruction_buffer import Instruction_Buffer
+from knitting_machine.lace_transfer_planner import plan_decrease_transfers
 from knitting_machine.machine_operations import outhook
-from knitting_machine.operation_sets import Carriage_Pass, Instruction_Type, Instruction_Parameters
+from knitting_machine.operation_sets import Carriage_Pass, Instruction_Type
+from knitting_machine.xfer_pass_optimizer import Xfer_Pass_Optimizer
 
 
 class Knitout_Generator:
     """
-    A class that is used to generate a single yarn knit-graph
+    A class that is used to generate knitout for a knit-graph made with one or more yarns.
+    Each yarn is knit by its own carrier in the order of its loops, kicking the carrier if it stopped at the wrong end.
+    In each course the carrier used last knits first, then the carrier that continues the carriage direction.
+    A yarn is brought in by the first pass that uses it and taken out after the last course it knits.
+    Instructions are either kept in memory (generate_instructions)
+    or streamed to a file as each carriage pass is executed (stream_instructions, write_instructions).
+    Executed instructions are recorded in an Instruction_Buffer and only rendered as knitout when it is written
+    or the instructions are read, so DAT files are written without making any knitout.
+    When transfers are optimized, passes are planned on one machine state and written on a second (output) state
+    so that runs of transfer passes can be reordered before they are written
     """
 
-    def __init__(self, knit_graph: Knit_Graph):
+    def __init__(self, knit_graph: Knit_Graph, machine_state_type: Type[Machine_State] = Machine_State,
+                 machine_profile: Optional[Machine_Profile] = None, optimize_transfers: bool = False):
         """
         :param knit_graph: the knitgraph to generate instructions for
+        :param machine_state_type: the Machine_State class used to model the machine (e.g., Compact_Machine_State)
+        :param machine_profile: the machine to generate instructions for, by default a SWG091N2
+        :param optimize_transfers: True to merge and reorder each run of transfer passes before writing it
         """
         self._knit_graph = knit_graph
-        assert len(self._knit_graph.yarns) == 1, "This only supports single color graphs"
-        self._carrier = [*self._knit_graph.yarns.values()][0].carrier
         loop_id_to_course, courses_to_loop_ids = self._knit_graph.get_courses()
         self._loop_id_to_courses: Dict[int, float] = loop_id_to_course
         self._courses_to_loop_ids: Dict[float, List[int]] = courses_to_loop_ids
         self._sorted_courses = sorted([*self._courses_to_loop_ids.keys()])
-        self._machine_state: Machine_State = Machine_State()
+        first_course_yarns = {self._knit_graph.loops[loop_id].yarn_id
+                              for loop_id in self._courses_to_loop_ids[self._sorted_courses[0]]}
+        assert len(first_course_yarns) == 1, f"Cannot cast on with yarns {first_course_yarns}"
+        self._carrier = self._knit_graph.yarns[first_course_yarns.pop()].carrier  # the carrier that casts on
+        self._yarn_directions: Dict[str, Pass_Direction] = {}  # yarn ids to the direction of their last knit pass
+        self._last_yarn_id: Optional[str] = None  # the yarn knit in the last knitting pass
+        self._yarns_by_last_course: Dict[float, List[str]] = {}  # courses to the yarns that finish in that course
+        last_courses: Dict[str, float] = {}
+        for course in self._sorted_courses:
+            for loop_id in self._courses_to_loop_ids[course]:
+                last_courses[self._knit_graph.loops[loop_id].yarn_id] = course
+        for yarn_id, course in last_courses.items():
+            if course not in self._yarns_by_last_course:
+                self._yarns_by_last_course[course] = []
+            self._yarns_by_last_course[course].append(yarn_id)
+        if machine_profile is None:
+            machine_profile = Machine_Profile()
+        self._machine_profile: Machine_Profile = machine_profile
+        self._machine_state: Machine_State = machine_state_type(machine_profile=machine_profile)
         self._carriage_passes: List[Carriage_Pass] = []
-        self._instructions: List[str] = []
+        self._header: List[str] = []
+        self._instructions: Instruction_Buffer = Instruction_Buffer(self._machine_state.needles)
+        self._keep_instructions: bool = True  # False while streaming, when passes are discarded once written
+        self._sink: Optional[TextIO] = None  # while streaming, the file that instructions are written to
+        self._transfer_optimizer: Optional[Xfer_Pass_Optimizer] = None
+        self._output_state: Machine_State = self._machine_state  # the machine state that written passes update
+        self._pending_xfer_passes: List[Tuple[Carriage_Pass, str]] = []  # planned transfers not yet written
+        self._dat_writer: Optional[Dat_Writer] = None  # while writing a DAT file, the writer of its passes
+        if optimize_transfers:
+            self._transfer_optimizer = Xfer_Pass_Optimizer()
+            self._output_state = machine_state_type(machine_profile=machine_profile)
+
+    @property
+    def instructions(self) -> List[str]:
+        """
+        :return: the knitout for the header and the instructions generated by generate_instructions
+        """
+        return [*self._header, *self._instructions.render_all()]
+
+    @property
+    def instruction_buffer(self) -> Instruction_Buffer:
+        """
+        :return: the instructions generated by generate_instructions, without rendering them as knitout
+        """
+        return self._instructions
+
+    @property
+    def transfer_optimizer(self) -> Optional[Xfer_Pass_Optimizer]:
+        """
+        :return: the optimizer that has counted the transfer passes and racks saved, None if transfers are not optimized
+        """
+        return self._transfer_optimizer
 
     def generate_instructions(self):
         """
@@ -40,31 +107,42 @@ class Knitout_Generator:
                 course_loops = self._courses_to_loop_ids[course]
                 self._knit_row(course_loops, pass_direction, course)
                 pass_direction = pass_direction.opposite()
-        self._instructions.append(outhook(self._machine_state, self._carrier))
+            for yarn_id in self._yarns_by_last_course.get(course, []):
+                self._outhook(self._knit_graph.yarns[yarn_id].carrier)
         self._drop_loops()
 
+    def _outhook(self, carrier: Yarn_Carrier):
+        """
+        Takes the carrier out of operation after writing any transfers waiting to be written
+        :param carrier: the carrier to take out
+        """
+        self._write_pending_transfers()
+        if self._output_state is not self._machine_state:
+            outhook(self._machine_state, carrier)
+        start = len(self._instructions)
+        outhook(self._output_state, carrier, instructions=self._instructions)
+        self._emit(start)
+
     def _drop_loops(self):
         """
         Drops all loops off the machine
         """
-        drops: Dict[Needle, Instruction_Parameters] = {}
-        second_drops: Dict[Needle, Instruction_Parameters] = {}
-        for needle_pos in range(0, self._machine_state.needle_count):
-            front_needle = Needle(is_front=True, position=needle_pos)
-            back_needle = Needle(is_front=False, position=needle_pos)
-            dropped_front = False
-            if len(self._machine_state[front_needle]) > 0:  # drop on loops on front
-                drops[front_needle] = Instruction_Parameters(front_needle)
-                dropped_front = True
-            if len(self._machine_state[back_needle]) > 0:
-                if dropped_front:
-                    second_drops[back_needle] = Instruction_Parameters(back_needle)
-                else:
-                    drops[back_needle] = Instruction_Parameters(front_needle)
-        carriage_pass = Carriage_Pass(Instruction_Type.Drop, None, drops, self._machine_state)
-        self._add_carriage_pass(carriage_pass, "Drop KnitGraph")
-        carriage_pass = Carriage_Pass(Instruction_Type.Drop, None, second_drops, self._machine_state)
-        self._add_carriage_pass(carriage_pass)
+        needles = self._machine_state.needles
+        drops = Carriage_Pass(Instruction_Type.Drop, None, None, self._machine_state)
+        second_drops = Carriage_Pass(Instruction_Type.Drop, None, None, self._machine_state)  # back needles across
+        # .... from dropped front needles
+        front_positions = self._machine_state.front_bed.occupied_needles()
+        for needle_pos in front_positions:
+            drops.add_instruction(needles.needle(is_front=True, position=needle_pos))
+        dropped_front = set(front_positions)
+        for needle_pos in self._machine_state.back_bed.occupied_needles():
+            back_needle = needles.needle(is_front=False, position=needle_pos)
+            if needle_pos in dropped_front:
+                second_drops.add_instruction(back_needle)
+            else:
+                drops.add_instruction(back_needle)
+        self._add_carriage_pass(drops, "Drop KnitGraph")
+        self._add_carriage_pass(second_drops)
 
     def _cast_on(self):
         """
@@ -72,51 +150,101 @@ class Knitout_Generator:
         """
         first_course_loops = self._courses_to_loop_ids[self._sorted_courses[0]]
         carrier_set = self._carrier
-        even_tucks_data: Dict[Needle, Instruction_Parameters] = {}
-        odd_tucks_data: Dict[Needle, Instruction_Parameters] = {}
+        needles = self._machine_state.needles
+        even_pass = Carriage_Pass(Instruction_Type.Tuck, Pass_Direction.Right_to_Left, None, self._machine_state)
+        odd_pass = Carriage_Pass(Instruction_Type.Tuck, Pass_Direction.Left_to_Right, None, self._machine_state)
         for needle_pos in range(0, len(first_course_loops)):
-            needle_1 = Needle(True, needle_pos)
+            needle_1 = needles.needle(True, needle_pos)
             if needle_pos % 2 == 0:
-                even_tucks_data[needle_1] = Instruction_Parameters(needle_1, involved_loop=-1, carrier=carrier_set)  # note, fake loop_id
+                even_pass.add_instruction(needle_1, involved_loop=-1, carrier=carrier_set)  # note, fake loop_id
             else:
-                odd_tucks_data[needle_1] = Instruction_Parameters(needle_1, involved_loop=-1, carrier=carrier_set)  # note, fake loop_id
-
-        even_pass = Carriage_Pass(Instruction_Type.Tuck, Pass_Direction.Right_to_Left, even_tucks_data,
-                                  self._machine_state)
+                odd_pass.add_instruction(needle_1, involved_loop=-1, carrier=carrier_set)  # note, fake loop_id
         self._add_carriage_pass(even_pass, "even cast-on")
-        odd_pass = Carriage_Pass(Instruction_Type.Tuck, Pass_Direction.Left_to_Right, odd_tucks_data,
-                                 self._machine_state)
         self._add_carriage_pass(odd_pass, "odd cast-on")
 
-        reverse_knits: Dict[Needle, Instruction_Parameters] = {}
-        first_loops: Dict[Needle, Instruction_Parameters] = {}
+        reverse_knits = Carriage_Pass(Instruction_Type.Knit, Pass_Direction.Right_to_Left, None, self._machine_state)
+        first_loops = Carriage_Pass(Instruction_Type.Knit, Pass_Direction.Left_to_Right, None, self._machine_state)
         for needle_pos, loop_id in enumerate(first_course_loops):
-            needle_1 = Needle(True, needle_pos)
-            reverse_knits[needle_1] = Instruction_Parameters(needle_1, involved_loop=-1, carrier=carrier_set)  # note, fake loop_id
-            first_loops[needle_1] = Instruction_Parameters(needle_1, involved_loop=loop_id, carrier=carrier_set)
-
-        carriage_pass = Carriage_Pass(Instruction_Type.Knit, Pass_Direction.Right_to_Left,
-                                      reverse_knits, self._machine_state)
-        self._add_carriage_pass(carriage_pass, "stabilize cast-on")
-        carriage_pass = Carriage_Pass(Instruction_Type.Knit, Pass_Direction.Left_to_Right,
-                                      first_loops, self._machine_state)
-        self._add_carriage_pass(carriage_pass, "first row loops")
+            needle_1 = needles.needle(True, needle_pos)
+            reverse_knits.add_instruction(needle_1, involved_loop=-1, carrier=carrier_set)  # note, fake loop_id
+            first_loops.add_instruction(needle_1, involved_loop=loop_id, carrier=carrier_set)
+        self._add_carriage_pass(reverse_knits, "stabilize cast-on")
+        self._add_carriage_pass(first_loops, "first row loops")
+        self._yarn_directions[self._knit_graph.loops[first_course_loops[0]].yarn_id] = Pass_Direction.Left_to_Right
+        self._last_yarn_id = self._knit_graph.loops[first_course_loops[0]].yarn_id
 
     def _knit_row(self, loop_ids: List[int], direction: Pass_Direction, course_number: int):
         """
         Adds the knit instructions for the given loop ids.
         Transfers to make these loops are also executed
         :param loop_ids: the loop ids of a single course
-        :param direction: the direction that the loops will be knit in
+        :param direction: the direction that the course was made in, used to place yarn-overs
         :param course_number: the course identifier for comments only
         """
-        carrier_set = self._carrier
         loop_id_to_target_needle = self._do_xfers_for_row(loop_ids, direction)
-        knit_data: Dict[Needle, Instruction_Parameters] = {}
-        for loop_id, target_needle in loop_id_to_target_needle.items():
-            knit_data[target_needle] = Instruction_Parameters(target_needle, involved_loop=loop_id, carrier=carrier_set)
-        carriage_pass = Carriage_Pass(Instruction_Type.Knit, direction, knit_data, self._machine_state)
-        self._add_carriage_pass(carriage_pass, f"Knit course {course_number}")
+        yarns_to_knit_data: Dict[str, List[int]] = {}  # yarn ids to the loops they knit in this course
+        for loop_id in loop_id_to_target_needle:
+            yarn_id = self._knit_graph.loops[loop_id].yarn_id
+            if yarn_id not in yarns_to_knit_data:
+                yarns_to_knit_data[yarn_id] = []
+            yarns_to_knit_data[yarn_id].append(loop_id)
+        yarns_to_target_needles = {yarn_id: [loop_id_to_target_needle[loop_id] for loop_id in yarn_loop_ids]
+                                   for yarn_id, yarn_loop_ids in yarns_to_knit_data.items()}
+        while len(yarns_to_knit_data) > 0:  # the yarns knit separate needles, so their order does not change the fabric
+            yarn_id = min(yarns_to_knit_data,
+                          key=lambda knitting_yarn_id: self._yarn_priority(knitting_yarn_id,
+                                                                           yarns_to_target_needles[knitting_yarn_id]))
+            target_needles = yarns_to_target_needles.pop(yarn_id)
+            yarn_direction = self._yarn_direction(yarn_id, target_needles)
+            carrier = self._knit_graph.yarns[yarn_id].carrier
+            if self._yarn_directions.get(yarn_id) is yarn_direction:  # the carrier stopped where this pass ends
+                self._kick_carrier(carrier, yarn_direction, target_needles[0], course_number)
+            carriage_pass = Carriage_Pass(Instruction_Type.Knit, yarn_direction, None, self._machine_state)
+            for loop_id, target_needle in zip(yarns_to_knit_data.pop(yarn_id), target_needles):
+                carriage_pass.add_instruction(target_needle, involved_loop=loop_id, carrier=carrier)
+            self._add_carriage_pass(carriage_pass, f"Knit course {course_number}")
+            self._yarn_directions[yarn_id] = yarn_direction
+            self._last_yarn_id = yarn_id
+
+    def _yarn_direction(self, yarn_id: str, target_needles: List[Needle]) -> Pass_Direction:
+        """
+        :param yarn_id: the yarn to knit with next
+        :param target_needles: the needles the yarn knits its loops on, in the order of the loops on the yarn
+        :return: the direction that knits the loops in yarn order. For a single loop, the direction that starts
+         where the yarn stopped, or for a yarn that has not knit, where the last knitting pass stopped
+        """
+        first_position = target_needles[0].position
+        last_position = target_needles[-1].position
+        if first_position < last_position:
+            return Pass_Direction.Left_to_Right
+        elif first_position > last_position:
+            return Pass_Direction.Right_to_Left
+        elif yarn_id in self._yarn_directions:
+            return self._yarn_directions[yarn_id].opposite()
+        return self._yarn_directions[self._last_yarn_id].opposite()
+
+    def _kick_carrier(self, carrier: Yarn_Carrier, direction: Pass_Direction, first_needle: Needle,
+                      course_number: int):
+        """
+        Moves a carrier back past the first needle of its next pass without knitting
+        :param carrier: the carrier that stopped at the wrong end of its next pass
+        :param direction: the direction of the carrier's next pass
+        :param first_needle: the first needle knit by the carrier's next pass
+        :param course_number: the course identifier for comments only
+        """
+        kick = Carriage_Pass(Instruction_Type.Miss, direction.opposite(), None, self._machine_state)
+        kick.add_instruction(first_needle, carrier=carrier)
+        self._add_carriage_pass(kick, f"Kick carrier{carrier} for course {course_number}")
+
+    def _yarn_priority(self, yarn_id: str, target_needles: List[Needle]) -> Tuple[bool, bool]:
+        """
+        Orders the yarns of a course to avoid switching carriers, then to avoid moving the carriage without knitting
+        :param yarn_id: a yarn knitting the current course
+        :param target_needles: the needles the yarn knits its loops on, in the order of the loops on the yarn
+        :return: a key that is smallest for the yarn that should knit first
+        """
+        carriage_direction = self._yarn_directions[self._last_yarn_id].opposite()  # transfers do not move the carriage
+        return yarn_id != self._last_yarn_id, self._yarn_direction(yarn_id, target_needles) is not carriage_direction
 
     def _do_xfers_for_row(self, loop_ids: List[int], direction: Pass_Direction) -> Dict[int, Needle]:
         """
@@ -125,22 +253,22 @@ class Knitout_Generator:
         :param direction: the direction that the loops will be knit in
         :return:
         """
-        loop_id_to_target_needle, parent_loops_to_needles, lace_offsets, front_cable_offsets, back_cable_offsets \
+        loop_id_to_target_needle, parent_loops_to_needles, decrease_stacks, front_cable_offsets, back_cable_offsets \
             = self._find_target_needles(loop_ids, direction)
-        self._do_decrease_transfers(parent_loops_to_needles, lace_offsets)
+        self._do_decrease_transfers(parent_loops_to_needles, loop_id_to_target_needle, decrease_stacks)
         self._do_cable_transfers(parent_loops_to_needles, front_cable_offsets, back_cable_offsets)
         self._do_knit_purl_xfers(loop_id_to_target_needle)
         return loop_id_to_target_needle
 
     def _find_target_needles(self, loop_ids: List[int], direction: Pass_Direction) -> \
-            Tuple[Dict[int, Needle], Dict[int, Needle], Dict[int, int], Dict[int, int], Dict[int, int]]:
+            Tuple[Dict[int, Needle], Dict[int, Needle], Dict[int, List[int]], Dict[int, int], Dict[int, int]]:
         """
         Finds target needle information needed to do transfers
         :param loop_ids: the loop ids of a single course
         :param direction: the direction that the loops will be knit in
         :return: Loops mapped to target needles to be knit on,
         parent loops mapped to current needles,
-        parent loops mapped to their offsets in a decrease
+        decrease loops mapped to their parent loops from the bottom to the top of the stack
         parent loops mapped to their offsets in the front of cables
         parent loops mapped to their offsets in the back of cables
         """
@@ -152,9 +280,9 @@ class Knitout_Generator:
         # .... only include loops that cross in front. i.e., self._knit_graph.graph[parent_id][loop_id]["depth"] > 0
         back_cable_offsets: Dict[int, int] = {}  # key parent loop_id to the offset to their child
         # .... only include loops that cross in back. i.e., self._knit_graph.graph[parent_id][loop_id]["depth"] < 0
-        decrease_offsets: Dict[int, int] = {}  # key parent loop_id to the offset to their child
-        # .... only includes parents involved in a decrease
+        decrease_stacks: Dict[int, List[int]] = {}  # key decrease loop_ids to their parent loop_ids, bottom first
         max_needle = len(loop_ids) - 1  # last needle being used to create this swatch
+        needles = self._machine_state.needles
         for loop_pos, loop_id in enumerate(loop_ids):  # find target needle locations of each loop in the course
             parent_ids = [*self._knit_graph.graph.predecessors(loop_id)]
             for parent_id in parent_ids:  # find current needle of all parent loops
@@ -166,7 +294,7 @@ class Knitout_Generator:
                     position = loop_pos
                 else:
                     position = max_needle - loop_pos
-                loop_id_to_target_needle[loop_id] = Needle(is_front=True, position=position)
+                loop_id_to_target_needle[loop_id] = needles.needle(is_front=True, position=position)
             elif len(parent_ids) == 1:  # knit, purl, may be in cable, no needle
                 parent_id = [*parent_ids][0]
                 parent_offset = self._knit_graph.graph[parent_id][loop_id]["parent_offset"]
@@ -181,22 +309,24 @@ class Knitout_Generator:
                 front_bed = pull_direction is Pull_Direction.BtF  # knit on front bed, purl on back bed
                 parent_needle = parent_loops_to_needles[parent_id]
                 offset_needle = parent_needle.offset(parent_offset)
-                target_needle = Needle(is_front=front_bed, position=offset_needle.position)
+                target_needle = offset_needle if offset_needle.is_front == front_bed else offset_needle.opposite()
                 loop_id_to_target_needle[loop_id] = target_needle
                 parents_to_offsets[parent_id] = parent_offset
-            else:  # decrease, the bottom parent loop in the stack  will be on the target needle
+            else:  # decrease, the parents are stacked on the needle of the parent with no offset from the child
                 loop = self._knit_graph.loops[loop_id]
-                target_needle = None  # re-assigned on first iteration to needle of first parent
-                for i, parent in enumerate(loop.parent_loops):
-                    parent_needle = parent_loops_to_needles[parent.loop_id]
-                    if i == 0:  # first parent in stack
-                        target_needle = parent_needle
-                    loop_id_to_target_needle[loop_id] = target_needle
-                    offset = self._knit_graph.graph[parent.loop_id][loop_id]["parent_offset"]
-                    parents_to_offsets[parent.loop_id] = offset
-                    decrease_offsets[parent.loop_id] = offset
+                target_needle = None
+                for parent_id in loop.parent_loop_ids:
+                    offset = self._knit_graph.graph[parent_id][loop_id]["parent_offset"]
+                    parents_to_offsets[parent_id] = offset
+                    if offset == 0 and target_needle is None:
+                        target_needle = parent_loops_to_needles[parent_id]
+                if target_needle is None:  # offset = parent_index - child_index
+                    bottom_parent_id = loop.parent_loop_ids[0]
+                    target_needle = parent_loops_to_needles[bottom_parent_id].offset(-parents_to_offsets[bottom_parent_id])
+                loop_id_to_target_needle[loop_id] = target_needle
+                decrease_stacks[loop_id] = [*loop.parent_loop_ids]
 
-        return loop_id_to_target_needle, parent_loops_to_needles, decrease_offsets, \
+        return loop_id_to_target_needle, parent_loops_to_needles, decrease_stacks, \
                front_cable_offsets, back_cable_offsets
 
     def _do_cable_transfers(self, parent_loops_to_needles: Dict[int, Needle], front_cable_offsets: Dict[int, int],
@@ -211,83 +341,68 @@ class Knitout_Generator:
         :param front_cable_offsets: parent loops mapped to their offsets for the front of cables
         :param back_cable_offsets: parent loops mapped to their offsets for the back of cables
         """
-        xfers_to_back: Dict[Needle, Instruction_Parameters] = {}
-        front_cable_xfers: Dict[int, Dict[Needle, Instruction_Parameters]] = {}
-        back_cable_xfers: Dict[int, Dict[Needle, Instruction_Parameters]] = {}
+        xfers_to_back = Carriage_Pass(Instruction_Type.Xfer, None, None, self._machine_state)
+        front_cable_xfers: Dict[int, List[Tuple[Needle, Needle]]] = {}  # offsets to the transfers at that offset
+        back_cable_xfers: Dict[int, List[Tuple[Needle, Needle]]] = {}
         for parent_loop, parent_needle in parent_loops_to_needles.items():
-            front_needle = Needle(is_front=True, position=parent_needle.position)
+            front_needle = parent_needle if parent_needle.is_front else parent_needle.opposite()
             back_needle = parent_needle.opposite()
             if parent_needle.is_front and (parent_loop in front_cable_offsets or parent_loop in back_cable_offsets):
-                xfers_to_back[front_needle] = Instruction_Parameters(front_needle, needle_2=back_needle)
+                xfers_to_back.add_instruction(front_needle, needle_2=back_needle)
             if parent_loop in front_cable_offsets:
                 offset = front_cable_offsets[parent_loop]
                 if offset not in front_cable_xfers:
-                    front_cable_xfers[offset] = {}
-                offset_needle = front_needle.offset(offset)
-                front_cable_xfers[offset][back_needle] = Instruction_Parameters(back_needle, needle_2=offset_needle)
+                    front_cable_xfers[offset] = []
+                front_cable_xfers[offset].append((back_needle, front_needle.offset(offset)))
             elif parent_loop in back_cable_offsets:
                 offset = back_cable_offsets[parent_loop]
                 if offset not in back_cable_xfers:
-                    back_cable_xfers[offset] = {}
-                offset_needle = front_needle.offset(offset)
-                back_cable_xfers[offset][back_needle] = Instruction_Parameters(back_needle, needle_2=offset_needle)
-        carriage_pass = Carriage_Pass(Instruction_Type.Xfer, None, xfers_to_back, self._machine_state)
-        self._add_carriage_pass(carriage_pass, "cables to back")
-        for offset, xfer_params in front_cable_xfers.items():
-            carriage_pass = Carriage_Pass(Instruction_Type.Xfer, None, xfer_params, self._machine_state)
-            self._add_carriage_pass(carriage_pass, f"front of cable at offset {offset} to front")
-        for offset, xfer_params in back_cable_xfers.items():
-            carriage_pass = Carriage_Pass(Instruction_Type.Xfer, None, xfer_params, self._machine_state)
-            self._add_carriage_pass(carriage_pass, f"back of cable at offset {offset} to front")
+                    back_cable_xfers[offset] = []
+                back_cable_xfers[offset].append((back_needle, front_needle.offset(offset)))
+        self._add_carriage_pass(xfers_to_back, "cables to back")
+        for offset, transfers in front_cable_xfers.items():
+            self._add_xfer_pass(transfers, f"front of cable at offset {offset} to front")
+        for offset, transfers in back_cable_xfers.items():
+            self._add_xfer_pass(transfers, f"back of cable at offset {offset} to front")
 
-    def _do_decrease_transfers(self, parent_loops_to_needles: Dict[int, Needle], decrease_offsets: Dict[int, int]):
-        """
-        Based on the school bus algorithm.
-         Transfer all loops in decrease to the opposite side
-         Bring the loops back to their offset needle in the order of offsets from negative to positive offsets
-        Note that we are restricting our decreases to be offsets of 1 or -1 due to limitations of the machine.
-        This is not a completely general method and does not guarantee stacking order of our decreases
-        A more advanced method can be found at:
-        https://textiles-lab.github.io/posts/2018/02/07/lace-transfers/
-        This would require some changes to the code structure and is not recommended for assignment 2.
+    def _do_decrease_transfers(self, parent_loops_to_needles: Dict[int, Needle],
+                               loop_id_to_target_needle: Dict[int, Needle], decrease_stacks: Dict[int, List[int]]):
+        """
+        Stacks the parents of each decrease on the decrease's target needle in stack order, see plan_decrease_transfers.
+        Decreases can stack any number of parents at offsets up to the machine's maximum racking
         :param parent_loops_to_needles: parent loops mapped to their current needle
-        :param decrease_offsets: the offsets of parent loops to create decreases
-        """
-        xfers_to_holding_bed: Dict[Needle, Instruction_Parameters] = {}
-        # key needles currently holding the loops to the opposite needle to hold them for offset-xfers
-        offset_to_xfers_to_target: Dict[int, Dict[Needle, Instruction_Parameters]] = {}
-        # key offset values (-N...0..N) to starting needles to their target needle
-        for parent_id, parent_needle in parent_loops_to_needles.items():
-            if parent_id in decrease_offsets:  # this loop is involved in a decrease
-                offset = decrease_offsets[parent_id]
-                offset_needle = parent_needle.offset(offset)
-                holding_needle = parent_needle.opposite()
-                xfers_to_holding_bed[parent_needle] = Instruction_Parameters(parent_needle, needle_2=holding_needle)
-                if offset not in offset_to_xfers_to_target:
-                    offset_to_xfers_to_target[offset] = {}
-                offset_to_xfers_to_target[offset][holding_needle] = Instruction_Parameters(holding_needle, needle_2=offset_needle)
-
-        carriage_pass = Carriage_Pass(Instruction_Type.Xfer, None, xfers_to_holding_bed, self._machine_state)
-        self._add_carriage_pass(carriage_pass, "send loops to decrease to back")
-        for offset in sorted(offset_to_xfers_to_target.keys()):
-            offset_xfers = offset_to_xfers_to_target[offset]
-            carriage_pass = Carriage_Pass(Instruction_Type.Xfer, None, offset_xfers, self._machine_state)
-            self._add_carriage_pass(carriage_pass, f"stack decreases with offset {offset}")
+        :param loop_id_to_target_needle: loops mapped to their target needles
+        :param decrease_stacks: decrease loops mapped to their parent loops from the bottom to the top of the stack
+        """
+        stacks = [(loop_id_to_target_needle[loop_id], [parent_loops_to_needles[parent_id] for parent_id in parent_ids])
+                  for loop_id, parent_ids in decrease_stacks.items()]
+        for racking, transfers in plan_decrease_transfers(stacks, self._machine_state):
+            self._add_xfer_pass(transfers, f"stack decreases at racking {racking}")
 
     def _do_knit_purl_xfers(self, loop_id_to_target_needle: Dict[int, Needle]):
         """
         Transfers loops to bed needed for knit vs purl
         :param loop_id_to_target_needle: loops mapped to their target needles
         """
-        xfers: Dict[Needle, Instruction_Parameters] = {}
+        carriage_pass = Carriage_Pass(Instruction_Type.Xfer, None, None, self._machine_state)
         for loop_id, target_needle in loop_id_to_target_needle.items():
             opposite_needle = target_needle.opposite()
             loops_on_opposite = self._machine_state[opposite_needle]
             if len(loops_on_opposite) > 0:  # something to transfer for knitting
-                xfers[opposite_needle] = Instruction_Parameters(opposite_needle, needle_2=target_needle)
-        carriage_pass = Carriage_Pass(Instruction_Type.Xfer, None, xfers, self._machine_state)
+                carriage_pass.add_instruction(opposite_needle, needle_2=target_needle)
         self._add_carriage_pass(carriage_pass, "kp-transfers")
 
+    def _add_xfer_pass(self, transfers: List[Tuple[Needle, Needle]], first_comment=""):
+        """
+        Executes a pass of transfers and adds it to the instructions
+        :param transfers: the needles to transfer from paired with the needles to transfer to
+        :param first_comment: a comment for the first instruction
+        """
+        carriage_pass = Carriage_Pass(Instruction_Type.Xfer, None, None, self._machine_state)
+        for needle_1, needle_2 in transfers:
+            carriage_pass.add_instruction(needle_1, needle_2=needle_2)
+        self._add_carriage_pass(carriage_pass, first_comment)
+
     def _add_carriage_pass(self, carriage_pass: Carriage_Pass, first_comment="", comment=""):
         """
         Executes the carriage pass and adds it to the instructions
@@ -295,20 +410,116 @@ class Knitout_Generator:
         :param first_comment: a comment for the first instruction
         :param comment:  a comment for each instruction
         """
-        if len(carriage_pass.needles_to_instruction_parameters) > 0:
+        if len(carriage_pass) == 0:
+            return
+        if self._transfer_optimizer is not None:
+            carriage_pass.write_instructions()  # update the planning state, the pass is written on the output state
+            if carriage_pass.instruction_type is Instruction_Type.Xfer:
+                self._pending_xfer_passes.append((carriage_pass, first_comment))
+                return
+            self._write_pending_transfers()
+            carriage_pass = carriage_pass.on_machine_state(self._output_state)
+        self._write_carriage_pass(carriage_pass, first_comment, comment)
+
+    def _write_carriage_pass(self, carriage_pass: Carriage_Pass, first_comment="", comment=""):
+        """
+        Executes the carriage pass on the output state and writes its instructions
+        :param carriage_pass: the carriage pass to be written
+        :param first_comment: a comment for the first instruction
+        :param comment:  a comment for each instruction
+        """
+        if self._keep_instructions:  # streamed passes are not kept
             self._carriage_passes.append(carriage_pass)
-            self._instructions.extend(carriage_pass.write_instructions(first_comment, comment))
+        start = len(self._instructions)
+        carriage_pass.execute(self._instructions, first_comment, comment)
+        self._emit(start)
 
-    def write_instructions(self, filename: str, generate_instructions: bool = True):
+    def _write_pending_transfers(self):
         """
-        Writes the instructions from the generator to a knitout file
-        :param filename: the name of the file including the suffix
-        :param generate_instructions: True if the instructions still need to be generated
+        Optimizes the transfer passes planned since the last pass was written and writes them on the output state
         """
-        if generate_instructions:
+        if len(self._pending_xfer_passes) == 0:
+            return
+        xfer_passes = [xfer_pass for xfer_pass, _ in self._pending_xfer_passes]
+        first_comment = ", ".join(comment for _, comment in self._pending_xfer_passes if comment != "")
+        self._pending_xfer_passes = []
+        for carriage_pass in self._transfer_optimizer.optimize(xfer_passes, self._output_state):
+            self._write_carriage_pass(carriage_pass, first_comment)
+            first_comment = ""
+
+    def _emit(self, start: int):
+        """
+        Adds the instructions executed since start to the DAT passes and writes them to the stream.
+        While streaming they are then discarded
+        :param start: the index of the first new instruction
+        """
+        if self._dat_writer is not None:
+            self._dat_writer.add_instructions(self._instructions, start)
+        if self._sink is not None:
+            self._instructions.write_knitout(self._sink, start)
+        if not self._keep_instructions:
+            self._instructions.clear()
+
+    def stream_instructions(self, sink: Optional[TextIO]):
+        """
+        Generates the instructions for this knitgraph, writing each carriage pass to the sink as soon as it is executed.
+        Neither the instructions nor the carriage passes are kept, so memory does not grow with the number of rows
+        :param sink: a writable text file, None to only add the instructions to the DAT passes being written
+        """
+        self._sink = sink
+        self._keep_instructions = False
+        try:
             self.generate_instructions()
-        with open(filename, "w") as file:
-            file.writelines(self._instructions)
+        finally:
+            self._sink = None
+            self._keep_instructions = True
+
+    def write_instructions(self, filename: str, generate_instructions: bool = True, compress: Optional[bool] = None,
+                           buffer_size: int = 1024 * 1024):
+        """
+        Writes the instructions from the generator to a knitout file.
+        New instructions are streamed to the file, if generation fails the partial file is removed
+        :param filename: the name of the file including the suffix
+        :param generate_instructions: True if the instructions still need to be generated,
+         False to write the instructions already generated by generate_instructions
+        :param compress: True to gzip the file, by default files ending in .gz are compressed
+        :param buffer_size: the number of bytes buffered before writing to an uncompressed file
+        """
+        if compress is None:
+            compress = filename.endswith(".gz")
+        if compress:
+            file = gzip.open(filename, "wt")
+        else:
+            file = open(filename, "w", buffering=buffer_size)
+        with file:
+            if not generate_instructions:
+                file.writelines(self._header)
+                self._instructions.write_knitout(file)
+                return
+            try:
+                self.stream_instructions(file)
+            except BaseException:
+                file.close()
+                os.remove(filename)
+                raise
+
+    def write_dat(self, dat_filename: str, knitout_filename: Optional[str] = None, position: str = "Center"):
+        """
+        Generates the instructions for this knitgraph and encodes the executed carriage passes as a DAT file
+         for Shima Seiki SWG-N2 machines, without translating knitout with knitout-to-dat.js
+        :param dat_filename: the name of the DAT file
+        :param knitout_filename: the name of a knitout file to write from the same passes, None for no knitout file
+        :param position: where to place the operations on the needle bed; Left, Center, Right, or Keep
+        """
+        self._dat_writer = Dat_Writer(self._machine_profile, position)
+        try:
+            if knitout_filename is None:
+                self.stream_instructions(None)  # no knitout is rendered
+            else:
+                self.write_instructions(knitout_filename)
+            self._dat_writer.write(dat_filename)
+        finally:
+            self._dat_writer = None
 
     def _add_header(self, position: str = "Center"):
         """
@@ -316,9 +527,8 @@ class Knitout_Generator:
         :param position: where to place the operations on the needle bed; Left, Center, Right,
          and Keep are standard values
         """
-        self._instructions.extend([";!knitout-2\n",
-                                   ";;Machine: SWG091N2\n",
-                                   ";;Gauge: 5\n",
-                                   ";;Width: 250\n",
-                                   f";;Carriers: 1 2 3 4 5 6 7 8 9 10\n",
-                                   f";;Position: {position}\n"])
+        header = self._machine_profile.header(position)
+        if self._sink is not None:
+            self._sink.writelines(header)
+        elif self._keep_instructions:
+            self._header = header
@@ -0,0 +1,400 @@
+"""Reads knitout files back and checks them by simulating each instruction on a machine state"""
+import gzip
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional, Set, TextIO, Tuple, Type
+
+from knitting_machine.Machine_Profile import Machine_Profile
+from knitting_machine.Machine_State import Machine_Bed, Machine_State, Yarn_Carrier
+
+_IGNORED_OPERATIONS = {"pause", "stitch", "amiss"}  # operations that do not change loops, racking, or carriers
+
+
+def open_knitout(filename: str) -> TextIO:
+    """
+    :param filename: the name of a knitout file, files ending in .gz are decompressed as they are read
+    :return: the file opened for reading text
+    """
+    if filename.endswith(".gz"):
+        return gzip.open(filename, "rt")
+    return open(filename, "r")
+
+
+def read_knitout(lines: Iterable[str]) -> Iterator[Tuple[int, str, List[str]]]:
+    """
+    Reads knitout one line at a time, so files of any size are read in constant memory
+    :param lines: the lines of a knitout file, such as an open file
+    :return: for each instruction, its line number (from 1), operation, and arguments. Comments and headers are skipped
+    """
+    for line_number, line in enumerate(lines, 1):
+        tokens = line.partition(";")[0].split()
+        if len(tokens) > 0:
+            yield line_number, tokens[0], tokens[1:]
+
+
+class Knitout_Violation:
+    """
+    An instruction that a knitout file could not have meant or that damages the knitting
+    ...
+
+    Attributes
+    ----------
+    line_number: int
+        the line of the knitout file with the instruction, 0 for problems found at the end of the file
+    instruction: str
+        the instruction without its comment
+    message: str
+        a description of the problem
+    """
+
+    def __init__(self, line_number: int, instruction: str, message: str):
+        """
+        :param line_number: the line of the knitout file with the instruction
+        :param instruction: the instruction without its comment
+        :param message: a description of the problem
+        """
+        self.line_number: int = line_number
+        self.instruction: str = instruction
+        self.message: str = message
+
+    def __str__(self):
+        return f"line {self.line_number}: {self.instruction}: {self.message}"
+
+    def __repr__(self):
+        return str(self)
+
+
+class Knitout_Validator:
+    """
+    Simulates knitout on a Machine_State and records the instructions that violate the state of the machine
+    ...
+    Checks for stitches on needles that do not exist, knits and splits on empty needles, transfers at the wrong racking,
+     racking past the machine's limit, carriers used before they are brought in,
+     knits without carriers that drop the loops on the needle, and loops left on the machine at the end of the file.
+    Loops are identified by the needle they were made on (front needles first, then back needles),
+     so memory does not grow with the length of the file.
+
+    Attributes
+    ----------
+    machine_state: Machine_State
+        the machine after the instructions validated so far
+    violations: List[Knitout_Violation]
+        the first max_violations violations found
+    violation_count: int
+        the number of violations found, including those not kept
+    instruction_count: int
+        the number of instructions simulated
+    max_violations: int
+        the number of violations to keep, so that badly broken files do not fill memory
+    empty_needle_knits: bool
+        True if knits on empty needles are accepted, Knitout_Generator knits yarn-overs on empty needles
+    """
+
+    def __init__(self, machine_state_type: Type[Machine_State] = Machine_State,
+                 machine_profile: Optional[Machine_Profile] = None, max_violations: int = 100,
+                 empty_needle_knits: bool = False):
+        """
+        :param machine_state_type: the Machine_State class used to simulate the machine
+        :param machine_profile: the machine the knitout is for, by default a SWG091N2
+        :param max_violations: the number of violations to keep
+        :param empty_needle_knits: True to accept knits on empty needles
+        """
+        if machine_profile is None:
+            machine_profile = Machine_Profile()
+        self.machine_state: Machine_State = machine_state_type(machine_profile=machine_profile)
+        self.violations: List[Knitout_Violation] = []
+        self.violation_count: int = 0
+        self.instruction_count: int = 0
+        self.max_violations: int = max_violations
+        self.empty_needle_knits: bool = empty_needle_knits
+        self._needles: Dict[str, Tuple[Machine_Bed, int, int]] = {}  # needle names to their bed, position, and loop id
+        self._carriers: Dict[str, Yarn_Carrier] = {}  # carrier names to their carrier
+        self._carrier_names_in_operation: Set[str] = set()  # the names of the carriers in operation
+        self._line_number: int = 0
+        self._operation: str = ""
+        self._arguments: List[str] = []
+
+    def validate_file(self, filename: str) -> List[Knitout_Violation]:
+        """
+        :param filename: the knitout file to validate, files ending in .gz are decompressed as they are read
+        :return: the violations kept, see validate
+        """
+        with open_knitout(filename) as file:
+            return self.validate(file)
+
+    def validate(self, lines: Iterable[str]) -> List[Knitout_Violation]:
+        """
+        Simulates each instruction and then checks that no loops were left on the machine
+        :param lines: the lines of a knitout file, such as an open file
+        :return: the first max_violations violations found
+        """
+        operations = {"knit": self._knit, "tuck": self._tuck, "split": self._split, "xfer": self._xfer,
+                      "drop": self._drop, "miss": self._miss, "rack": self._rack,
+                      "in": self._in, "inhook": self._in, "releasehook": self._releasehook,
+                      "out": self._out, "outhook": self._out}
+        instruction_count = self.instruction_count
+        for line_number, line in enumerate(lines, 1):  # read_knitout, inlined because this loop runs per line
+            arguments = line.partition(";")[0].split()
+            if len(arguments) == 0:
+                continue
+            operation = arguments.pop(0)
+            self._line_number = line_number
+            self._operation = operation
+            self._arguments = arguments
+            instruction_count += 1
+            if operation in operations:
+                operations[operation](arguments)
+            elif operation not in _IGNORED_OPERATIONS and not operation.startswith("x-"):
+                self._violation("unknown instruction")
+        self.instruction_count = instruction_count
+        self._line_number, self._operation, self._arguments = 0, "end of file", []
+        for bed in [self.machine_state.front_bed, self.machine_state.back_bed]:
+            for position in bed.occupied_needles():
+                self._violation(f"{len(bed[position])} loops left on {'f' if bed.is_front else 'b'}{position + 1}")
+        return self.violations
+
+    def _violation(self, message: str):
+        """
+        Records a violation by the current instruction
+        :param message: a description of the problem
+        """
+        self.violation_count += 1
+        if len(self.violations) < self.max_violations:
+            instruction = " ".join([self._operation, *self._arguments])
+            self.violations.append(Knitout_Violation(self._line_number, instruction, message))
+
+    def _needle(self, name: str) -> Optional[Tuple[Machine_Bed, int, int]]:
+        """
+        :param name: a needle name such as f12 or b3
+        :return: the bed and position of the needle and the id of loops made on it, None if there is no such needle
+        """
+        needle = self._needles.get(name)
+        if needle is not None:
+            return needle
+        bed_name, number = name[0:1], name[1:]
+        if bed_name in ("f", "b") and number.isdigit() and 0 < int(number) <= self.machine_state.needle_count:
+            position = int(number) - 1
+            if bed_name == "f":
+                needle = (self.machine_state.front_bed, position, position)
+            else:
+                needle = (self.machine_state.back_bed, position, position + self.machine_state.needle_count)
+            self._needles[name] = needle
+        else:
+            self._violation(f"no needle {name}")
+        return needle
+
+    def _carrier_set(self, names: List[str]):
+        """
+        Checks that the carriers used by a stitch are in operation
+        :param names: the carriers used by a stitch
+        """
+        for name in names:
+            if name not in self._carrier_names_in_operation and self._carrier(name) is not None:
+                self._violation(f"carrier {name} used before it was brought in")
+
+    def _carrier(self, name: str) -> Optional[Yarn_Carrier]:
+        """
+        :param name: the name of a carrier
+        :return: the carrier, None if the machine does not have the carrier
+        """
+        if name in self._carriers:
+            return self._carriers[name]
+        if not name.isdigit() or not 0 < int(name) <= self.machine_state.machine_profile.carrier_count:
+            self._violation(f"no carrier {name}")
+            return None
+        carrier = Yarn_Carrier(int(name))
+        self._carriers[name] = carrier
+        return carrier
+
+    def _knit(self, arguments: List[str]):
+        """
+        knit D N CS
+        :param arguments: the arguments of the instruction
+        """
+        if len(arguments) < 2:
+            self._violation("expected a direction and a needle")
+            return
+        needle = self._needle(arguments[1])
+        self._carrier_set(arguments[2:])
+        if needle is None:
+            return
+        bed, position, loop_id = needle
+        if len(arguments) == 2:  # knitting without yarn drops the loops
+            if len(bed[position]) > 0:
+                self._violation(f"knit without carriers drops {len(bed[position])} loops")
+            bed.drop_loop(position)
+            return
+        if not self.empty_needle_knits and len(bed[position]) == 0:
+            self._violation("knit on an empty needle")
+        bed.add_loop(loop_id, position, drop_prior_loops=True)
+
+    def _tuck(self, arguments: List[str]):
+        """
+        tuck D N CS
+        :param arguments: the arguments of the instruction
+        """
+        if len(arguments) < 2:
+            self._violation("expected a direction and a needle")
+            return
+        needle = self._needle(arguments[1])
+        self._carrier_set(arguments[2:])
+        if needle is not None and len(arguments) > 2:
+            bed, position, loop_id = needle
+            bed.add_loop(loop_id, position, drop_prior_loops=False)
+
+    def _miss(self, arguments: List[str]):
+        """
+        miss D N CS
+        :param arguments: the arguments of the instruction
+        """
+        if len(arguments) < 2:
+            self._violation("expected a direction and a needle")
+            return
+        self._needle(arguments[1])
+        self._carrier_set(arguments[2:])
+
+    def _drop(self, arguments: List[str]):
+        """
+        drop N
+        :param arguments: the arguments of the instruction
+        """
+        if len(arguments) != 1:
+            self._violation("expected a needle")
+            return
+        needle = self._needle(arguments[0])
+        if needle is not None:
+            needle[0].drop_loop(needle[1])
+
+    def _transfer(self, from_name: str, to_name: str) -> bool:
+        """
+        Moves the loops between needles on opposite beds if the racking aligns them
+        :param from_name: the needle to transfer loops from
+        :param to_name: the needle to transfer loops to
+        :return: True if the transfer was made
+        """
+        from_needle, to_needle = self._needle(from_name), self._needle(to_name)
+        if from_needle is None or to_needle is None:
+            return False
+        from_bed, from_position, _ = from_needle
+        to_bed, to_position, _ = to_needle
+        if from_bed.is_front == to_bed.is_front:
+            self._violation(f"{from_name} and {to_name} are on the same bed")
+            return False
+        if from_bed.is_front:
+            racking = from_position - to_position
+        else:
+            racking = to_position - from_position
+        if racking != self.machine_state.racking:
+            self._violation(f"racking {self.machine_state.racking} does not align {from_name} with {to_name}")
+            return False
+        for loop_id in from_bed[from_position]:
+            to_bed.add_loop(loop_id, to_position, drop_prior_loops=False)
+        from_bed.drop_loop(from_position)
+        return True
+
+    def _xfer(self, arguments: List[str]):
+        """
+        xfer N N2
+        :param arguments: the arguments of the instruction
+        """
+        if len(arguments) != 2:
+            self._violation("expected two needles")
+            return
+        needle = self._needle(arguments[0])
+        if needle is not None and len(needle[0][needle[1]]) == 0:
+            self._violation("transfer from an empty needle")
+        self._transfer(arguments[0], arguments[1])
+
+    def _split(self, arguments: List[str]):
+        """
+        split D N N2 CS
+        :param arguments: the arguments of the instruction
+        """
+        if len(arguments) < 3:
+            self._violation("expected a direction and two needles")
+            return
+        needle = self._needle(arguments[1])
+        self._carrier_set(arguments[3:])
+        if needle is not None and len(needle[0][needle[1]]) == 0:
+            self._violation("split on an empty needle")
+        if self._transfer(arguments[1], arguments[2]) and len(arguments) > 3:
+            bed, position, loop_id = needle
+            bed.add_loop(loop_id, position, drop_prior_loops=False)
+
+    def _rack(self, arguments: List[str]):
+        """
+        rack R
+        :param arguments: the arguments of the instruction
+        """
+        try:
+            racking = float(arguments[0]) if len(arguments) == 1 else None
+        except ValueError:
+            racking = None
+        if racking is None:
+            self._violation("expected a racking")
+            return
+        if abs(racking) > self.machine_state.machine_profile.max_racking:
+            self._violation(f"cannot rack past {self.machine_state.machine_profile.max_racking}")
+        if racking == int(racking):
+            racking = int(racking)
+        self.machine_state.racking = racking
+
+    def _in(self, arguments: List[str]):
+        """
+        in CS or inhook CS
+        :param arguments: the arguments of the instruction
+        """
+        for name in arguments:
+            carrier = self._carrier(name)
+            if carrier is None:
+                continue
+            if carrier in self.machine_state.yarns_in_operation:
+                self._violation(f"carrier {name} is already in")
+            elif self._operation == "inhook":
+                self.machine_state.in_hook(carrier)
+                self._carrier_names_in_operation.add(name)
+            else:
+                self.machine_state.yarns_in_operation.add(carrier)
+                self._carrier_names_in_operation.add(name)
+
+    def _releasehook(self, arguments: List[str]):
+        """
+        releasehook CS
+        :param arguments: the arguments of the instruction
+        """
+        for name in arguments:
+            carrier = self._carrier(name)
+            if carrier is None:
+                continue
+            if carrier in self.machine_state.in_hooks:
+                self.machine_state.release_hook(carrier)
+            else:
+                self._violation(f"carrier {name} is not on the inserting hook")
+
+    def _out(self, arguments: List[str]):
+        """
+        out CS or outhook CS
+        :param arguments: the arguments of the instruction
+        """
+        for name in arguments:
+            carrier = self._carrier(name)
+            if carrier is None:
+                continue
+            if carrier not in self.machine_state.yarns_in_operation:
+                self._violation(f"carrier {name} is not in")
+            else:
+                self.machine_state.in_hooks.discard(carrier)
+                self.machine_state.out_hook(carrier)
+                self._carrier_names_in_operation.discard(name)
+
+
+if __name__ == "__main__":
+    for knitout_file in sys.argv[1:]:
+        validator = Knitout_Validator()
+        start = time.perf_counter()
+        file_violations = validator.validate_file(knitout_file)
+        duration = time.perf_counter() - start
+        print(f"{knitout_file}: {validator.instruction_count} instructions in {duration:.3f}s, "
+              f"{validator.violation_count} violations")
+        for violation in file_violations:
+            print(f"    {violation}")
@@ -0,0 +1,36 @@
+"""Plans the transfers that stack the parent loops of decreases onto their target needles"""
+from typing import List, Set, Tuple
+
+from knitting_machine.Machine_State import Machine_State, Needle
+from knitting_machine.xfer_pass_optimizer import group_transfers_by_racking
+
+
+def plan_decrease_transfers(decrease_stacks: List[Tuple[Needle, List[Needle]]],
+                            machine_state: Machine_State) -> List[Tuple[int, List[Tuple[Needle, Needle]]]]:
+    """
+    Plans the transfers that stack the parents of each decrease on its target needle in stack order.
+    A parent on the target bed is first moved to the opposite needle to hold it, a parent on the other bed is
+     transferred straight to the target. A parent already on the target needle stays if it is the bottom of the stack,
+     otherwise it is held and returned once the loops below it are stacked.
+    The transfers are grouped into single-racking passes, taking the racking that the most stacks are waiting on.
+    Based on the lace transfer planning at https://textiles-lab.github.io/posts/2018/02/07/lace-transfers/
+    :param decrease_stacks: the target needle of each decrease and the needles of its parents, bottom of the stack first
+    :param machine_state: the machine state before the transfers
+    :return: the racking and transfers (from needle, to needle) of each pass
+    """
+    holding_transfers: List[Tuple[Needle, Needle]] = []
+    stacking_transfers: List[Tuple[Needle, Needle]] = []
+    moved_needles: Set[Needle] = {needle for _, parent_needles in decrease_stacks for needle in parent_needles}
+    for target_needle, parent_needles in decrease_stacks:
+        for stack_position, parent_needle in enumerate(parent_needles):
+            if parent_needle.is_front != target_needle.is_front:
+                stacking_transfers.append((parent_needle, target_needle))
+                continue
+            if stack_position == 0 and parent_needle.position == target_needle.position:
+                continue  # the bottom of the stack is already on the target needle
+            holding_needle = parent_needle.opposite()
+            assert holding_needle not in moved_needles and len(machine_state[holding_needle]) == 0, \
+                f"Cannot hold the loops on {parent_needle} because {holding_needle} is in use"
+            holding_transfers.append((parent_needle, holding_needle))
+            stacking_transfers.append((holding_needle, target_needle))
+    return group_transfers_by_racking(holding_transfers + stacking_transfers, machine_state.racking)
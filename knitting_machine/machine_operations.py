@@ -1,23 +1,48 @@
 """
-Methods and support for writing knitout commands and updating a machine state
+Methods and support for writing knitout commands and updating a machine state.
+Each operation records its instructions in the given Instruction_Buffer,
+ or if no buffer is given returns the knitout for its instructions
 """
-import math
-from typing import Tuple, Optional
+from typing import Optional
 
 from knitting_machine.Machine_State import Machine_State, Yarn_Carrier, Pass_Direction, Needle
+from knitting_machine.instruction_buffer import Instruction_Buffer, Opcode
 
 
-def rack(machine_state: Machine_State, racking: float, comment: str = "") -> str:
+def _buffer(instructions: Optional[Instruction_Buffer]) -> Instruction_Buffer:
+    """
+    :param instructions: the buffer to record instructions in, None to render them as knitout
+    :return: the buffer to record the operation's instructions in
+    """
+    if instructions is None:
+        return Instruction_Buffer()
+    return instructions
+
+
+def _knitout(buffer: Instruction_Buffer, instructions: Optional[Instruction_Buffer]) -> Optional[str]:
+    """
+    :param buffer: the buffer the operation's instructions were recorded in
+    :param instructions: the buffer given to the operation
+    :return: None if the instructions were recorded in a given buffer, otherwise the knitout for the instructions
+    """
+    if instructions is None:
+        return "".join(buffer.render_all())
+    return None
+
+
+def rack(machine_state: Machine_State, racking: float, comment: str = "",
+         instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     :param machine_state: the current machine model to update
     :param racking: the new racking to set the machine to
     :param comment: additional details to document in the knitout
-    :return: the racking instruction
+    :param instructions: the buffer to record the instruction in
+    :return: the racking instruction if no buffer is given
     """
     machine_state.racking = racking
-    if racking != .25 and racking != -.75:  # racking for all needle knitting
-        racking = math.floor(racking)
-    return f"rack {racking} ;{comment}\n"
+    buffer = _buffer(instructions)
+    buffer.append(Opcode.Rack, racking, comment=comment)
+    return _knitout(buffer, instructions)
 
 
 def make_carrier_set(carrier: Yarn_Carrier, needle: Optional[Needle] = None) -> str:
@@ -31,7 +56,8 @@ def make_carrier_set(carrier: Yarn_Carrier, needle: Optional[Needle] = None) ->
     return str(carrier)
 
 
-def miss(direction: Pass_Direction, needle: Needle, carrier_set: Yarn_Carrier, comment: str = "") -> str:
+def miss(direction: Pass_Direction, needle: Needle, carrier_set: Yarn_Carrier, comment: str = "",
+         instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Move the specified carriers as if they had just formed a loop in direction D at location N.
     (Not generally needed, used when performing explicit kickbacks or purposeful yarn capture.)
@@ -39,14 +65,17 @@ def miss(direction: Pass_Direction, needle: Needle, carrier_set: Yarn_Carrier, c
     :param needle: the needle to pull the carrier set to
     :param carrier_set: the set of carriers being used
     :param comment: additional details to document in the knitout
-    :return: the mis instruction
+    :param instructions: the buffer to record the instruction in
+    :return: the miss instruction if no buffer is given
     """
-    carriers = make_carrier_set(carrier_set, needle)
-    return f"miss {direction} {needle}{carriers} ;{comment}\n"
+    make_carrier_set(carrier_set, needle)
+    buffer = _buffer(instructions)
+    buffer.append(Opcode.Miss, direction=direction, needle_1=needle, carrier=carrier_set, comment=comment)
+    return _knitout(buffer, instructions)
 
 
 def knit(machine_state: Machine_State, direction: Pass_Direction, needle: Needle, carrier_set: Yarn_Carrier,
-         loop_id: int, comment: str = ""):
+         loop_id: int, comment: str = "", instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Pull a loop formed in direction D by the yarns in carriers CS through the loops on needle N,
     dropping them in the process.
@@ -57,15 +86,19 @@ def knit(machine_state: Machine_State, direction: Pass_Direction, needle: Needle
     :param carrier_set: the set of carriers being used
     :param loop_id: the new loop being created and put on the needle
     :param comment: additional details to document in the knitout
-    :return: the knit instruction
+    :param instructions: the buffer to record the instruction in
+    :return: the knit instruction if no buffer is given
     """
     machine_state.add_loop(loop_id, needle.position, needle.is_front, carrier_set)
-    carriers = make_carrier_set(carrier_set, needle)
-    return f"knit {direction} {needle}{carriers} ; knit loop {loop_id}, {comment}\n"
+    make_carrier_set(carrier_set, needle)
+    buffer = _buffer(instructions)
+    buffer.append(Opcode.Knit, machine_state.racking, direction, needle, carrier=carrier_set, loop_id=loop_id,
+                  comment=comment)
+    return _knitout(buffer, instructions)
 
 
 def tuck(machine_state: Machine_State, direction: Pass_Direction, needle: Needle, carrier_set: Yarn_Carrier,
-         loop_id: int, comment: str = "") -> str:
+         loop_id: int, comment: str = "", instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Add a loop formed in direction D by the yarns held by carriers in CS to those already on needle N.
     Tucking with an empty carrier set will pull on the stitches without doing anything else (an "a-miss").
@@ -75,15 +108,20 @@ def tuck(machine_state: Machine_State, direction: Pass_Direction, needle: Needle
     :param carrier_set: the set of carriers being used
     :param loop_id: the id of the new loop created
     :param comment: additional details to document in the knitout
-    :return: the tuck instruction
+    :param instructions: the buffer to record the instruction in
+    :return: the tuck instruction if no buffer is given
     """
     machine_state.add_loop(loop_id, needle.position, needle.is_front, carrier_set, drop_prior_loops=False)
-    carriers = make_carrier_set(carrier_set, needle)
-    return f"tuck {direction} {needle}{carriers} ; tuck loop {loop_id}, {comment}\n"
+    make_carrier_set(carrier_set, needle)
+    buffer = _buffer(instructions)
+    buffer.append(Opcode.Tuck, machine_state.racking, direction, needle, carrier=carrier_set, loop_id=loop_id,
+                  comment=comment)
+    return _knitout(buffer, instructions)
 
 
 def split(machine_state: Machine_State, direction: Pass_Direction, needle_1: Needle, needle_2,
-          carrier_set: Yarn_Carrier, loop_id: int, comment: str = "") -> str:
+          carrier_set: Yarn_Carrier, loop_id: int, comment: str = "",
+          instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Pull a loop formed in direction D by the yarns in carriers CS through the loops on needle N,
     transferring the old loops to opposite-bed needle N2 in the process.
@@ -95,20 +133,26 @@ def split(machine_state: Machine_State, direction: Pass_Direction, needle_1: Nee
     :param carrier_set: the set of carriers being used
     :param loop_id: the new loop being created
     :param comment: additional details to document in the knitout
-    :return: the split instruction
+    :param instructions: the buffer to record the instructions in
+    :return: the racking needed for the split and the split instruction if no buffer is given
     """
-    front_to_back, racking = _prepare_xfer(machine_state, needle_1, needle_2)
+    buffer = _buffer(instructions)
+    front_to_back = _prepare_xfer(machine_state, needle_1, needle_2, buffer)
     machine_state.add_loop(loop_id, needle_1.position, on_front=front_to_back, carrier_set=carrier_set)
-    carriers = make_carrier_set(carrier_set, needle_1)
-    return f"{racking}split {direction} {needle_1} {needle_2}{carriers} ; split loop {loop_id}, {comment}\n"
+    make_carrier_set(carrier_set, needle_1)
+    buffer.append(Opcode.Split, machine_state.racking, direction, needle_1, needle_2, carrier_set, loop_id, comment)
+    return _knitout(buffer, instructions)
 
 
-def _prepare_xfer(machine_state, needle_1, needle_2) -> Tuple[bool, str]:
+def _prepare_xfer(machine_state: Machine_State, needle_1: Needle, needle_2: Needle,
+                  instructions: Instruction_Buffer) -> bool:
     """
+    Racks the machine to align the needles, recording the rack if one is needed, then moves the loops
     :param machine_state: the current machine model to update
     :param needle_1: the first needle to xfer from
     :param needle_2: the second needle to xfer to
-    :return: True if the transfer is from front to back, the racking instruction needed to make the xfer
+    :param instructions: the buffer to record a rack in
+    :return: True if the transfer is from front to back
     """
     assert needle_1.is_front != needle_2.is_front, f"Cannot split to needles on same bed, {needle_1} to {needle_2}"
     if needle_1.is_front:
@@ -120,28 +164,31 @@ def _prepare_xfer(machine_state, needle_1, needle_2) -> Tuple[bool, str]:
         back_needle = needle_1
         front_to_back = False
     updated_racking, original_racking = machine_state.update_rack(front_needle.position, back_needle.position)
-    if original_racking:
-        racking = ""
-    else:
-        racking = rack(machine_state, updated_racking, comment=f"rack to xfer {needle_1} to {needle_2}")
+    if not original_racking:
+        rack(machine_state, updated_racking, comment=f"rack to xfer {needle_1} to {needle_2}", instructions=instructions)
     machine_state.xfer_loops(needle_1.position, needle_2.position, front_to_back)
-    return front_to_back, racking
+    return front_to_back
 
 
-def drop(machine_state: Machine_State, needle: Needle, comment: str = "") -> str:
+def drop(machine_state: Machine_State, needle: Needle, comment: str = "",
+         instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Synonym for "knit + N".
     Drops the loops on the needle
     :param machine_state: the current machine model to update
     :param needle: the needle to drop loops from
     :param comment: additional details to document in the knitout
-    :return: the drop instruction
+    :param instructions: the buffer to record the instruction in
+    :return: the drop instruction if no buffer is given
     """
     machine_state.drop_loop(needle.position, needle.is_front)
-    return f"drop {needle} ;{comment}\n"
+    buffer = _buffer(instructions)
+    buffer.append(Opcode.Drop, machine_state.racking, needle_1=needle, comment=comment)
+    return _knitout(buffer, instructions)
 
 
-def xfer(machine_state: Machine_State, needle_1: Needle, needle_2: Needle, comment: str = "") -> str:
+def xfer(machine_state: Machine_State, needle_1: Needle, needle_2: Needle, comment: str = "",
+         instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Synonym for "split + N N2".
     transfers loops from needle 1 to needle 2, leaving needle 1 empty
@@ -149,46 +196,61 @@ def xfer(machine_state: Machine_State, needle_1: Needle, needle_2: Needle, comme
     :param needle_1: the first needle to xfer from
     :param needle_2: the second needle to xfer to
     :param comment: additional details to document in the knitout
-    :return: the xfer instruction
+    :param instructions: the buffer to record the instructions in
+    :return: the racking needed for the xfer and the xfer instruction if no buffer is given
     """
-    _, racking = _prepare_xfer(machine_state, needle_1, needle_2)
-    return f"{racking}xfer {needle_1} {needle_2} ;{comment}\n"
+    buffer = _buffer(instructions)
+    _prepare_xfer(machine_state, needle_1, needle_2, buffer)
+    buffer.append(Opcode.Xfer, machine_state.racking, needle_1=needle_1, needle_2=needle_2, comment=comment)
+    return _knitout(buffer, instructions)
 
 
-def inhook(machine_state: Machine_State, carrier_set: Yarn_Carrier, comment: str = "") -> str:
+def inhook(machine_state: Machine_State, carrier_set: Yarn_Carrier, comment: str = "",
+           instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Indicate that the given carrier set should be brought into action using the yarn inserting hook when next used.
     The inserting hook will be parked just before the first stitch made with the carriers.
     :param machine_state: the current machine model to update
     :param carrier_set: the set of carriers to bring in
     :param comment: additional details to document in the knitout
-    :return: the inhook instruction
+    :param instructions: the buffer to record the instruction in
+    :return: the inhook instruction if no buffer is given
     """
     machine_state.in_hook(carrier_set)
-    return f"inhook {make_carrier_set(carrier_set)} ;{comment}\n"
+    buffer = _buffer(instructions)
+    buffer.append(Opcode.In_Hook, machine_state.racking, carrier=carrier_set, comment=comment)
+    return _knitout(buffer, instructions)
 
 
-def releasehook(machine_state: Machine_State, carrier_set: Yarn_Carrier, comment: str = "") -> str:
+def releasehook(machine_state: Machine_State, carrier_set: Yarn_Carrier, comment: str = "",
+                instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Release the yarns currently held in the yarn inserting hook.
     Must be proceeded by a call to inhook with the same carrier set and at least one knitting operation.
     :param machine_state: the current machine model to update
     :param carrier_set: the set of carriers to release
     :param comment: additional details to document in the knitout
-    :return: the releasehook instruction
+    :param instructions: the buffer to record the instruction in
+    :return: the releasehook instruction if no buffer is given
     """
     machine_state.release_hook(carrier_set)
-    return f"releasehook {make_carrier_set(carrier_set)} ;{comment}\n"
+    buffer = _buffer(instructions)
+    buffer.append(Opcode.Release_Hook, machine_state.racking, carrier=carrier_set, comment=comment)
+    return _knitout(buffer, instructions)
 
 
-def outhook(machine_state: Machine_State, carrier_set: Yarn_Carrier, comment: str = "") -> str:
+def outhook(machine_state: Machine_State, carrier_set: Yarn_Carrier, comment: str = "",
+            instructions: Optional[Instruction_Buffer] = None) -> Optional[str]:
     """
     Release the yarns currently held in the yarn inserting hook.
     Must be proceeded by a call to inhook with the same carrier set and at least one knitting operation.
     :param machine_state: the current machine model to update
     :param carrier_set: the set of carriers to bring out
     :param comment: additional details to document in the knitout
-    :return: the outhook instruction
+    :param instructions: the buffer to record the instruction in
+    :return: the outhook instruction if no buffer is given
     """
     machine_state.out_hook(carrier_set)
-    return f"outhook {make_carrier_set(carrier_set)} ;{comment}\n"
+    buffer = _buffer(instructions)
+    buffer.append(Opcode.Out_Hook, machine_state.racking, carrier=carrier_set, comment=comment)
+    return _knitout(buffer, instructions)
@@ -1,8 +1,10 @@
 """Sets of Operations that happen in groups of carriage passes"""
+from array import array
 from enum import Enum
 from typing import Optional, Dict, Set, List
 
 from knitting_machine.Machine_State import Needle
+from knitting_machine.instruction_buffer import Instruction_Buffer, NO_LOOP, NO_NEEDLE
 from knitting_machine.machine_operations import *
 
 
@@ -46,6 +48,30 @@ class Instruction_Parameters:
         self._carrier: Optional[Yarn_Carrier] = carrier
         self._comment: str = comment
 
+    @property
+    def needle_1(self) -> Needle:
+        return self._needle_1
+
+    @property
+    def needle_2(self) -> Optional[Needle]:
+        return self._needle_2
+
+    @property
+    def involved_loop(self) -> Optional[int]:
+        return self._involved_loop
+
+    @property
+    def racking(self) -> Optional[int]:
+        """
+        :return: the racking needed to transfer between the two needles: R = f-b, None if there is no second needle
+        """
+        if self._needle_2 is None:
+            return None
+        elif self._needle_1.is_front:
+            return self._needle_1.position - self._needle_2.position
+        else:
+            return self._needle_2.position - self._needle_1.position
+
     @property
     def carrier(self) -> Optional[Yarn_Carrier]:
         return self._carrier
@@ -62,35 +88,41 @@ class Instruction_Parameters:
     def comment(self, comment: str):
         self._comment = comment
 
-    def miss(self, direction: Pass_Direction):
+    def miss(self, direction: Pass_Direction, instructions: Optional[Instruction_Buffer] = None):
         assert self._needle_1 is not None, "No Miss needle provided."
         assert self.no_yarn, "No carrier to miss"
-        return miss(direction, self._needle_1, self._carrier, self.comment)
+        return miss(direction, self._needle_1, self._carrier, self.comment, instructions)
 
-    def knit(self, machine_state: Machine_State, direction: Pass_Direction):
+    def knit(self, machine_state: Machine_State, direction: Pass_Direction,
+             instructions: Optional[Instruction_Buffer] = None):
         assert self._needle_1 is not None, "No Needle to knit on"
         assert self._involved_loop is not None, "No loop_id provided"
-        return knit(machine_state, direction, self._needle_1, self._carrier, self._involved_loop, self.comment)
+        return knit(machine_state, direction, self._needle_1, self._carrier, self._involved_loop, self.comment,
+                    instructions)
 
-    def tuck(self, machine_state: Machine_State, direction: Pass_Direction):
+    def tuck(self, machine_state: Machine_State, direction: Pass_Direction,
+             instructions: Optional[Instruction_Buffer] = None):
         assert self._needle_1 is not None, "No Needle to tuck on"
         assert self._involved_loop is not None, "No loop_id provided"
-        return tuck(machine_state, direction, self._needle_1, self._carrier, self._involved_loop, self.comment)
+        return tuck(machine_state, direction, self._needle_1, self._carrier, self._involved_loop, self.comment,
+                    instructions)
 
-    def split(self, machine_state: Machine_State, direction: Pass_Direction):
+    def split(self, machine_state: Machine_State, direction: Pass_Direction,
+              instructions: Optional[Instruction_Buffer] = None):
         assert self._needle_1 is not None, "No Needle to split from"
         assert self._needle_2 is not None, "No Needle to split to"
         assert self._involved_loop is not None, "No loop_id provided"
-        return split(machine_state, direction, self._needle_1, self._needle_2, self._carrier, self._involved_loop, self.comment)
+        return split(machine_state, direction, self._needle_1, self._needle_2, self._carrier, self._involved_loop,
+                     self.comment, instructions)
 
-    def drop(self, machine_state: Machine_State):
+    def drop(self, machine_state: Machine_State, instructions: Optional[Instruction_Buffer] = None):
         assert self._needle_1 is not None, "No Needle to tuck on"
-        return drop(machine_state, self._needle_1, self.comment)
+        return drop(machine_state, self._needle_1, self.comment, instructions)
 
-    def xfer(self, machine_state: Machine_State):
+    def xfer(self, machine_state: Machine_State, instructions: Optional[Instruction_Buffer] = None):
         assert self._needle_1 is not None, "No Needle to split from"
         assert self._needle_2 is not None, "No Needle to split to"
-        return xfer(machine_state, self._needle_1, self._needle_2, self.comment)
+        return xfer(machine_state, self._needle_1, self._needle_2, self.comment, instructions)
 
     def __hash__(self):
         return hash(self._needle_1)
@@ -98,35 +130,36 @@ class Instruction_Parameters:
 
 class Carriage_Pass:
     """
-    A class that represents a set of instructions made in one pass of the carriage
-
+    A class that represents a set of instructions made in one pass of the carriage.
+    The instructions are stored as parallel arrays, one entry per instruction in the order they were added,
+     and are sorted into carriage order with one argsort over the needle positions
     ...
 
     Attributes
     ----------
     machine_state: Machine_State
         The machine that is updated while writing these instructions
-    needles_to_instruction_parameters: Dict[Needle, Tuple[Optional[int], Optional[Needle]]]
-        The needles each operation starts on mapped to either or both the loop_id created and the second needle involved
     """
 
     def __init__(self, instruction_type: Instruction_Type, direction: Optional[Pass_Direction],
-                 needles_to_instruction_parameters: Dict[Needle, Instruction_Parameters],
+                 needles_to_instruction_parameters: Optional[Dict[Needle, Instruction_Parameters]],
                  machine_state: Machine_State):
         """
         :param instruction_type: The type of instruction to be done in this pass
         :param direction: the direction the carriage will move for this pass
         :param needles_to_instruction_parameters:
-            The starting needles mapped to the loop_id created and a second needle to xfer
+            The starting needles mapped to the loop_id created and a second needle to xfer.
+            None to add the instructions with add_instruction
         :param machine_state: The machine model to update as instructions are written
         """
         self.machine_state: Machine_State = machine_state
-        self._carrier_set: Set[Yarn_Carrier] = set()
-        self.needles_to_instruction_parameters: \
-            Dict[Needle, Instruction_Parameters] = needles_to_instruction_parameters
-        for params in self.needles_to_instruction_parameters.values():
-            if not params.no_yarn:
-                self._carrier_set.add(params.carrier)
+        self._is_fronts: array = array("b")  # 1 if the first needle of each instruction is on the front bed
+        self._positions: array = array("i")  # the position of the first needle of each instruction
+        self._loop_ids: array = array("q")  # the loop created by each instruction, NO_LOOP if none is given
+        self._needles_2: array = array("i")  # the needle id of the second needle of each instruction, or NO_NEEDLE
+        self._carrier_indices: array = array("b")  # the index of each instruction's carrier in _carriers, or -1
+        self._carriers: List[Yarn_Carrier] = []  # the carriers used by the instructions
+        self._needles_to_instruction_parameters: Optional[Dict[Needle, Instruction_Parameters]] = None
         self._direction = direction
         self._instruction_type: Instruction_Type = instruction_type
         if self.direction is None:
@@ -136,6 +169,98 @@ class Carriage_Pass:
                 self._direction = self.machine_state.last_carriage_direction.opposite()  # switch from last pass
         elif self.instruction_type.direction_must_be_Left_to_Right():
             assert self.direction.value == Pass_Direction.Left_to_Right.value, "Can only Drop on + (left to right) pass"
+        if needles_to_instruction_parameters is not None:
+            for needle, params in needles_to_instruction_parameters.items():
+                self.add_instruction(needle, params.involved_loop, params.needle_2, params.carrier)
+
+    def add_instruction(self, needle_1: Needle, involved_loop: Optional[int] = None, needle_2: Optional[Needle] = None,
+                        carrier: Optional[Yarn_Carrier] = None):
+        """
+        Adds an instruction to the pass
+        :param needle_1: the first (or only) needle the instruction uses
+        :param involved_loop: the loop created by the instruction
+        :param needle_2: the needle that a split or transfer moves loops to
+        :param carrier: the carriers used by the instruction
+        """
+        self._is_fronts.append(needle_1.is_front)
+        self._positions.append(needle_1.position)
+        self._loop_ids.append(NO_LOOP if involved_loop is None else involved_loop)
+        self._needles_2.append(NO_NEEDLE if needle_2 is None else needle_2.index)
+        carrier_index = -1
+        if carrier is not None:
+            carrier_index = next((index for index, used in enumerate(self._carriers) if used is carrier), None)
+            if carrier_index is None:  # carriers are moved as they are used, so each carrier object is kept
+                carrier_index = len(self._carriers)
+                self._carriers.append(carrier)
+        self._carrier_indices.append(carrier_index)
+        self._needles_to_instruction_parameters = None
+
+    def on_machine_state(self, machine_state: Machine_State):
+        """
+        :param machine_state: another machine model
+        :return: a pass with the same direction and instructions that updates the given machine model
+        """
+        carriage_pass = Carriage_Pass(self.instruction_type, self.direction, None, machine_state)
+        carriage_pass._is_fronts = self._is_fronts
+        carriage_pass._positions = self._positions
+        carriage_pass._loop_ids = self._loop_ids
+        carriage_pass._needles_2 = self._needles_2
+        carriage_pass._carrier_indices = self._carrier_indices
+        carriage_pass._carriers = self._carriers
+        return carriage_pass
+
+    def __len__(self):
+        return len(self._positions)
+
+    def needle_1(self, index: int) -> Needle:
+        """
+        :param index: the index of an instruction in the order they were added
+        :return: the first (or only) needle the instruction uses
+        """
+        return self.machine_state.needles.needle(is_front=self._is_fronts[index] == 1, position=self._positions[index])
+
+    def needle_2(self, index: int) -> Optional[Needle]:
+        """
+        :param index: the index of an instruction in the order they were added
+        :return: the needle that the instruction moves loops to, None if it has no second needle
+        """
+        second_needle = self._needles_2[index]
+        if second_needle == NO_NEEDLE:
+            return None
+        return self.machine_state.needles[second_needle]
+
+    def involved_loop(self, index: int) -> Optional[int]:
+        """
+        :param index: the index of an instruction in the order they were added
+        :return: the loop created by the instruction, None if it was not given one
+        """
+        loop_id = self._loop_ids[index]
+        if loop_id == NO_LOOP:
+            return None
+        return loop_id
+
+    def carrier(self, index: int) -> Optional[Yarn_Carrier]:
+        """
+        :param index: the index of an instruction in the order they were added
+        :return: the carriers used by the instruction
+        """
+        carrier_index = self._carrier_indices[index]
+        if carrier_index == -1:
+            return None
+        return self._carriers[carrier_index]
+
+    @property
+    def needles_to_instruction_parameters(self) -> Dict[Needle, Instruction_Parameters]:
+        """
+        :return: The needles each operation starts on mapped to the parameters of the operation
+        """
+        if self._needles_to_instruction_parameters is None:
+            self._needles_to_instruction_parameters = {}
+            for index in range(0, len(self)):
+                needle = self.needle_1(index)
+                self._needles_to_instruction_parameters[needle] = \
+                    Instruction_Parameters(needle, self.involved_loop(index), self.needle_2(index), self.carrier(index))
+        return self._needles_to_instruction_parameters
 
     @property
     def instruction_type(self) -> Instruction_Type:
@@ -156,64 +281,112 @@ class Carriage_Pass:
         """
         :return: the set of carriers involved in these instructions
         """
-        return self._carrier_set
+        return set(self._carriers)
 
-    def _sorted_needles(self) -> List[Needle]:
-        needles = [*self.needles_to_instruction_parameters]
-        sorted_left_to_right = sorted(needles)
+    def sorted_indices(self) -> List[int]:
+        """
+        :return: the indices of the instructions in the order the carriage makes them.
+         Instructions at the same position keep the order they were added in
+        """
+        sorted_left_to_right = sorted(range(0, len(self)), key=self._positions.__getitem__)
         if self.direction is Pass_Direction.Right_to_Left:
-            return [*reversed(sorted_left_to_right)]
-        else:
-            return sorted_left_to_right
-
-    def _write_instruction(self, needle: Needle) -> str:
-        """
-        :param needle: the first (or only) needle that an instruction uses
-        :return: The string for the line of code executing the instruction
-        """
-        if self.instruction_type.value == Instruction_Type.Knit.value:
-            return self.needles_to_instruction_parameters[needle].knit(self.machine_state, self.direction)
-        elif self.instruction_type.value == Instruction_Type.Tuck.value:
-            return self.needles_to_instruction_parameters[needle].tuck(self.machine_state, self.direction)
-        elif self.instruction_type.value == Instruction_Type.Split.value:
-            return self.needles_to_instruction_parameters[needle].split(self.machine_state, self.direction)
-        elif self.instruction_type.value == Instruction_Type.Drop.value:
-            return self.needles_to_instruction_parameters[needle].drop(self.machine_state)
-        elif self.instruction_type.value == Instruction_Type.Xfer.value:
-            return self.needles_to_instruction_parameters[needle].xfer(self.machine_state)
-        elif self.instruction_type.value == Instruction_Type.Miss.value:
-            return self.needles_to_instruction_parameters[needle].miss(self.direction)
+            sorted_indices = [*reversed(sorted_left_to_right)]
         else:
-            assert False, "The instruction was not recognized"
+            sorted_indices = sorted_left_to_right
+        if self.instruction_type.value == Instruction_Type.Xfer.value:
+            return self._schedule_by_racking(sorted_indices)
+        return sorted_indices
 
-    def write_instructions(self, first_comment="", comment="") -> List[str]:
+    def _racking(self, index: int) -> int:
+        """
+        :param index: the index of a transfer
+        :return: the racking needed to make the transfer: R = f-b
         """
+        if self._is_fronts[index] == 1:
+            return self._positions[index] - self._needles_2[index] // 2
+        return self._needles_2[index] // 2 - self._positions[index]
+
+    def _schedule_by_racking(self, sorted_indices: List[int]) -> List[int]:
+        """
+        Orders transfers so that each racking is used once, visiting the rackings with the least racking travel
+        :param sorted_indices: the indices of the transfers in sorted order
+        :return: the indices grouped by racking, in sorted order within each racking.
+         The sorted order is kept if a needle is used at more than one racking
+        """
+        indices_by_racking: Dict[int, List[int]] = {}
+        for index in sorted_indices:
+            racking = self._racking(index)
+            if racking not in indices_by_racking:
+                indices_by_racking[racking] = []
+            indices_by_racking[racking].append(index)
+        if len(indices_by_racking) <= 1:
+            return sorted_indices
+        needle_rackings: Dict[int, int] = {}  # needle ids to the racking that uses them
+        for racking, indices in indices_by_racking.items():
+            for index in indices:
+                for used_needle in [self._positions[index] * 2 + 1 - self._is_fronts[index], self._needles_2[index]]:
+                    if needle_rackings.setdefault(used_needle, racking) != racking:
+                        return sorted_indices  # reordering could change which loops are transferred
+        rackings = sorted(indices_by_racking)
+        current_racking = self.machine_state.racking
+        if abs(current_racking - rackings[-1]) < abs(current_racking - rackings[0]):  # sweep from the nearer end
+            rackings.reverse()
+        return [index for racking in rackings for index in indices_by_racking[racking]]
+
+    def execute(self, instructions: Instruction_Buffer, first_comment="", comment=""):
+        """
+        Executes the pass on the machine state, recording the executed instructions without writing knitout
+        :param instructions: the buffer to record the executed instructions in
         :param first_comment: A comment to add to the first instruction in the pass
         :param comment: A comment to add to every instruction in the pass
-        :return: A list of knitout instructions that executes the instruction on each needle
         """
         # bring in yarns that are not yet in operation
-        instructions = []
+        start = len(instructions)
         in_hooked_carriers = set()
         for carrier in self.carrier_set:
             for sub_carrier in carrier.not_in_operation(self.machine_state):
                 if sub_carrier not in self.machine_state.yarns_in_operation:  # bring new yarns needed in
+                    for hooked_carrier in [*self.machine_state.in_hooks]:  # free the hook used by earlier passes
+                        if hooked_carrier not in in_hooked_carriers:
+                            releasehook(self.machine_state, hooked_carrier, instructions=instructions)
                     in_hooked_carriers.add(sub_carrier)
-                    instructions.append(inhook(self.machine_state, sub_carrier))
-
-        starting_needles = self._sorted_needles()
-        for needle in starting_needles:
-            if len(instructions) == 0:
-                c = first_comment
+                    inhook(self.machine_state, sub_carrier, instructions=instructions)
+
+        machine_state, direction = self.machine_state, self.direction
+        makes_loops = self.instruction_type.value in [Instruction_Type.Knit.value, Instruction_Type.Tuck.value,
+                                                      Instruction_Type.Split.value]
+        for index in self.sorted_indices():
+            c = first_comment if len(instructions) == start else comment
+            needle = self.needle_1(index)
+            assert self._loop_ids[index] != NO_LOOP or not makes_loops, f"No loop_id provided for {needle}"
+            if self.instruction_type.value == Instruction_Type.Knit.value:
+                knit(machine_state, direction, needle, self.carrier(index), self._loop_ids[index], c, instructions)
+            elif self.instruction_type.value == Instruction_Type.Tuck.value:
+                tuck(machine_state, direction, needle, self.carrier(index), self._loop_ids[index], c, instructions)
+            elif self.instruction_type.value == Instruction_Type.Split.value:
+                split(machine_state, direction, needle, self.needle_2(index), self.carrier(index),
+                      self._loop_ids[index], c, instructions)
+            elif self.instruction_type.value == Instruction_Type.Drop.value:
+                drop(machine_state, needle, c, instructions)
+            elif self.instruction_type.value == Instruction_Type.Xfer.value:
+                xfer(machine_state, needle, self.needle_2(index), c, instructions)
+            elif self.instruction_type.value == Instruction_Type.Miss.value:
+                miss(direction, needle, self.carrier(index), c, instructions)
             else:
-                c = comment
-            self.needles_to_instruction_parameters[needle].comment = c
-            instruction = self._write_instruction(needle)
-            instructions.append(instruction)
+                assert False, "The instruction was not recognized"
         self.machine_state.last_carriage_direction = self.direction
 
         # release hooks on second pass with inhooks
         for carrier in [*self.machine_state.in_hooks]:
             if carrier not in in_hooked_carriers:  # don't release hook on first pass with in hook
-                instructions.append(releasehook(self.machine_state, carrier))
-        return instructions
+                releasehook(self.machine_state, carrier, instructions=instructions)
+
+    def write_instructions(self, first_comment="", comment="") -> List[str]:
+        """
+        :param first_comment: A comment to add to the first instruction in the pass
+        :param comment: A comment to add to every instruction in the pass
+        :return: A list of knitout instructions that executes the instruction on each needle
+        """
+        instructions = Instruction_Buffer(self.machine_state.needles)
+        self.execute(instructions, first_comment, comment)
+        return instructions.render_all()
@@ -0,0 +1,163 @@
+"""Reorders runs of transfer passes to use fewer passes and rack instructions"""
+from typing import Dict, List, Set, Tuple
+
+from knitting_machine.Machine_State import Machine_State, Needle
+from knitting_machine.operation_sets import Carriage_Pass, Instruction_Type
+
+
+def transfer_racking(needle_1: Needle, needle_2: Needle) -> int:
+    """
+    :param needle_1: the needle transferred from
+    :param needle_2: the needle transferred to
+    :return: the racking needed to transfer between the needles: R = f-b
+    """
+    if needle_1.is_front:
+        return needle_1.position - needle_2.position
+    return needle_2.position - needle_1.position
+
+
+def group_transfers_by_racking(transfers: List[Tuple[Needle, Needle]],
+                               racking: float) -> List[Tuple[int, List[Tuple[Needle, Needle]]]]:
+    """
+    Groups transfers into as few single-racking passes as it can without reordering transfers that share a needle
+    :param transfers: the transfers in planned order
+    :param racking: the racking of the machine before the first transfer
+    :return: the racking and transfers of each pass. Transfers in a pass do not share needles
+    """
+    dependents: List[List[int]] = [[] for _ in transfers]
+    dependency_counts: List[int] = [0 for _ in transfers]
+    last_use: Dict[Needle, int] = {}  # needles to the index of the last transfer that used them
+    for index, transfer in enumerate(transfers):
+        for needle in {*transfer}:
+            if needle in last_use:
+                dependents[last_use[needle]].append(index)
+                dependency_counts[index] += 1
+            last_use[needle] = index
+    ready: Dict[int, List[int]] = {}  # rackings to the transfers at that racking that can be made
+    for index, transfer in enumerate(transfers):
+        if dependency_counts[index] == 0:
+            ready.setdefault(transfer_racking(*transfer), []).append(index)
+    groups = []
+    while len(ready) > 0:
+        if racking not in ready:  # rack to the racking with the most transfers, the nearest if tied
+            racking = max(ready, key=lambda next_racking: (len(ready[next_racking]), -abs(next_racking - racking)))
+        group = sorted(ready.pop(racking))
+        groups.append((racking, [transfers[index] for index in group]))
+        for index in group:
+            for dependent in dependents[index]:
+                dependency_counts[dependent] -= 1
+                if dependency_counts[dependent] == 0:
+                    ready.setdefault(transfer_racking(*transfers[dependent]), []).append(dependent)
+    return groups
+
+
+class Xfer_Pass_Optimizer:
+    """
+    Optimizes runs of consecutive Xfer carriage passes and counts the passes and rack instructions it saves
+    ...
+    A transfer must stay after the earlier transfers that use either of its needles, all other transfers may move.
+    Transfers are grouped into passes by racking, staying at the current racking while transfers at it are ready.
+    A transfer to an empty needle followed by the reverse transfer, with nothing using either needle in between,
+     leaves the loops where they started and both transfers are removed.
+
+    Attributes
+    ----------
+    passes_before: int
+        the number of transfer passes given to the optimizer
+    passes_after: int
+        the number of transfer passes made by the optimizer
+    racks_before: int
+        the number of rack instructions the given transfer passes needed
+    racks_after: int
+        the number of rack instructions the optimized transfer passes need
+    removed_round_trips: int
+        the number of pairs of transfers removed because they returned loops to where they started
+    """
+
+    def __init__(self):
+        self.passes_before: int = 0
+        self.passes_after: int = 0
+        self.racks_before: int = 0
+        self.racks_after: int = 0
+        self.removed_round_trips: int = 0
+
+    def optimize(self, xfer_passes: List[Carriage_Pass], machine_state: Machine_State) -> List[Carriage_Pass]:
+        """
+        :param xfer_passes: consecutive Xfer carriage passes in the order they were planned
+        :param machine_state: the machine state the passes will be written to, in the state before the first pass
+        :return: Xfer carriage passes on machine_state with the same result as the given passes
+        """
+        transfers: List[Tuple[Needle, Needle]] = []
+        for xfer_pass in xfer_passes:
+            assert xfer_pass.instruction_type is Instruction_Type.Xfer, f"Cannot optimize {xfer_pass.instruction_type} passes"
+            for index in xfer_pass.sorted_indices():
+                transfers.append((xfer_pass.needle_1(index), xfer_pass.needle_2(index)))
+        self.passes_before += len(xfer_passes)
+        self.racks_before += self._count_racks([transfer_racking(*transfer) for transfer in transfers],
+                                               machine_state.racking)
+        transfers = self._remove_round_trips(transfers, machine_state)
+        groups = group_transfers_by_racking(transfers, machine_state.racking)
+        self.passes_after += len(groups)
+        self.racks_after += self._count_racks([racking for racking, _ in groups], machine_state.racking)
+        optimized_passes = []
+        for _, group in groups:
+            optimized_pass = Carriage_Pass(Instruction_Type.Xfer, None, None, machine_state)
+            for needle_1, needle_2 in group:
+                optimized_pass.add_instruction(needle_1, needle_2=needle_2)
+            optimized_passes.append(optimized_pass)
+        return optimized_passes
+
+    @staticmethod
+    def _count_racks(rackings: List[int], racking: float) -> int:
+        """
+        :param rackings: the racking of each transfer or pass in order
+        :param racking: the racking of the machine before the first transfer
+        :return: the number of rack instructions needed to make the transfers in order
+        """
+        racks = 0
+        for next_racking in rackings:
+            if next_racking != racking:
+                racks += 1
+                racking = next_racking
+        return racks
+
+    def _remove_round_trips(self, transfers: List[Tuple[Needle, Needle]],
+                            machine_state: Machine_State) -> List[Tuple[Needle, Needle]]:
+        """
+        :param transfers: the transfers in planned order
+        :param machine_state: the machine state before the first transfer
+        :return: the transfers without pairs that return loops to the needle they started on
+        """
+        touches: Dict[Needle, List[int]] = {}  # needles to the indices of the transfers using them
+        for index, (needle_1, needle_2) in enumerate(transfers):
+            touches.setdefault(needle_1, []).append(index)
+            touches.setdefault(needle_2, []).append(index)
+        loop_counts: Dict[Needle, int] = {needle: len(machine_state[needle]) for needle in touches}
+        next_touch: Dict[Needle, int] = {needle: 0 for needle in touches}  # position in touches after the last use
+        removed: Set[int] = set()
+        for index, (needle_1, needle_2) in enumerate(transfers):
+            next_touch[needle_1] += 1
+            next_touch[needle_2] += 1
+            if index in removed:
+                continue
+            if loop_counts[needle_2] == 0:
+                later_uses = [touches[needle][next_touch[needle]] for needle in [needle_1, needle_2]
+                              if next_touch[needle] < len(touches[needle])]
+                if len(later_uses) > 0:
+                    next_index = min(later_uses)
+                    next_needle_1, next_needle_2 = transfers[next_index]
+                    if next_needle_1 == needle_2 and next_needle_2 == needle_1:
+                        removed.add(index)
+                        removed.add(next_index)
+                        self.removed_round_trips += 1
+                        continue
+            loop_counts[needle_2] += loop_counts[needle_1]
+            loop_counts[needle_1] = 0
+        return [transfer for index, transfer in enumerate(transfers) if index not in removed]
+
+    def __str__(self):
+        return f"xfer passes: {self.passes_before} -> {self.passes_after}, " \
+               f"racks: {self.racks_before} -> {self.racks_after}, round trips removed: {self.removed_round_trips}"
+
+    def __repr__(self):
+        return str(self)
@@ -78,4 +78,13 @@ def test_cables():
 def test_closures():
     pattern = r"""n=1, from (n+1) to (n+3), from 5 to 7 rows k n, p (n=n+2)."""
     results = parser.interpret(pattern)
-    print(results)
\ No newline at end of file
+    print(results)
+
+def test_shared_grammar():
+    first_interpreter = KnitSpeak_Interpreter()
+    second_interpreter = KnitSpeak_Interpreter()
+    assert first_interpreter.parser.grammar is second_interpreter.parser.grammar
+    assert first_interpreter.parser.table is second_interpreter.parser.table
+    assert first_interpreter.parser.symbolTable is not second_interpreter.parser.symbolTable
+    pattern = r"""1st row k, p. 2nd row p, k."""
+    assert str(first_interpreter.interpret(pattern)) == str(parser.interpret(pattern))
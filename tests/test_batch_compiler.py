@@ -0,0 +1,29 @@
+"""Tests of compiling batches of knitspeak files across a process pool"""
+import os
+
+from knitspeak_compiler.batch_compiler import Batch_Job, compile_batch
+
+_EXAMPLES = os.path.join(os.path.dirname(os.path.dirname(__file__)), "example_knitspeak")
+
+
+def _jobs():
+    jobs = [Batch_Job(os.path.join(_EXAMPLES, f"{name}.ks"), 12, 6, f"batch_{name}.k")
+            for name in ["stst", "rib1", "seed"]]
+    jobs.append(Batch_Job(os.path.join(_EXAMPLES, "cables.ks"), 12, 6, "batch_cables.k"))  # uses an undefined cable
+    return jobs
+
+
+def test_compile_batch():
+    for processes in [1, 2]:
+        for job in _jobs():
+            if os.path.exists(job.output_path):
+                os.remove(job.output_path)
+        results = {result.job.output_path: result for result in compile_batch(_jobs(), processes=processes)}
+        assert len(results) == 4
+        assert not results["batch_cables.k"].succeeded and "CL2|1" in results["batch_cables.k"].error
+        assert not os.path.exists("batch_cables.k")
+        for name in ["stst", "rib1", "seed"]:
+            result = results[f"batch_{name}.k"]
+            assert result.succeeded and result.compile_time > 0 and result.generate_time > 0
+            with open(result.job.output_path) as file:
+                assert file.readline().startswith(";!knitout")
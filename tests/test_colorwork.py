@@ -1,3 +1,4 @@
+from knitting_machine.Machine_Profile import Machine_Profile
 from knitting_machine.Machine_State import Machine_State, Yarn_Carrier, Needle, Pass_Direction
 from knitting_machine.machine_operations import outhook, miss, rack
 from knitting_machine.operation_sets import Carriage_Pass, Instruction_Type, Instruction_Parameters
@@ -14,15 +15,11 @@ def _write_instructions(filename: str, instructions):
         file.writelines(instructions)
 
 
-def _cast_on(tuck_carrier, close_carrier, start_needle=0, end_needle=20, double=False):
-    machine_state = Machine_State()
+def _cast_on(tuck_carrier, close_carrier, start_needle=0, end_needle=20, double=False,
+             machine_profile: Machine_Profile = Machine_Profile()):
+    machine_state = Machine_State(machine_profile=machine_profile)
     carriage_passes = []
-    instructions = [";!knitout-2\n",
-                    ";;Machine: SWG091N2\n",
-                    ";;Gauge: 5\n",
-                    ";;Width: 250\n",
-                    ";;Carriers: 1 2 3 4 5 6 7 8 9 10\n",
-                    ";;Position: Center\n"]
+    instructions = machine_profile.header()
     tuck_lr = {}
     for n in range(end_needle - 1, start_needle, -2):
         needle = Needle(True, n)
@@ -59,15 +56,11 @@ def _cast_on(tuck_carrier, close_carrier, start_needle=0, end_needle=20, double=
     return carriage_passes, instructions, machine_state
 
 
-def _cast_on_round(tuck_carrier, close_carrier, start_needle=0, end_needle=20):
-    machine_state = Machine_State()
+def _cast_on_round(tuck_carrier, close_carrier, start_needle=0, end_needle=20,
+                   machine_profile: Machine_Profile = Machine_Profile()):
+    machine_state = Machine_State(machine_profile=machine_profile)
     carriage_passes = []
-    instructions = [";!knitout-2\n",
-                    ";;Machine: SWG091N2\n",
-                    ";;Gauge: 5\n",
-                    ";;Width: 250\n",
-                    ";;Carriers: 1 2 3 4 5 6 7 8 9 10\n",
-                    ";;Position: Center\n"]
+    instructions = machine_profile.header()
     # front RtL
     tuck_rl = {}
     for n in range(end_needle - 1, start_needle, -2):
@@ -0,0 +1,133 @@
+"""Tests that the compact knit graph backend compiles and generates the same knitout as the networkx backend"""
+from knit_graphs.Compact_Knit_Graph import Compact_Knit_Graph
+from knit_graphs.Knit_Graph import Knit_Graph, Pull_Direction
+from knit_graphs.Yarn import Yarn
+from knitspeak_compiler.knitspeak_compiler import Knitspeak_Compiler
+from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+
+
+def _compare_graphs(pattern: str, width: int, rows: int):
+    knit_graph = Knitspeak_Compiler().compile(width, rows, pattern)
+    compact_graph = Knitspeak_Compiler(Compact_Knit_Graph).compile(width, rows, pattern)
+    assert [*knit_graph.graph.nodes] == [*compact_graph.graph.nodes]
+    for loop_id in knit_graph.graph.nodes:
+        assert [*knit_graph.graph.predecessors(loop_id)] == [*compact_graph.graph.predecessors(loop_id)]
+        assert knit_graph[loop_id].parent_loop_ids == compact_graph[loop_id].parent_loop_ids
+        for parent_id in knit_graph.graph.predecessors(loop_id):
+            assert knit_graph.graph[parent_id][loop_id] == compact_graph.graph[parent_id][loop_id]
+    assert knit_graph.get_courses() == compact_graph.get_courses()
+
+
+def _compare_knitout(pattern: str, width: int, rows: int, name: str):
+    outputs = []
+    for knit_graph_type in [Knit_Graph, Compact_Knit_Graph]:
+        compiler = Knitspeak_Compiler(knit_graph_type)
+        knit_graph = compiler.compile(width, rows, pattern)
+        generator = Knitout_Generator(knit_graph)
+        filename = f"{name}_{knit_graph_type.__name__}.k"
+        generator.write_instructions(filename)
+        with open(filename, "r") as file:
+            outputs.append(file.read())
+    assert outputs[0] == outputs[1], f"{name} knitout differs between backends"
+
+
+def test_stst():
+    _compare_knitout("all rs rows k. all ws rows p.", 6, 6, "compact_stst")
+
+
+def test_seed():
+    _compare_knitout("all rs rows k, p. flipped all ws rows p,k.", 6, 6, "compact_seed")
+
+
+def test_cable():
+    pattern = r"""
+        1st row k, lc2|2, k, rc2|2, [k] to end.
+        all ws rows p.
+        3rd row k 2, lc2|1, k, rc1|2, [k] to end.
+        5th row k 3, lc1|1, k, rc1|1, [k] to end.
+    """
+    _compare_graphs(pattern, 11, 6)
+
+
+def test_lace():
+    pattern = r"""
+        all rs rows k, k2tog, yo 2, sk2po, yo 2, skpo, k.
+        all ws rows p 2, k, p 3, k, p 2.
+    """
+    _compare_graphs(pattern, 9, 6)
+
+
+def test_stack_positions():
+    knit_graph = Compact_Knit_Graph()
+    yarn = Yarn("yarn", knit_graph)
+    knit_graph.add_yarn(yarn)
+    for _ in range(0, 5):
+        loop_id, loop = yarn.add_loop_to_end()
+        knit_graph.add_loop(loop)
+    knit_graph.connect_loops(0, 4)
+    knit_graph.connect_loops(1, 3, pull_direction=Pull_Direction.FtB)
+    knit_graph.connect_loops(2, 4, stack_position=0, parent_offset=-1)  # moves the parent block of loop 4
+    assert knit_graph.parent_ids(4) == [2, 0]
+    assert [*knit_graph[4].parent_loop_ids] == [2, 0]
+    assert [*knit_graph.graph.predecessors(4)] == [0, 2]
+    assert knit_graph.graph[2][4]["parent_offset"] == -1
+    assert knit_graph.graph[1][3]["pull_direction"] is Pull_Direction.FtB
+    assert not knit_graph.graph.has_edge(1, 4)
+    assert knit_graph.graph.number_of_edges() == len([*knit_graph.graph.edges]) == 3
+
+
+def test_add_course():
+    graphs = []
+    for knit_graph_type in [Knit_Graph, Compact_Knit_Graph]:
+        knit_graph = knit_graph_type()
+        knit_graph.add_yarn(Yarn("yarn", knit_graph))
+        first_course = knit_graph.add_course("yarn", [[] for _ in range(0, 4)])
+        second_course = knit_graph.add_course("yarn", [[3], [], [2, 1], [0]],
+                                              [Pull_Direction.BtF, Pull_Direction.BtF, Pull_Direction.FtB, Pull_Direction.BtF],
+                                              depths=[0, 0, 1, 0], parent_offsets=[[0], [], [0, -1], [0]])
+        assert first_course == [0, 1, 2, 3] and second_course == [4, 5, 6, 7]
+        assert knit_graph.course_count == 2
+        graphs.append(knit_graph)
+    knit_graph, compact_graph = graphs
+    assert sorted(knit_graph.graph.edges) == sorted(compact_graph.graph.edges)
+    for loop_id in knit_graph.graph.nodes:
+        assert knit_graph[loop_id].parent_loop_ids == compact_graph[loop_id].parent_loop_ids
+        for parent_id in knit_graph.graph.predecessors(loop_id):
+            assert knit_graph.graph[parent_id][loop_id] == compact_graph.graph[parent_id][loop_id]
+    assert knit_graph.get_courses() == compact_graph.get_courses()
+    assert compact_graph.graph[1][6] == {"pull_direction": Pull_Direction.FtB, "depth": 1, "parent_offset": -1}
+
+
+def test_add_course_validation():
+    for knit_graph_type in [Knit_Graph, Compact_Knit_Graph]:
+        knit_graph = knit_graph_type()
+        knit_graph.add_yarn(Yarn("yarn", knit_graph))
+        knit_graph.add_course("yarn", [[], []])
+        for parent_ids in [[[0], [0]], [[0], [5]]]:  # a reused parent and a missing parent
+            try:
+                knit_graph.add_course("yarn", parent_ids)
+                assert False, f"{parent_ids} should not be accepted"
+            except AssertionError as error:
+                assert "parent loop" in str(error)
+        assert knit_graph.last_loop_id == 1 and len(knit_graph.yarns["yarn"]) == 2
+
+
+def test_successors():
+    graphs = []
+    for knit_graph_type in [Knit_Graph, Compact_Knit_Graph]:
+        knit_graph = knit_graph_type()
+        knit_graph.add_yarn(Yarn("yarn", knit_graph))
+        knit_graph.add_course("yarn", [[] for _ in range(0, 4)])
+        knit_graph.add_course("yarn", [[3], [2, 1], [0]])
+        assert [*knit_graph.graph.successors(1)] == [5]  # the compact graph indexes children here
+        knit_graph.connect_loops(3, 6)  # moves the child block of loop 3
+        knit_graph.remove_loop(5)
+        knit_graph.add_course("yarn", [[6], [4]])
+        knit_graph.remove_loop(0)
+        graphs.append(knit_graph)
+    knit_graph, compact_graph = graphs
+    assert [*knit_graph.graph.nodes] == [*compact_graph.graph.nodes]
+    for loop_id in knit_graph.graph.nodes:
+        assert [*knit_graph.graph.successors(loop_id)] == [*compact_graph.graph.successors(loop_id)]
+        assert knit_graph[loop_id].parent_loop_ids == compact_graph[loop_id].parent_loop_ids
+    assert [*compact_graph.graph.successors(3)] == [4, 6] and [*compact_graph.graph.successors(2)] == []
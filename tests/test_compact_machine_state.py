@@ -0,0 +1,31 @@
+"""Tests of the array-backed machine state"""
+from debugging_tools.simple_knitgraphs import *
+from knitting_machine.Compact_Machine_State import Compact_Machine_State
+from knitting_machine.Machine_State import Needle
+from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+
+
+def test_generated_knitout():
+    for knit_graph in [stockinette(20, 20), rib(20, 10, 2), seed(20, 10), both_twists(height=3),
+                       short_rows(20, buffer_height=5)]:
+        generator = Knitout_Generator(knit_graph)
+        generator.generate_instructions()
+        compact_generator = Knitout_Generator(knit_graph, machine_state_type=Compact_Machine_State)
+        compact_generator.generate_instructions()
+        assert compact_generator.instructions == generator.instructions
+
+
+def test_needle_range_operations():
+    machine_state = Compact_Machine_State(needle_count=20)
+    machine_state.knit_needles(2, range(0, 6), on_front=True)
+    assert machine_state[Needle(True, 2)] == [0] and machine_state.get_needle_of_loop(5).position == 7
+    machine_state.xfer_needles([2, 3], racking=1, front_to_back=True)
+    assert machine_state.racking == 1 and machine_state[Needle(True, 2)] == []
+    assert machine_state[Needle(False, 1)] == [0] and machine_state[Needle(False, 2)] == [1]
+    assert not machine_state.get_needle_of_loop(0).is_front
+    machine_state.xfer_needles([2], racking=2, front_to_back=False)  # stacks loop 1 on loop 2
+    assert machine_state[Needle(True, 4)] == [2, 1] and machine_state.get_needle_of_loop(1).position == 4
+    machine_state.knit_needles(3, [6, 7], on_front=True)
+    assert machine_state[Needle(True, 4)] == [7]
+    assert machine_state.get_needle_of_loop(1) is None and machine_state.get_needle_of_loop(2) is None
+    assert machine_state.front_bed.loops_to_needle == {3: 5, 4: 6, 5: 7, 6: 3, 7: 4}
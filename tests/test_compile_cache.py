@@ -0,0 +1,65 @@
+"""Tests of the on-disk cache of compiled knit graphs"""
+import os
+import shutil
+
+from knit_graphs.Compact_Knit_Graph import Compact_Knit_Graph
+from knitspeak_compiler.compile_cache import Compile_Cache
+from knitspeak_compiler.knitspeak_compiler import Knitspeak_Compiler
+from knitting_machine.Machine_State import Yarn_Carrier
+
+_RIB = "all rs rows k, p. all ws rows k, p."
+
+
+def _empty_cache(directory: str, max_bytes: int = 512 * 1024 * 1024) -> Compile_Cache:
+    shutil.rmtree(directory, ignore_errors=True)
+    return Compile_Cache(directory, max_bytes)
+
+
+def test_hits_and_misses():
+    cache = _empty_cache("compile_cache_hits")
+    compiled_graph = Knitspeak_Compiler(cache=cache).compile(6, 4, _RIB)
+    cached_graph = Knitspeak_Compiler(cache=cache).compile(6, 4, _RIB)
+    assert cache.misses == 1 and cache.hits == 1 and cache.hit_rate == 0.5
+    assert isinstance(cached_graph, Compact_Knit_Graph) and cached_graph.is_read_only
+    assert [*compiled_graph.graph.nodes] == [*cached_graph.graph.nodes]
+    for loop_id in compiled_graph.graph.nodes:
+        assert [*compiled_graph[loop_id].parent_loop_ids] == [*cached_graph[loop_id].parent_loop_ids]
+        for parent_id in compiled_graph.graph.predecessors(loop_id):
+            assert compiled_graph.graph[parent_id][loop_id] == cached_graph.graph[parent_id][loop_id]
+    assert compiled_graph.get_courses() == cached_graph.get_courses()
+    Knitspeak_Compiler(cache=cache).compile(8, 4, _RIB)  # different parameters are a different entry
+    assert cache.misses == 2 and len(os.listdir("compile_cache_hits")) == 2
+
+
+def test_eviction():
+    cache = _empty_cache("compile_cache_eviction")
+    Knitspeak_Compiler(cache=cache).compile(6, 4, _RIB)
+    entry_size = cache.size()
+    cache.max_bytes = 2 * entry_size
+    for width in [8, 10]:
+        Knitspeak_Compiler(cache=cache).compile(width, 4, _RIB)
+    assert cache.evictions >= 1 and cache.size() <= cache.max_bytes
+    cache.clear()
+    assert cache.size() == 0
+
+
+def test_damaged_entry():
+    cache = _empty_cache("compile_cache_damaged")
+    Knitspeak_Compiler(cache=cache).compile(6, 4, _RIB)
+    for entry in os.listdir("compile_cache_damaged"):
+        with open(os.path.join("compile_cache_damaged", entry), "wb") as file:
+            file.write(b"not a knit graph")
+    Knitspeak_Compiler(cache=cache).compile(6, 4, _RIB)
+    assert cache.misses == 2 and cache.hits == 0
+
+
+def test_plated_entry():
+    cache = _empty_cache("compile_cache_plated")
+    knit_graph = Knitspeak_Compiler().compile(6, 4, _RIB)
+    for yarn in knit_graph.yarns.values():
+        yarn._carrier = Yarn_Carrier([3, 4])
+    cache.put("plated", knit_graph)
+    cached_graph = cache.get("plated")
+    assert cache.hits == 1 and [*cached_graph.graph.nodes] == [*knit_graph.graph.nodes]
+    assert [yarn.carrier.carrier_ids for yarn in cached_graph.yarns.values()] == [[3, 4]]
+    assert [entry for entry in os.listdir("compile_cache_plated") if not entry.endswith(".kg")] == []
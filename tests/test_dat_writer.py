@@ -0,0 +1,75 @@
+"""Tests of writing DAT files from carriage passes"""
+import hashlib
+import struct
+
+from debugging_tools.simple_knitgraphs import *
+from knitting_machine.Machine_State import Needle, Pass_Direction, Yarn_Carrier
+from knitting_machine.dat_writer import Dat_Writer
+from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+
+
+def _read_dat(filename: str):
+    with open(filename, "rb") as file:
+        dat = file.read()
+    _, _, x_max, y_max = struct.unpack_from("<HHHH", dat, 0)
+    runs = dat[0x600:]
+    rows = [bytearray()]
+    for color, length in zip(runs[0::2], runs[1::2]):
+        if len(rows[-1]) == x_max + 1:
+            rows.append(bytearray())
+        rows[-1].extend([color] * length)
+    assert len(rows) == y_max + 1 and all(len(row) == x_max + 1 for row in rows)
+    return rows
+
+
+def test_write_dat():
+    # the DAT files made by knitout-to-dat.js from the knitout of each knitgraph
+    expected_hashes = {"stst_20.dat": "cf9855e5f5d8ccfd66bf041c5ea4259bba6a6f1329d5dba4ed0eb7deaf6d3c48",
+                       "lace_4.dat": "bdda33e6800bb7a762f8b0367393743b8e271e7c417d4b832ea0c2753b095160",
+                       "stripes_10.dat": "c78eb6717ecdeee0d91331330320b296480486ef020ab60a8f33005093ebbbca"}
+    knit_graphs = {"stst_20.dat": stockinette(20, 20), "lace_4.dat": lace(4, 4),
+                   "stripes_10.dat": stripes(10, 9, stripe_height=2, carriers=(3, 4, 5))}
+    for filename, knit_graph in knit_graphs.items():
+        Knitout_Generator(knit_graph).write_dat(filename)
+        with open(filename, "rb") as file:
+            assert hashlib.sha256(file.read()).hexdigest() == expected_hashes[filename], filename
+    rows = _read_dat("stst_20.dat")
+    assert len(rows[0]) == 55 + 20 + 55  # the option lines are left and right of the 20 needles
+    assert all(color == 0 for row in rows[0:5] for color in row)  # the bottom margin
+    Knitout_Generator(rib(20, 4, 2)).write_dat("rib_dat.dat", knitout_filename="rib_dat.k")
+    Knitout_Generator(rib(20, 4, 2)).write_instructions("rib_knitout.k")
+    with open("rib_dat.k") as dat_knitout, open("rib_knitout.k") as knitout:
+        assert dat_knitout.read() == knitout.read()
+
+
+def test_dat_passes():
+    dat_writer = Dat_Writer()
+    carrier = Yarn_Carrier(3)
+    dat_writer.in_hook(carrier)
+    for position in reversed(range(0, 4)):
+        dat_writer.knit(Pass_Direction.Right_to_Left, Needle(True, position), carrier)
+    for position in range(0, 4):
+        dat_writer.knit(Pass_Direction.Left_to_Right, Needle(True, position), carrier)
+    dat_writer.release_hook(carrier)
+    dat_writer.rack(1)
+    dat_writer.xfer(Needle(True, 1), Needle(False, 0))
+    dat_writer.xfer(Needle(True, 3), Needle(False, 2))
+    dat_writer.rack(0)
+    dat_writer.knit(Pass_Direction.Left_to_Right, Needle(False, 0), carrier)
+    dat_writer.out_hook(carrier)
+    for position in range(0, 4):
+        dat_writer.drop(Needle(position not in [1, 3], position))
+    assert [(dat_pass.direction, dat_pass.hook, sorted(dat_pass.slots)) for dat_pass in dat_writer.passes] == \
+           [("-", "hook-in", [1, 2, 3, 4]), ("+", None, [1, 2, 3, 4]), ("-", "hook-release", [4]),
+            ("", None, [2, 4]),
+            ("-", None, [1, 4]),  # kick the carrier left of the back knit
+            ("+", "hook-out", [1]),  # the back knit, then the carrier is taken out
+            ("", None, [1, 2, 3, 4])]
+    assert dat_writer.passes[3].racking == 1 and dat_writer.passes[3].carrier_option() == 0
+    assert struct.unpack_from("<HH", dat_writer.to_bytes(), 4) == (55 + 4 + 55 - 1, 8 + 7 + 5 + 6 - 1)
+    dat_writer = Dat_Writer()
+    dat_writer.in_hook(carrier)
+    dat_writer.tuck(Pass_Direction.Right_to_Left, Needle(True, 2), carrier)
+    dat_writer.release_hook(carrier)
+    assert [(dat_pass.direction, dat_pass.hook) for dat_pass in dat_writer.passes] == \
+           [("-", "hook-in"), ("+", None), ("-", "hook-release")]  # the hook is not released on a carriage move
@@ -0,0 +1,52 @@
+"""Tests of recording executed instructions without writing knitout"""
+from debugging_tools.simple_knitgraphs import *
+from knitting_machine.Machine_State import Machine_State, Needle, Pass_Direction, Yarn_Carrier
+from knitting_machine.instruction_buffer import Instruction_Buffer, Opcode, NO_LOOP, NO_NEEDLE, carrier_ids
+from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+from knitting_machine.machine_operations import inhook, knit, xfer, outhook
+
+
+def test_generated_instructions():
+    generator = Knitout_Generator(lace(4, 4))
+    generator.generate_instructions()
+    buffer = generator.instruction_buffer
+    assert len(buffer) == len(generator.instructions) - len(generator._header)
+    generator.write_instructions("buffered_lace.k", generate_instructions=False)
+    Knitout_Generator(lace(4, 4)).write_instructions("streamed_lace.k")
+    with open("buffered_lace.k") as buffered, open("streamed_lace.k") as streamed:
+        assert buffered.read() == streamed.read()
+    opcodes = {*buffer.opcodes}
+    assert {Opcode.In_Hook, Opcode.Tuck, Opcode.Knit, Opcode.Xfer, Opcode.Rack, Opcode.Drop} <= opcodes
+    for index in range(0, len(buffer)):
+        if buffer.opcode(index) is Opcode.Knit:
+            assert buffer.loop_ids[index] != NO_LOOP and buffer.needles_2[index] == NO_NEEDLE
+            assert buffer.carrier(index) == Yarn_Carrier(3)
+        elif buffer.opcode(index) is Opcode.Xfer:
+            assert buffer.needle_1(index).is_front != buffer.needle_2(index).is_front
+            assert buffer.direction(index) is None and buffer.carriers[index] == 0
+
+
+def test_recorded_operations():
+    machine_state = Machine_State(needle_count=10)
+    buffer = Instruction_Buffer()
+    carrier = Yarn_Carrier([4, 2])
+    for carrier_id in carrier:
+        inhook(machine_state, Yarn_Carrier(carrier_id), instructions=buffer)
+    assert knit(machine_state, Pass_Direction.Right_to_Left, Needle(True, 3), carrier, 0, "first",
+                instructions=buffer) is None
+    xfer(machine_state, Needle(True, 3), Needle(False, 1), instructions=buffer)
+    outhook(machine_state, Yarn_Carrier(4), instructions=buffer)
+    assert [*buffer.opcodes] == [Opcode.In_Hook, Opcode.In_Hook, Opcode.Knit, Opcode.Rack, Opcode.Xfer,
+                                 Opcode.Out_Hook]
+    assert buffer.carriers[2] == 0b1010 and carrier_ids(buffer.carriers[2]) == (2, 4)
+    assert buffer.carrier(2) == carrier  # the order of the carrier set is kept
+    assert buffer.needles_1[2] == 6 and buffer.needles_2[4] == 3 and buffer.rackings[4] == 2
+    assert buffer.render_all() == ["inhook  4 ;\n", "inhook  2 ;\n", "knit - f4 4 2 ; knit loop 0, first\n",
+                                   "rack 2 ;rack to xfer f4 to b2\n", "xfer f4 b2 ;\n", "outhook  4 ;\n"]
+    buffer.clear()
+    buffer.append(Opcode.Drop, needle_1=Needle(False, 1))
+    assert len(buffer) == 1 and buffer.rackings[0] == 2  # the racking is kept after clearing
+    machine_state = Machine_State(needle_count=10)
+    machine_state.add_loop(1, 1, on_front=True)
+    assert xfer(machine_state, Needle(True, 1), Needle(False, 0)) == \
+           "rack 1 ;rack to xfer f2 to b1\nxfer f2 b1 ;\n"
@@ -0,0 +1,54 @@
+"""Tests that the incrementally maintained course index matches a full walk of the knit graph"""
+from debugging_tools.simple_knitgraphs import *
+from knit_graphs.Compact_Knit_Graph import Compact_Knit_Graph
+
+
+def _assert_index_matches_walk(knit_graph: Knit_Graph):
+    loop_ids_to_course, course_to_loop_ids, _ = Knit_Graph._find_courses(knit_graph)
+    assert knit_graph.get_courses() == (loop_ids_to_course, course_to_loop_ids)
+    assert knit_graph.course_count == len(course_to_loop_ids)
+    for course, loop_ids in course_to_loop_ids.items():
+        assert knit_graph.loops_in_course(course) == loop_ids
+        for loop_id in loop_ids:
+            assert knit_graph.course_of(loop_id) == course
+
+
+def test_simple_knitgraphs():
+    for knit_graph in [stockinette(5, 5), rib(6, 4, 2), seed(4, 4), twisted_stripes(8, 5), both_twists(5),
+                       lace(8, 6), lace_and_twist(), short_rows(8, buffer_height=2)]:
+        _assert_index_matches_walk(knit_graph)
+
+
+def test_remove_loop():
+    knit_graph = stockinette(4, 3)
+    knit_graph.remove_loop(4)
+    assert len(knit_graph.loops[11].parent_loop_ids) == 0
+    knit_graph.remove_loop(11)
+    _assert_index_matches_walk(knit_graph)
+    assert 4 not in knit_graph.yarns["yarn"]
+
+
+def test_compact_course_index():
+    knit_graph = Compact_Knit_Graph()
+    yarn = Yarn("yarn", knit_graph)
+    knit_graph.add_yarn(yarn)
+    first_course = []
+    for _ in range(0, 4):
+        loop_id, loop = yarn.add_loop_to_end()
+        knit_graph.add_loop(loop)
+        first_course.append(loop_id)
+    second_course = []
+    for _ in range(0, 4):
+        loop_id, loop = yarn.add_loop_to_end()
+        knit_graph.add_loop(loop)
+        second_course.append(loop_id)
+    for parent_id, child_id in zip(reversed(first_course), second_course):
+        knit_graph.connect_loops(parent_id, child_id)  # out of order connections rebuild the index
+    _assert_index_matches_walk(knit_graph)
+    for parent_id in reversed(second_course):
+        loop_id, loop = yarn.add_loop_to_end()
+        knit_graph.add_loop(loop)
+        knit_graph.connect_loops(parent_id, loop_id)
+    _assert_index_matches_walk(knit_graph)
+    knit_graph.remove_loop(5)
+    _assert_index_matches_walk(knit_graph)
@@ -0,0 +1,92 @@
+"""Tests that knit graphs written to binary files are loaded with the same structure"""
+from debugging_tools.simple_knitgraphs import stockinette, lace, short_rows, lace_and_twist
+from knit_graphs.Compact_Knit_Graph import Compact_Knit_Graph
+from knit_graphs.Knit_Graph import Knit_Graph
+from knit_graphs.Yarn import Yarn
+from knit_graphs.knit_graph_io import write_knit_graph, read_knit_graph
+from knitspeak_compiler.knitspeak_compiler import Knitspeak_Compiler
+from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+
+
+def _write_and_read(knit_graph: Knit_Graph, name: str) -> Compact_Knit_Graph:
+    filename = f"{name}.kg"
+    write_knit_graph(knit_graph, filename)
+    loaded_graph = read_knit_graph(filename)
+    assert [*knit_graph.graph.nodes] == [*loaded_graph.graph.nodes]
+    for loop_id in knit_graph.graph.nodes:
+        assert [*knit_graph.graph.predecessors(loop_id)] == [*loaded_graph.graph.predecessors(loop_id)]
+        assert [*knit_graph[loop_id].parent_loop_ids] == [*loaded_graph[loop_id].parent_loop_ids]
+        assert knit_graph[loop_id].is_twisted == loaded_graph[loop_id].is_twisted
+        for parent_id in knit_graph.graph.predecessors(loop_id):
+            assert knit_graph.graph[parent_id][loop_id] == loaded_graph.graph[parent_id][loop_id]
+    assert knit_graph.get_courses() == loaded_graph.get_courses()
+    for yarn_id, yarn in knit_graph.yarns.items():
+        assert [*yarn] == [*loaded_graph.yarns[yarn_id]]
+        assert yarn.carrier.carrier_ids == loaded_graph.yarns[yarn_id].carrier.carrier_ids
+    assert loaded_graph.last_loop_id == knit_graph.last_loop_id
+    return loaded_graph
+
+
+def test_simple_knitgraphs():
+    _write_and_read(stockinette(6, 5), "io_stst")
+    _write_and_read(lace(8, 6), "io_lace")
+    _write_and_read(short_rows(10, 2), "io_short_rows")
+    _write_and_read(lace_and_twist(), "io_lace_and_twist")
+
+
+def test_compact_knit_graph():
+    pattern = r"""
+        1st row k, lc2|2, k, rc2|2, [k] to end.
+        all ws rows p.
+        3rd row k 2, lc2|1, k, rc1|2, [k] to end.
+        5th row k 3, lc1|1, k, rc1|1, [k] to end.
+    """
+    compact_graph = Knitspeak_Compiler(Compact_Knit_Graph).compile(11, 6, pattern)
+    loaded_graph = _write_and_read(compact_graph, "io_cable")
+    _write_and_read(loaded_graph, "io_cable_copy")  # a loaded graph can be written again
+    compact_graph.remove_loop(3)  # leaves unused edge slots that are dropped from the file
+    _write_and_read(compact_graph, "io_cable_removed")
+
+
+def test_multiple_yarns():
+    knit_graph = Knit_Graph()
+    knit_graph.add_yarn(Yarn("main", knit_graph))
+    knit_graph.add_yarn(Yarn("contrast", knit_graph, carrier_id=5))
+    first_course = knit_graph.add_course("main", [[] for _ in range(0, 4)])
+    second_course = knit_graph.add_course("contrast", [[parent_id] for parent_id in reversed(first_course)])
+    knit_graph.add_course("main", [[parent_id] for parent_id in reversed(second_course)])
+    loaded_graph = _write_and_read(knit_graph, "io_multiple_yarns")
+    main_yarn = loaded_graph.yarns["main"]
+    assert main_yarn.next_loop_id(3) == 8 and main_yarn.prior_loop_id(8) == 3 and 4 not in main_yarn
+
+
+def test_knitout():
+    knit_graph = stockinette(8, 6)
+    loaded_graph = _write_and_read(knit_graph, "io_knitout")
+    outputs = []
+    for graph, name in [(knit_graph, "io_stst.k"), (loaded_graph, "io_stst_loaded.k")]:
+        Knitout_Generator(graph).write_instructions(name)
+        with open(name, "r") as file:
+            outputs.append(file.read())
+    assert outputs[0] == outputs[1]
+
+
+def test_read_only():
+    loaded_graph = _write_and_read(stockinette(4, 4), "io_read_only")
+    assert loaded_graph.is_read_only
+    try:
+        loaded_graph.add_course("yarn", [[15]])
+        assert False, "read-only graph was changed"
+    except AssertionError as error:
+        assert "read-only" in str(error)
+
+
+def test_plated_yarn():
+    knit_graph = Knit_Graph()
+    knit_graph.add_yarn(Yarn("plated", knit_graph, carrier_id=[4, 3]))
+    knit_graph.add_yarn(Yarn("main", knit_graph, carrier_id=5))
+    first_course = knit_graph.add_course("main", [[] for _ in range(0, 4)])
+    knit_graph.add_course("plated", [[parent_id] for parent_id in reversed(first_course)])
+    loaded_graph = _write_and_read(knit_graph, "io_plated")
+    assert loaded_graph.yarns["plated"].carrier.carrier_ids == [4, 3]  # the order of plated carriers is kept
+    assert loaded_graph.yarns["main"].carrier.carrier_ids == 5
@@ -1,6 +1,27 @@
+import gzip
+import os
+from typing import Dict, List
+
 from debugging_tools.knit_graph_viz import visualize_knitGraph
 from debugging_tools.simple_knitgraphs import *
+from knitting_machine.Machine_Profile import Machine_Profile
 from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+from knitting_machine.operation_sets import Carriage_Pass, Instruction_Type
+from knitspeak_compiler.knitspeak_compiler import Knitspeak_Compiler
+
+
+class _Stack_Checking_Generator(Knitout_Generator):
+    """
+    Checks that the parents of each decrease are stacked in order on the decrease's needle before it is knit
+    """
+
+    def _do_xfers_for_row(self, loop_ids, direction):
+        loop_id_to_target_needle = super()._do_xfers_for_row(loop_ids, direction)
+        for loop_id, target_needle in loop_id_to_target_needle.items():
+            parent_ids = [*self._knit_graph.loops[loop_id].parent_loop_ids]
+            if len(parent_ids) > 1:
+                assert self._machine_state[target_needle] == parent_ids
+        return loop_id_to_target_needle
 
 
 def test_stst():
@@ -28,6 +49,22 @@ def test_lace():
     generator.write_instructions("test_lace.k")
 
 
+def test_decreases():
+    patterns = [(11, "all rs rows k, k2tog, yo, k, yo, sk2po, yo, k, yo, skpo, k. all ws rows p."),  # lace.ks
+                (5, "all rs rows k, k3tog, yo, yo, k. all ws rows p."),
+                (5, "all rs rows k, yo, yo, s2kpo, k. all ws rows p."),
+                (6, "all rs rows k, k2tog, yo, yo, skpo, k. all ws rows k.")]
+    for width, pattern in patterns:
+        knit_graph = Knitspeak_Compiler().compile(width, 6, pattern)
+        generator = _Stack_Checking_Generator(knit_graph)
+        generator.generate_instructions()
+    generator = _Stack_Checking_Generator(lace(8, 6))
+    generator.generate_instructions()
+    stacking_passes = [carriage_pass for carriage_pass in generator._carriage_passes
+                       if carriage_pass.instruction_type is Instruction_Type.Xfer]
+    assert len(stacking_passes) == 2 * 3  # hold and stack the yarn-over side of each decrease on 3 lace rows
+
+
 def test_both_twists():
     knitGraph = both_twists(height=3)
     generator = Knitout_Generator(knitGraph)
@@ -39,6 +76,115 @@ def test_write_shortrows():
     generator = Knitout_Generator(knitGraph)
     generator.write_instructions("test_short_rows.k")
 
+
+def test_stripes():
+    generator = Knitout_Generator(stripes(10, 9, stripe_height=2, carriers=(3, 4, 5)))
+    generator.write_instructions("test_stripes.k")
+    generator = Knitout_Generator(stripes(10, 9, stripe_height=2, carriers=(3, 4, 5)))
+    generator.generate_instructions()
+    hooks = [instruction.split(";")[0].split() for instruction in generator.instructions if "hook" in instruction]
+    assert hooks == [["inhook", "3"], ["releasehook", "3"], ["inhook", "4"], ["releasehook", "4"], ["inhook", "5"],
+                     ["releasehook", "5"], ["outhook", "5"], ["outhook", "3"], ["outhook", "4"]]
+    knit_passes = [carriage_pass for carriage_pass in generator._carriage_passes
+                   if carriage_pass.instruction_type is Instruction_Type.Knit]
+    assert [[*carriage_pass.carrier_set][0].carrier_ids for carriage_pass in knit_passes[2:]] == [3, 4, 4, 5, 5, 3, 3, 4]
+
+
+def _knit_passes(generator: Knitout_Generator) -> List[Carriage_Pass]:
+    return [carriage_pass for carriage_pass in generator._carriage_passes
+            if carriage_pass.instruction_type is Instruction_Type.Knit]
+
+
+def _knit_loop_ids(generator: Knitout_Generator) -> Dict[int, List[int]]:
+    carriers_to_loop_ids = {}  # carrier ids to the loops they knit, in the order they were knit
+    for carriage_pass in _knit_passes(generator):
+        carrier_id = [*carriage_pass.carrier_set][0].carrier_ids
+        loop_ids = carriers_to_loop_ids.setdefault(carrier_id, [])
+        loop_ids.extend(carriage_pass.involved_loop(index) for index in carriage_pass.sorted_indices()
+                        if carriage_pass.involved_loop(index) >= 0)
+    return carriers_to_loop_ids
+
+
+def _carrier_switches(generator: Knitout_Generator) -> int:
+    carrier_ids = [[*carriage_pass.carrier_set][0].carrier_ids for carriage_pass in _knit_passes(generator)]
+    return len([carrier_id for carrier_id, next_id in zip(carrier_ids, carrier_ids[1:]) if carrier_id != next_id])
+
+
+def test_odd_stripes():
+    generator = Knitout_Generator(stripes(8, 7, stripe_height=1, carriers=(3, 4)))
+    generator.generate_instructions()
+    for loop_ids in _knit_loop_ids(generator).values():  # each yarn knits its loops in yarn order
+        assert loop_ids == sorted(loop_ids)
+    kicks = [carriage_pass for carriage_pass in generator._carriage_passes
+             if carriage_pass.instruction_type is Instruction_Type.Miss]
+    assert len(kicks) == 5  # each course after the first course of carrier 4 starts where its carrier stopped
+
+
+def test_vertical_stripes():
+    generator = Knitout_Generator(vertical_stripes(10, 6))
+    generator.generate_instructions()
+    knit_passes = _knit_passes(generator)[2:]
+    assert len(knit_passes) == 2 * 5
+    for loop_ids in _knit_loop_ids(generator).values():  # each yarn knits its loops in yarn order
+        assert loop_ids == sorted(loop_ids)
+    carrier_positions = {}  # carrier ids to the needle positions they knit on
+    for carriage_pass in knit_passes:
+        carrier_id = [*carriage_pass.carrier_set][0].carrier_ids
+        positions = {carriage_pass.needle_1(index).position for index in range(0, len(carriage_pass))}
+        assert carrier_positions.setdefault(carrier_id, positions) == positions
+    assert carrier_positions == {3: {0, 2, 4, 6, 8}, 4: {1, 3, 5, 7, 9}}
+    assert all(len(generator._machine_state[(needle_pos, True)]) == 0 for needle_pos in range(0, 10))
+
+
+def test_carrier_switches():
+    for knit_graph, switches in [(vertical_stripes(10, 6), 5), (stripes(10, 9, stripe_height=2, carriers=(3, 4, 5)), 4),
+                                 (stripes(8, 7, stripe_height=1, carriers=(3, 4)), 6)]:
+        generator = Knitout_Generator(knit_graph)
+        generator.generate_instructions()
+        assert _carrier_switches(generator) == switches  # the carrier used last knits first in each course
+
+
+class _Failing_Generator(Knitout_Generator):
+    """
+    Fails to knit any course after the first knit course, once some instructions have been streamed
+    """
+
+    def _knit_row(self, loop_ids, direction, course_number):
+        if course_number > 1:
+            raise RuntimeError("failed after the first course")
+        super()._knit_row(loop_ids, direction, course_number)
+
+
+def test_streamed_instructions():
+    generator = Knitout_Generator(stockinette(20, 20))
+    generator.generate_instructions()
+    streaming_generator = Knitout_Generator(stockinette(20, 20))
+    streaming_generator.write_instructions("stst_streamed.k.gz")
+    assert len(streaming_generator._carriage_passes) == 0 and len(streaming_generator.instructions) == 0
+    with gzip.open("stst_streamed.k.gz", "rt") as file:
+        assert file.read() == "".join(generator.instructions)
+    try:
+        _Failing_Generator(lace(4, 4)).write_instructions("test_lace_partial.k")
+        assert False, "generation should have failed"
+    except RuntimeError as error:
+        assert str(error) == "failed after the first course"
+    assert not os.path.exists("test_lace_partial.k")
+
+
+def test_machine_profile():
+    profile = Machine_Profile(name="Small", needle_count=24, gauge=7, carrier_count=6)
+    generator = Knitout_Generator(rib(20, 4, 2), machine_profile=profile)
+    generator.generate_instructions()
+    assert generator.instructions[:6] == [";!knitout-2\n", ";;Machine: Small\n", ";;Gauge: 7\n", ";;Width: 24\n",
+                                           ";;Carriers: 1 2 3 4 5 6\n", ";;Position: Center\n"]
+    assert generator._machine_state.needle_count == 24
+    drops = [instruction.split(" ")[1] for instruction in generator.instructions if instruction.startswith("drop")]
+    assert sorted(drops) == sorted([f"f{n}" for n in [1, 2, 5, 6, 9, 10, 13, 14, 17, 18]] +
+                                   [f"b{n}" for n in [3, 4, 7, 8, 11, 12, 15, 16, 19, 20]])
+    assert all(len(generator._machine_state[(needle_pos, on_front)]) == 0
+               for needle_pos in range(0, 24) for on_front in [True, False])
+
+
 if __name__ == "__main__":
     #test_double_jersey()
     test_write_shortrows()
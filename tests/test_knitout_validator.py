@@ -0,0 +1,59 @@
+"""Tests of the knitout validator"""
+from debugging_tools.simple_knitgraphs import *
+from knitting_machine.Compact_Machine_State import Compact_Machine_State
+from knitting_machine.Machine_State import Machine_State
+from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+from knitting_machine.knitout_validator import Knitout_Validator, read_knitout
+
+
+def _messages(knitout: str, **validator_arguments):
+    validator = Knitout_Validator(**validator_arguments)
+    return [(violation.line_number, violation.message) for violation in validator.validate(knitout.splitlines())]
+
+
+def test_generated_knitout():
+    for filename, knit_graph in [("validated_stst.k", stockinette(20, 20)), ("validated_rib.k", rib(20, 10, 2)),
+                                 ("validated_stripes.k", stripes(10, 9)), ("validated_stst.k.gz", stockinette(8, 8))]:
+        Knitout_Generator(knit_graph).write_instructions(filename)
+        validator = Knitout_Validator()
+        assert validator.validate_file(filename) == [], filename
+        assert validator.instruction_count > 0
+    Knitout_Generator(lace(4, 4)).write_instructions("validated_lace.k")
+    assert len(Knitout_Validator().validate_file("validated_lace.k")) > 0  # yarn-overs are knit on empty needles
+    assert Knitout_Validator(empty_needle_knits=True).validate_file("validated_lace.k") == []
+
+
+def test_read_knitout():
+    lines = [";!knitout-2", ";;Carriers: 1 2 3", "", "inhook 3 ; bring in 3", "knit + f1 3"]
+    assert [*read_knitout(lines)] == [(4, "inhook", ["3"]), (5, "knit", ["+", "f1", "3"])]
+
+
+def test_violations():
+    header = ";!knitout-2\n"
+    assert _messages(header + "tuck + f1 3\nknit + f1 3\ndrop f1") == \
+           [(2, "carrier 3 used before it was brought in"), (3, "carrier 3 used before it was brought in")]
+    racked_transfers = "in 3\ntuck + f2 3\nrack 1\nxfer f2 b2\nxfer f2 b1\nrack 9\nrack 0\nxfer b1 f1\ndrop f1\nout 3"
+    assert _messages(header + racked_transfers) == [(5, "racking 1 does not align f2 with b2"), (7, "cannot rack past 8")]
+    assert _messages(header + "in 3\nknit + f1 3\ndrop f1\nout 3") == [(3, "knit on an empty needle")]
+    assert _messages(header + "in 3\ntuck + f2 3\nknit + f2\nout 3") == [(4, "knit without carriers drops 1 loops")]
+    assert _messages(header + "in 3\ntuck + f1 3\ntuck - b4 3\nout 3") == \
+           [(0, "1 loops left on f1"), (0, "1 loops left on b4")]
+    assert _messages(header + "in 3\nknit + f800 12\nbend f1\nout 3\nout 3") == \
+           [(3, "no needle f800"), (3, "no carrier 12"), (4, "unknown instruction"), (6, "carrier 3 is not in")]
+    assert _messages(header + "inhook 3\nreleasehook 3\nreleasehook 3\nxfer f1 f2\nouthook 3") == \
+           [(4, "carrier 3 is not on the inserting hook"), (5, "transfer from an empty needle"),
+            (5, "f1 and f2 are on the same bed")]
+    assert len(_messages("knit + f800 3\n" * 5, max_violations=3)) == 3
+
+
+def test_machine_state_types():
+    Knitout_Generator(seed(10, 10)).write_instructions("validated_seed.k")
+    Knitout_Generator(lace(8, 6)).write_instructions("validated_lace_8.k")
+    for machine_state_type in [Machine_State, Compact_Machine_State]:
+        validator = Knitout_Validator(machine_state_type=machine_state_type)
+        assert validator.validate_file("validated_seed.k") == [], machine_state_type.__name__
+        assert isinstance(validator.machine_state, machine_state_type)
+        assert all(len(validator.machine_state.front_bed[position]) == 0 for position in range(0, 10))
+        validator = Knitout_Validator(machine_state_type=machine_state_type, empty_needle_knits=True)
+        assert validator.validate_file("validated_lace_8.k") == [], machine_state_type.__name__
+        assert validator.instruction_count > 0
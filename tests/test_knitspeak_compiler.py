@@ -80,3 +80,44 @@ def test_write_short_rows():
 #     test_write_slipped_rib()
 #     test_cable()
 #     test_lace()
+
+
+def test_compile_many():
+    patterns = [(4, 4, "all rs rows k rib=2, p rib. all ws rows k rib, p rib."),
+                (11, 6, "1st row k, lc2|2, k, rc2|2, [k] to end. all ws rows p. 3rd row k 2, lc2|1, k, rc1|2, [k] to end."),
+                (6, 4, "all rs rows k, p. all ws rows p, k."),
+                (4, 4, "all rs rows k rib=2, p rib. all ws rows k rib, p rib.")]
+    compiler = Knitspeak_Compiler()
+    for (width, rows, pattern), knit_graph in zip(patterns, compiler.compile_many(patterns)):
+        fresh_graph = Knitspeak_Compiler().compile(width, rows, pattern)
+        assert [*knit_graph.graph.edges(data=True)] == [*fresh_graph.graph.edges(data=True)]
+        assert knit_graph.get_courses() == fresh_graph.get_courses()
+    assert "rib" in compiler._parser.parser.symbolTable
+    compiler.reset()
+    assert "rib" not in compiler._parser.parser.symbolTable  # variables do not leak between compiles
+
+
+def test_tiled_repeats():
+    patterns = [(6, "all rs rows k, p. all ws rows k, p."),
+                (8, "1st, 3rd rows k 2, p 2. flipped 2nd, 4th rows p 2, k 2."),
+                (6, "all rs rows k, [k, p] to last 1 sts, k. all ws rows k, [slip, k] to last 1 sts, p."),
+                (9, "all rs rows k, k2tog, yo 2, sk2po, yo 2, skpo, k. all ws rows p 2, k, p 3, k, p 2."),
+                (30, "from rs 1 to 7 rows k border=currow, [p] to last border sts, k border. "
+                    "from ws 2 to 8 rows p border=currow, [k] to last border sts, p border.")]
+    for width, pattern in patterns:
+        for rows in [3, 9, 14]:
+            tiled_graph = Knitspeak_Compiler().compile(width, rows, pattern)
+            knit_graph = Knitspeak_Compiler(tile_repeats=False).compile(width, rows, pattern)
+            assert sorted(tiled_graph.graph.edges(data=True), key=str) == sorted(knit_graph.graph.edges(data=True), key=str)
+            assert tiled_graph.get_courses() == knit_graph.get_courses()
+
+
+def test_stitch_programs():
+    patterns = [(6, "all rs rows k rib=1, [k rib, p rib] to last rib sts, k rib. all ws rows k rib, [slip rib, k rib] to last rib sts, p rib."),
+                (11, "1st row k, lc2|2, k, rc2|2, [k] to end. all ws rows p. 3rd row k 2, lc2|1, k, rc1|2, [k] to end."),
+                (9, "all rs rows k, k2tog, yo 2, sk2po, yo 2, skpo, k. all ws rows p 2, k, p 3, k, p 2.")]
+    for width, pattern in patterns:
+        knit_graph = Knitspeak_Compiler(tile_repeats=False).compile(width, 9, pattern)
+        interpreted_graph = Knitspeak_Compiler(precompile_courses=False, tile_repeats=False).compile(width, 9, pattern)
+        assert sorted(knit_graph.graph.edges(data=True), key=str) == sorted(interpreted_graph.graph.edges(data=True), key=str)
+        assert knit_graph.get_courses() == interpreted_graph.get_courses()
@@ -0,0 +1,19 @@
+"""Tests for the compact loop structure"""
+from knit_graphs.Loop import Loop
+
+
+def test_parent_stack():
+    loop = Loop(5, "yarn")
+    loop.add_parent_loop(Loop(1, "yarn"))
+    loop.add_parent_loop(3)
+    loop.add_parent_loop(2, stack_position=0)
+    assert [*loop.parent_loop_ids] == [2, 1, 3]
+    loop.remove_parent_loop(1)
+    assert [*loop.parent_loop_ids] == [2, 3]
+
+
+def test_create_loops():
+    loops = Loop.create_loops(10, 3, "".join(["ya", "rn"]), is_twisted=True)
+    assert [loop.loop_id for loop in loops] == [10, 11, 12]
+    assert all(loop.is_twisted and len(loop.parent_loop_ids) == 0 for loop in loops)
+    assert loops[0].yarn_id is Loop(0, "".join(["ya", "rn"])).yarn_id  # yarn ids are interned
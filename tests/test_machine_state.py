@@ -0,0 +1,57 @@
+"""Tests of the occupied needle index of machine beds and of interned needles"""
+import random
+
+from knitting_machine.Compact_Machine_State import Compact_Machine_State
+from knitting_machine.Machine_State import Machine_State, Needle
+
+
+def _occupied_by_scan(machine_state: Machine_State, on_front: bool):
+    return [needle_pos for needle_pos in range(0, machine_state.needle_count)
+            if len(machine_state[(needle_pos, on_front)]) > 0]
+
+
+def test_occupied_needles():
+    for machine_state_type in [Machine_State, Compact_Machine_State]:
+        machine_state = machine_state_type(needle_count=40)
+        assert machine_state.front_bed.leftmost_occupied is None and machine_state.front_bed.occupied_needles() == []
+        operations = random.Random(5)
+        for loop_id in range(0, 400):
+            needle_pos = operations.randrange(0, 36)
+            operation = operations.random()
+            if operation < .4:
+                machine_state.add_loop(loop_id, needle_pos, on_front=operations.random() < .5,
+                                       drop_prior_loops=operations.random() < .5)
+            elif operation < .6:
+                machine_state.drop_loop(needle_pos, on_front=operations.random() < .5)
+            elif len(machine_state[(needle_pos, True)]) > 0:
+                machine_state.update_rack(needle_pos, needle_pos + 4)
+                machine_state.xfer_loops(needle_pos, needle_pos + 4, front_to_back=True)
+            for on_front, bed in [(True, machine_state.front_bed), (False, machine_state.back_bed)]:
+                occupied = _occupied_by_scan(machine_state, on_front)
+                assert bed.occupied_needles() == occupied and bed.occupied_count == len(occupied)
+                assert bed.occupied_needles(10, 20) == [needle_pos for needle_pos in occupied if 10 <= needle_pos <= 20]
+                if len(occupied) > 0:
+                    assert bed.leftmost_occupied == occupied[0] and bed.rightmost_occupied == occupied[-1]
+                else:
+                    assert bed.leftmost_occupied is None and bed.rightmost_occupied is None
+        if isinstance(machine_state, Compact_Machine_State):
+            machine_state.knit_needles(8, range(1000, 1010), on_front=True)
+            assert machine_state.front_bed.occupied_needles() == _occupied_by_scan(machine_state, True)
+
+
+def test_interned_needles():
+    machine_state = Machine_State(needle_count=20)
+    needles = machine_state.needles
+    assert needles is Compact_Machine_State(needle_count=20).needles and len(needles) == 40
+    front_needle = needles.needle(True, 3)
+    assert front_needle == Needle(True, 3) and front_needle != Needle(False, 3) and front_needle.index == 6
+    assert len({front_needle, Needle(True, 3), Needle(False, 3)}) == 2
+    assert front_needle.opposite() is needles.needle(False, 3) and front_needle.opposite().opposite() is front_needle
+    assert front_needle.offset(-2) is needles[2] and front_needle.offset(20) == Needle(True, 23)  # off the bed
+    machine_state.add_loop(0, 3, on_front=False)
+    assert machine_state.get_needle_of_loop(0) is front_needle.opposite()
+    try:
+        front_needle.index = 0
+        assert False, "the needle index was changed"
+    except AttributeError:
+        pass
@@ -0,0 +1,61 @@
+"""Tests of carriage passes"""
+from knitting_machine.Machine_State import Machine_State, Needle, Pass_Direction, Yarn_Carrier
+from knitting_machine.instruction_buffer import Instruction_Buffer
+from knitting_machine.operation_sets import Carriage_Pass, Instruction_Type, Instruction_Parameters
+
+
+def _xfer_pass(machine_state: Machine_State, xfers):
+    needles_to_parameters = {}
+    for front_position, back_position in xfers:
+        needle_1 = Needle(True, front_position)
+        needles_to_parameters[needle_1] = Instruction_Parameters(needle_1, needle_2=Needle(False, back_position))
+    return Carriage_Pass(Instruction_Type.Xfer, None, needles_to_parameters, machine_state)
+
+
+def test_xfers_scheduled_by_racking():
+    machine_state = Machine_State(needle_count=20)
+    for needle_pos in range(0, 8):
+        machine_state.add_loop(needle_pos, needle_pos, on_front=True)
+    machine_state.update_rack(2, 0)
+    instructions = "".join(_xfer_pass(machine_state, [(0, 0), (1, 2), (2, 1), (3, 3), (4, 5), (5, 4)])
+                           .write_instructions()).splitlines()
+    racks = [instruction.split(";")[0].strip() for instruction in instructions if instruction.startswith("rack")]
+    assert racks == ["rack 1", "rack 0", "rack -1"]
+    assert machine_state.racking == -1
+    xfers = [instruction.split(" ")[1:3] for instruction in instructions if instruction.startswith("xfer")]
+    assert xfers == [["f3", "b2"], ["f6", "b5"], ["f1", "b1"], ["f4", "b4"], ["f2", "b3"], ["f5", "b6"]]
+    assert all(machine_state[(back_position, False)] == [front_position]
+               for front_position, back_position in [(0, 0), (1, 2), (2, 1), (3, 3), (4, 5), (5, 4)])
+
+
+def test_shared_needles_keep_order():
+    machine_state = Machine_State(needle_count=20)
+    for needle_pos in range(0, 2):
+        machine_state.add_loop(needle_pos, needle_pos, on_front=True)
+    instructions = "".join(_xfer_pass(machine_state, [(0, 1), (1, 1)]).write_instructions()).splitlines()
+    xfers = [instruction.split(" ")[1:3] for instruction in instructions if instruction.startswith("xfer")]
+    assert xfers == [["f1", "b2"], ["f2", "b2"]]
+    assert machine_state[(1, False)] == [0, 1]
+
+
+def test_columnar_passes():
+    machine_state = Machine_State(needle_count=20)
+    carrier = Yarn_Carrier(3)
+    carriage_pass = Carriage_Pass(Instruction_Type.Tuck, Pass_Direction.Right_to_Left, None, machine_state)
+    for needle_pos in [2, 0, 4]:
+        carriage_pass.add_instruction(Needle(True, needle_pos), involved_loop=needle_pos, carrier=carrier)
+    carriage_pass.add_instruction(Needle(False, 1), involved_loop=1, carrier=carrier)
+    assert len(carriage_pass) == 4 and carriage_pass.carrier_set == {carrier}
+    assert [str(carriage_pass.needle_1(index)) for index in carriage_pass.sorted_indices()] == ["f5", "f3", "b2", "f1"]
+    assert carriage_pass.needle_2(0) is None and carriage_pass.involved_loop(1) == 0
+    parameters = carriage_pass.needles_to_instruction_parameters
+    assert [(params.involved_loop, params.carrier) for params in parameters.values()] == \
+           [(2, carrier), (0, carrier), (4, carrier), (1, carrier)]
+    buffer = Instruction_Buffer()
+    carriage_pass.execute(buffer, "first")
+    assert len(buffer) == 5 and buffer.render(0) == "inhook  3 ;\n"  # the comment is not on the first tuck
+    assert buffer.render(1) == "tuck - f5 3 ; tuck loop 4, \n" and buffer.render(3) == "tuck - b2 3 ; tuck loop 1, \n"
+    assert machine_state[(1, False)] == [1] and carrier.position == 0
+    output_state = Machine_State(needle_count=20)
+    carriage_pass.on_machine_state(output_state).write_instructions()
+    assert output_state[(4, True)] == [4] and machine_state.last_carriage_direction is Pass_Direction.Right_to_Left
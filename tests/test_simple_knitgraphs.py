@@ -23,6 +23,11 @@ def test_lace():
     visualize_knitGraph(lace(4, 4))
 
 
+def test_stripes():
+    visualize_knitGraph(stripes(4, 6, 2))
+    visualize_knitGraph(vertical_stripes(4, 4))
+
+
 if __name__ == "__main__":
     test_stockinette()
     test_rib()
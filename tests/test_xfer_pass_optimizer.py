@@ -0,0 +1,56 @@
+"""Tests of the transfer pass optimizer"""
+from debugging_tools.simple_knitgraphs import *
+from knitting_machine.Machine_State import Machine_State, Needle
+from knitting_machine.knitgraph_to_knitout import Knitout_Generator
+from knitting_machine.operation_sets import Carriage_Pass, Instruction_Type, Instruction_Parameters
+from knitting_machine.xfer_pass_optimizer import Xfer_Pass_Optimizer
+
+
+class _Undropped_Generator(Knitout_Generator):
+    """
+    Leaves the knitgraph on the machine so the planned and written machine states can be compared
+    """
+
+    def _drop_loops(self):
+        pass
+
+
+def _xfer_pass(machine_state: Machine_State, *xfers):
+    needles_to_parameters = {}
+    for (front_1, position_1), (front_2, position_2) in xfers:
+        needle_1 = Needle(front_1, position_1)
+        needles_to_parameters[needle_1] = Instruction_Parameters(needle_1, needle_2=Needle(front_2, position_2))
+    return Carriage_Pass(Instruction_Type.Xfer, None, needles_to_parameters, machine_state)
+
+
+def test_optimized_generator():
+    for knit_graph in [lace(4, 4), both_twists(height=3), seed(20, 10), rib(20, 10, 2)]:
+        generator = _Undropped_Generator(knit_graph, optimize_transfers=True)
+        generator.generate_instructions()
+        optimizer = generator.transfer_optimizer
+        assert optimizer.passes_after <= optimizer.passes_before and optimizer.racks_after <= optimizer.racks_before
+        for needle_pos in range(0, generator._machine_state.needle_count):
+            for on_front in [True, False]:
+                assert generator._output_state[(needle_pos, on_front)] == generator._machine_state[(needle_pos, on_front)]
+    generator = Knitout_Generator(both_twists(height=3), optimize_transfers=True)
+    generator.write_instructions("test_twists_optimized.k")
+    assert generator.transfer_optimizer.passes_after < generator.transfer_optimizer.passes_before
+
+
+def test_round_trips():
+    machine_state = Machine_State(needle_count=10)
+    for needle_pos in range(0, 4):
+        machine_state.add_loop(needle_pos, needle_pos, on_front=True)
+    passes = [_xfer_pass(machine_state, ((True, 0), (False, 0)), ((True, 2), (False, 2))),
+              _xfer_pass(machine_state, ((False, 2), (True, 3))),  # racking 1
+              _xfer_pass(machine_state, ((False, 0), (True, 0))),  # returns loop 0 to f0
+              _xfer_pass(machine_state, ((True, 1), (False, 0)))]  # racking 1, can join the pass to f3
+    optimizer = Xfer_Pass_Optimizer()
+    optimized_passes = optimizer.optimize(passes, machine_state)
+    assert optimizer.removed_round_trips == 1
+    assert optimizer.passes_before == 4 and optimizer.passes_after == 2
+    assert optimizer.racks_before == 3 and optimizer.racks_after == 1
+    for carriage_pass in optimized_passes:
+        carriage_pass.write_instructions()
+    assert machine_state[(0, True)] == [0] and machine_state[(3, True)] == [3, 2]
+    assert machine_state[(0, False)] == [1] and machine_state[(2, False)] == []
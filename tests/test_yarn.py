@@ -0,0 +1,57 @@
+"""Tests of the loop sequence kept by a Yarn"""
+from knit_graphs.Knit_Graph import Knit_Graph
+from knit_graphs.Yarn import Yarn
+
+
+def _yarn_with_loops(loop_count: int):
+    knit_graph = Knit_Graph()
+    yarn = Yarn("yarn", knit_graph)
+    knit_graph.add_yarn(yarn)
+    for _ in range(0, loop_count):
+        loop_id, loop = yarn.add_loop_to_end()
+        knit_graph.add_loop(loop)
+    return knit_graph, yarn
+
+
+def test_sequence():
+    knit_graph, yarn = _yarn_with_loops(5)
+    assert [*yarn] == [0, 1, 2, 3, 4]
+    assert len(yarn) == 5
+    assert 3 in yarn and 5 not in yarn and knit_graph[2] in yarn
+    assert yarn.next_loop_id(2) == 3 and yarn.next_loop_id(4) is None
+    assert yarn.prior_loop_id(2) == 1 and yarn.prior_loop_id(0) is None
+    assert yarn.get_segment(1, 3) == [1, 2, 3]
+    assert yarn[2] is knit_graph[2]
+    assert [*yarn.yarn_graph.edges] == [(0, 1), (1, 2), (2, 3), (3, 4)]
+
+
+def test_shared_loop_ids():
+    knit_graph, yarn = _yarn_with_loops(2)
+    other_yarn = Yarn("other", knit_graph, carrier_id=4)
+    knit_graph.add_yarn(other_yarn)
+    loop_id, loop = other_yarn.add_loop_to_end()
+    knit_graph.add_loop(loop)
+    loop_id, loop = yarn.add_loop_to_end()
+    knit_graph.add_loop(loop)
+    assert [*yarn] == [0, 1, 3] and [*other_yarn] == [2]
+    assert 2 not in yarn and 3 in yarn
+    assert yarn.next_loop_id(1) == 3 and yarn.prior_loop_id(3) == 1
+
+
+def test_second_yarn_first_loop():
+    knit_graph, yarn = _yarn_with_loops(3)
+    other_yarn = Yarn("other", knit_graph, carrier_id=4)
+    knit_graph.add_yarn(other_yarn)
+    loop_id, loop = other_yarn.add_loop_to_end()
+    knit_graph.add_loop(loop)
+    assert loop_id == 3 and loop.yarn_id == "other"  # not loop 0, which is on the first yarn
+    assert knit_graph[0].yarn_id == "yarn" and knit_graph.graph.number_of_nodes() == 4
+
+def test_remove_loop():
+    knit_graph, yarn = _yarn_with_loops(4)
+    knit_graph.remove_loop(3)
+    knit_graph.remove_loop(1)
+    assert [*yarn] == [0, 2]
+    assert yarn.last_loop_id == 2 and len(yarn) == 2
+    assert yarn.next_loop_id(0) == 2 and 1 not in yarn
+    assert [*yarn.yarn_graph.edges] == [(0, 2)]